@@ -0,0 +1,286 @@
+"""End-to-end benchmark of the personalisation pipelines on synthetic schools.
+
+Builds a throwaway workspace with generated sheets, SVG templates and photos,
+puts a stub ``inkscape`` first on PATH (see synthetic.stub_inkscape) and runs
+the ID card, report card, cover and imposition pipelines one after another.
+For each it records wall time, time per item, the peak traced Python memory
+and the stage_timing summary. Run from the repository root:
+
+    python benchmarks/bench_pipelines.py --schools 2 --kids 25
+    python benchmarks/bench_pipelines.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_pipelines.py --baseline benchmarks/baseline.json
+
+With ``--baseline`` the exit status is 1 when a pipeline's time per item or
+memory peak grew by more than ``--tolerance``.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import fitz
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import synthetic  # noqa: E402  (benchmarks/ is sys.path[0] when run as a script)
+
+import dc  # noqa: E402
+import id_card_maker  # noqa: E402
+import report_card_maker  # noqa: E402
+import stage_timing  # noqa: E402
+import util  # noqa: E402
+
+SHEET_SIZE = (420 * 2.83465, 290 * 2.83465)
+BOOK_PAGES = 16
+
+
+class Workspace:
+    """Generated inputs for every pipeline, under ``root``."""
+
+    def __init__(self, root, records, seed):
+        self.root = Path(root)
+        self.records = records
+        self.id_templates = self.root / "id_templates"
+        self.report_templates = self.root / "report_templates"
+        self.photos = self.root / "photos"
+        self.covers = self.root / "covers"
+        self.seed = seed
+
+    def build(self):
+        synthetic.install_fonts(self.root)
+        schools = sorted({record["school_id"] for record in self.records})
+        for index, school_id in enumerate(schools):
+            family = synthetic.FONT_FAMILIES[index % len(synthetic.FONT_FAMILIES)]
+            for side in ("FRONT", "BACK"):
+                _write(self.id_templates / school_id / f"{side}.svg", synthetic.card_template(side, family))
+                for class_name in {r["class_name"] for r in self.records}:
+                    name = f"{side}_{class_name.replace(' ', '_')}.svg"
+                    _write(self.report_templates / school_id / name, synthetic.card_template(side, family))
+        for number, record in enumerate(self.records):
+            partial = self.photos / record["school_id"] / "PARTIAL"
+            for photo_id in (record["user_id"], record["guardian_1_id"], record["guardian_2_id"]):
+                synthetic.write_photo(partial / f"{photo_id}.png", (120, 150), self.seed + number)
+            synthetic.write_photo(self.root / "store" / f"{record['user_id']}.png", (300, 380), self.seed + number)
+
+        dc.COVERS_ROOT = str(self.covers)
+        for index, outer_code in enumerate(sorted({r["outer_code"] for r in self.records})):
+            path = dc.cover_svg_path(outer_code)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write(Path(path), synthetic.cover_svg(synthetic.FONT_FAMILIES[index % 2]))
+            os.makedirs(self.root / "Temp" / outer_code[:3], exist_ok=True)
+
+        # Personalised books as storePS leaves them: PDFS/<subject>/<book>/NN.pdf,
+        # one subject per school.
+        for record in self.records:
+            _write_book(self.root / "PDFS" / subject_code(record) / str(record["book_id"]).zfill(3), BOOK_PAGES)
+
+
+def subject_code(record):
+    return record["school_id"] + "0001"
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def _write_book(directory, pages):
+    directory.mkdir(parents=True, exist_ok=True)
+    for number in range(pages):
+        doc = fitz.open()
+        page = doc.new_page(width=SHEET_SIZE[0] / 2, height=SHEET_SIZE[1])
+        page.insert_text((40, 60), "page %d" % (number + 1), fontsize=24)
+        page.draw_rect(fitz.Rect(30, 80, 300, 500), color=(0.2, 0.4, 0.8), fill=(0.9, 0.9, 1))
+        doc.save(str(directory / ("%02d.pdf" % (number + 1))))
+        doc.close()
+
+
+class Failures(list):
+    """Records a pipeline could not generate; like make(), a failure skips the kid."""
+
+    @contextlib.contextmanager
+    def guard(self, record_id):
+        try:
+            yield
+        except Exception as exc:
+            self.append("%s: %s: %s" % (record_id, type(exc).__name__, exc))
+
+
+def run_id_cards(workspace, failures):
+    for record in workspace.records:
+        with failures.guard(record["user_id"]), stage_timing.timer("ID card", record=record["user_id"]):
+            id_card_maker.personalize_id_card(
+                record, template_root=workspace.id_templates, output_root=workspace.root / "ID Cards",
+                photo_root=workspace.photos,
+            )
+    return len(workspace.records)
+
+
+def run_report_cards(workspace, failures):
+    for record in workspace.records:
+        with failures.guard(record["user_id"]), stage_timing.timer("report card", record=record["user_id"]):
+            report_card_maker.personalize_report_card(
+                record, template_root=workspace.report_templates, output_root=workspace.root / "Report cards",
+                photo_root=workspace.photos,
+            )
+    return len(workspace.records)
+
+
+def run_covers(workspace, failures):
+    import pandas as pd
+
+    dc.clear_cover_cache()
+    df = pd.DataFrame(workspace.records)
+    colours = dc.cover_colours(df)[dc.COLOUR_COLUMNS].to_dict("index")
+    for key, record in enumerate(workspace.records):
+        job = dc.CoverJob(
+            outer_code=record["outer_code"], photo_name=record["user_id"], school_id=record["school_id"],
+            name=record["first_name"] + " " + record["last_name"], bookid=str(record["book_id"]).zfill(3),
+            record=record, copy_photo=False, **colours[key],
+        )
+        with failures.guard(record["user_id"]), stage_timing.timer("cover", record=record["user_id"]):
+            output = dc.render_cover(job)
+            dc.record_cover(output)
+            if output is not None and output.preview is not None:
+                dc.render_preview(*output.preview)
+    return len(workspace.records)
+
+
+def run_imposition(workspace, failures):
+    os.makedirs("FINAL BINDERS", exist_ok=True)
+    books = 0
+    for subject in sorted({subject_code(record) for record in workspace.records}):
+        with failures.guard(subject), stage_timing.timer("binder", record=subject):
+            util.assemble_binders(subject, BOOK_PAGES, subject[:3], SHEET_SIZE, 100)
+        books += len(os.listdir(os.path.join("PDFS", subject)))
+    return books
+
+
+PIPELINES = {
+    "id_cards": run_id_cards,
+    "report_cards": run_report_cards,
+    "covers": run_covers,
+    "imposition": run_imposition,
+}
+
+
+def measure(name, fn, workspace, memory=True, verbose=False):
+    stage_timing.TIMINGS.reset()
+    if memory:
+        tracemalloc.start()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    failures = Failures()
+    start = time.perf_counter()
+    try:
+        with output:
+            items = fn(workspace, failures)
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+        if memory:
+            tracemalloc.stop()
+    summary = stage_timing.TIMINGS.summary()
+    return {
+        "items": items,
+        "failed": len(failures),
+        "failures": failures[:10],
+        "seconds": round(elapsed, 4),
+        "ms_per_item": round(elapsed * 1000 / max(items, 1), 3),
+        "peak_kib": None if peak is None else round(peak / 1024, 1),
+        "stages": {stage: {k: stats[k] for k in ("count", "total", "mean", "max")}
+                   for stage, stats in summary["stages"].items()},
+        "slowest": summary["slowest"][:5],
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing the change against ``baseline`` and whether anything regressed."""
+    lines, regressed = [], False
+    for name, result in results.items():
+        base = baseline.get("pipelines", {}).get(name)
+        if base is None:
+            continue
+        for metric in ("ms_per_item", "peak_kib"):
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            flag = ""
+            if change > tolerance:
+                flag = "  REGRESSION"
+                regressed = True
+            lines.append("%-13s %-12s %10.1f -> %10.1f  %+6.1f%%%s" % (name, metric, old, new, change * 100, flag))
+    return lines, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--schools", type=int, default=2)
+    parser.add_argument("--kids", type=int, default=20, help="kids per school")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--pipelines", nargs="+", choices=sorted(PIPELINES), default=list(PIPELINES))
+    parser.add_argument("--workdir", help="keep the generated workspace here instead of a temp dir")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (faster, no peaks)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--save-baseline", help="write the results as a baseline file")
+    parser.add_argument("--baseline", help="compare against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--verbose", action="store_true", help="show the pipelines' own output")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+    output_paths = [os.path.abspath(path) for path in (args.json, args.save_baseline) if path]
+
+    records = synthetic.synthetic_records(args.schools, args.kids, args.seed)
+    with contextlib.ExitStack() as stack:
+        root = args.workdir or stack.enter_context(tempfile.TemporaryDirectory(prefix="bench_pipelines_"))
+        os.makedirs(root, exist_ok=True)
+        previous_cwd = os.getcwd()
+        os.chdir(root)
+        stack.callback(os.chdir, previous_cwd)
+        stack.enter_context(synthetic.stub_inkscape(Path(root) / "bin"))
+
+        workspace = Workspace(root, records, args.seed)
+        workspace.build()
+        results = {}
+        for name in args.pipelines:
+            results[name] = measure(name, PIPELINES[name], workspace, not args.no_memory, args.verbose)
+            result = results[name]
+            print("%-13s %4d items %8.2fs %9.1f ms/item  peak %s KiB  %d failed"
+                  % (name, result["items"], result["seconds"], result["ms_per_item"], result["peak_kib"],
+                     result["failed"]))
+            for failure in result["failures"]:
+                print("    failed %s" % failure)
+            for stage, stats in sorted(result["stages"].items(), key=lambda item: -item[1]["total"]):
+                print("    %-45s %5d x %8.4fs = %8.3fs" % (stage, stats["count"], stats["mean"], stats["total"]))
+
+    report = {
+        "config": {"schools": args.schools, "kids": args.kids, "seed": args.seed, "memory": not args.no_memory},
+        "pipelines": results,
+    }
+    for path in output_paths:
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=1)
+
+    if baseline is not None:
+        if baseline.get("config") != report["config"]:
+            print("Baseline was recorded with %s; results may not be comparable." % baseline.get("config"))
+        lines, regressed = compare(results, baseline, args.tolerance)
+        print("\n".join(lines))
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Compare toprettyxml against doc_maker.write_svg for a personalised page.
+
+The synthetic page mimics a book template: a few hundred artwork groups and
+an embedded base64 PNG. Run from the repository root:
+
+    python benchmarks/bench_svg_serialisation.py --pages 50
+"""
+import argparse
+import base64
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from xml.dom.minidom import parseString
+
+from PIL import Image
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from doc_maker import write_svg
+
+
+def synthetic_page(groups=300, image_px=400):
+    buffer = io.BytesIO()
+    Image.effect_noise((image_px, image_px), 64).convert("RGB").save(buffer, "PNG")
+    encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    parts = [
+        '<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+        'width="210mm" height="297mm" viewBox="0 0 210 297">',
+        '<g id="head"><image width="40" height="40" xlink:href="data:image/png;base64,%s"/></g>' % encoded,
+        '<g id="name"><text x="10" y="20" style="font-size:8px">Name</text></g>',
+    ]
+    for index in range(groups):
+        parts.append(
+            '<g id="art%d"><path d="M%d 0 L%d 10 Z" style="fill:#%06x"/>'
+            '<text x="1" y="2">label %d</text></g>' % (index, index, index + 1, index * 997 % 0xFFFFFF, index)
+        )
+    parts.append("</svg>")
+    return parseString("".join(parts))
+
+
+def pretty_write(doc, path):
+    open(path, "w", encoding="utf-8").write(doc.toprettyxml())
+
+
+def measure(write, doc, pages, folder):
+    written = 0
+    start = time.perf_counter()
+    for page in range(pages):
+        path = os.path.join(folder, "page%d.svg" % page)
+        write(doc, path)
+        written += os.path.getsize(path)
+    return time.perf_counter() - start, written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--groups", type=int, default=300)
+    args = parser.parse_args(argv)
+
+    doc = synthetic_page(args.groups)
+    with tempfile.TemporaryDirectory() as folder:
+        results = {
+            "toprettyxml": measure(pretty_write, doc, args.pages, folder),
+            "write_svg": measure(write_svg, doc, args.pages, folder),
+        }
+
+    print("%-12s %12s %14s" % ("writer", "ms/page", "bytes/page"))
+    for name, (seconds, written) in results.items():
+        print("%-12s %12.2f %14d" % (name, seconds * 1000 / args.pages, written // args.pages))
+
+    (pretty_s, pretty_b), (compact_s, compact_b) = results.values()
+    print(
+        "saved %.2f ms and %d bytes per page"
+        % ((pretty_s - compact_s) * 1000 / args.pages, (pretty_b - compact_b) // args.pages)
+    )
+
+
+if __name__ == "__main__":
+    main()
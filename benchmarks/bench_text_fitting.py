@@ -0,0 +1,180 @@
+"""Micro-benchmark of id_card_maker's text fitting (``_update_text_group``).
+
+Every case fits one kind of text into a fresh copy of a template group and
+goes through ``_fit_text_within_width`` and, when the text overflows,
+``_apply_two_line_layout`` / ``_shrink_two_line_text``. Cases cover short,
+long and very long names, 3- and 4-line addresses, the Marvin and Playpen
+Sans fonts and left / center / right aligned layers. For each case it
+reports the time per fit, how many ``getbbox`` calls and
+``ImageFont.truetype`` loads one fit costs and how many lines the text
+ended up on. A fit that raises stops the run. Run from the repository root:
+
+    python benchmarks/bench_text_fitting.py --repeat 50
+    python benchmarks/bench_text_fitting.py --json before.json
+    python benchmarks/bench_text_fitting.py --baseline before.json
+"""
+import argparse
+import contextlib
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from unittest import mock
+from xml.dom.minidom import parseString
+
+from PIL import ImageFont
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import synthetic  # noqa: E402  (benchmarks/ is sys.path[0] when run as a script)
+
+import id_card_maker  # noqa: E402
+
+ALIGNMENTS = {"left": "L", "center": "M", "right": "R"}
+FONTS = {"marvin": "Marvin", "playpen": "Playpen Sans"}
+
+# Template groups as (id, placeholder lines, font size, box width); kinds pair one with a text generator.
+# The fitter takes its box width from the widest placeholder line, so address
+# placeholders are as wide as one address part; an N-line case fits N parts
+# into a template drawn with N such lines.
+NAME_GROUP = ("name", ("Student Name",), 14, 170)
+ADDRESS_LINE = "#000, 00th Lake View Layout"
+ADDRESS_3_GROUP = ("address", (ADDRESS_LINE,) * 3, 7, 170)
+ADDRESS_4_GROUP = ("address", (ADDRESS_LINE,) * 4, 7, 170)
+TEXT_KINDS = {
+    "short_name": (NAME_GROUP, lambda rng: synthetic.synthetic_full_name(rng, 2, 1)),
+    "long_name": (NAME_GROUP, lambda rng: synthetic.synthetic_full_name(rng, 3, 3)),
+    "very_long_name": (NAME_GROUP, lambda rng: synthetic.synthetic_full_name(rng, 5, 4)),
+    "address_3_lines": (ADDRESS_3_GROUP, lambda rng: synthetic.synthetic_address(rng, 3)),
+    "address_4_lines": (ADDRESS_4_GROUP, lambda rng: synthetic.synthetic_address(rng, 4)),
+}
+
+
+def update_arguments(kind, text):
+    """The keywords _process_svg passes for this kind of group."""
+    if kind.startswith("address"):
+        return {"max_characters": 100, "reduction": 0.5, "text_length_override": None, "address_mode": True}
+    return {"max_characters": 15, "reduction": 0.6, "text_length_override": len(text)}
+
+
+def template_group(kind, family, alignment):
+    (group_id, lines, size, width), _ = TEXT_KINDS[kind]
+    anchor = {"left": "start", "center": "middle", "right": "end"}[alignment]
+    # The layer id carries the alignment the way templates do ("name_L", "address_R").
+    group_svg = synthetic.text_group(
+        "%s_%s" % (group_id, ALIGNMENTS[alignment]), family, size, 102, 210, width, lines, anchor=anchor
+    )
+    return synthetic._svg(54, 86, group_svg)
+
+
+class CallCounter:
+    """Counts ``FreeTypeFont.getbbox`` calls and ``ImageFont.truetype`` loads."""
+
+    def __init__(self):
+        self.getbbox = 0
+        self.truetype = 0
+
+    @contextlib.contextmanager
+    def installed(self):
+        real_getbbox = ImageFont.FreeTypeFont.getbbox
+        real_truetype = ImageFont.truetype
+
+        def getbbox(font, *args, **kwargs):
+            self.getbbox += 1
+            return real_getbbox(font, *args, **kwargs)
+
+        def truetype(*args, **kwargs):
+            self.truetype += 1
+            return real_truetype(*args, **kwargs)
+
+        with mock.patch.object(ImageFont.FreeTypeFont, "getbbox", getbbox), \
+                mock.patch.object(id_card_maker.ImageFont, "truetype", truetype):
+            yield self
+
+
+def run_case(kind, font, alignment, repeat, seed):
+    rng = random.Random("%s/%s/%s/%d" % (kind, font, alignment, seed))
+    texts = [TEXT_KINDS[kind][1](rng) for _ in range(repeat)]
+    svg = template_group(kind, FONTS[font], alignment)
+    # Fitting rewrites the group, so every fit gets its own freshly parsed copy.
+    groups = [parseString(svg).getElementsByTagName("g")[0] for _ in texts]
+
+    counter = CallCounter()
+    elapsed = 0.0
+    with counter.installed():
+        for group, text in zip(groups, texts):
+            start = time.perf_counter()
+            try:
+                id_card_maker._update_text_group(group, text, **update_arguments(kind, text))
+            except Exception as exc:
+                # A failed fit would make the timings meaningless; stop the run on it.
+                raise RuntimeError("%s/%s/%s failed to fit %r" % (kind, font, alignment, text)) from exc
+            elapsed += time.perf_counter() - start
+
+    # Lines the fitted text ended up on, so the cases show what layout they exercised.
+    lines = [len(group.getElementsByTagName("tspan")) or 1 for group in groups]
+    return {
+        "kind": kind,
+        "font": font,
+        "alignment": alignment,
+        "fits": repeat,
+        "lines_per_fit": round(sum(lines) / repeat, 2),
+        "ms_per_fit": round(elapsed * 1000 / repeat, 4),
+        "getbbox_per_fit": round(counter.getbbox / repeat, 2),
+        "truetype_per_fit": round(counter.truetype / repeat, 2),
+    }
+
+
+def case_name(result):
+    return "%s/%s/%s" % (result["kind"], result["font"], result["alignment"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=30, help="fits per case")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--kinds", nargs="+", choices=list(TEXT_KINDS), default=list(TEXT_KINDS))
+    parser.add_argument("--fonts", nargs="+", choices=list(FONTS), default=list(FONTS))
+    parser.add_argument("--alignments", nargs="+", choices=list(ALIGNMENTS), default=list(ALIGNMENTS))
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare ms/fit and getbbox/fit against this results file")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = {case_name(result): result for result in json.load(handle)["cases"]}
+
+    # Fonts are looked up next to id_card_maker, so the working directory does not matter.
+    results = []
+    print("%-36s %10s %12s %13s %10s" % ("case", "ms/fit", "getbbox/fit", "truetype/fit", "lines/fit"))
+    for kind in args.kinds:
+        for font in args.fonts:
+            for alignment in args.alignments:
+                result = run_case(kind, font, alignment, args.repeat, args.seed)
+                results.append(result)
+                line = "%-36s %10.3f %12.1f %13.1f %10.2f" % (
+                    case_name(result), result["ms_per_fit"], result["getbbox_per_fit"],
+                    result["truetype_per_fit"], result["lines_per_fit"],
+                )
+                base = baseline.get(case_name(result))
+                if base and base["ms_per_fit"]:
+                    line += "  %+6.1f%% time, %+.1f getbbox" % (
+                        (result["ms_per_fit"] - base["ms_per_fit"]) * 100 / base["ms_per_fit"],
+                        result["getbbox_per_fit"] - base["getbbox_per_fit"],
+                    )
+                print(line)
+
+    total_ms = sum(result["ms_per_fit"] for result in results)
+    print("mean %.3f ms/fit over %d cases" % (total_ms / max(len(results), 1), len(results)))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"config": {"repeat": args.repeat, "seed": args.seed}, "cases": results}, handle, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Synthetic schools for the benchmarks: sheets, SVG templates, photos and a stub Inkscape.
+
+Everything is generated from a seeded ``random.Random`` so two runs with the
+same arguments measure the same work. Templates only use the bundled
+``Marvin.ttf`` and ``PlaypenSans-Medium.ttf`` fonts.
+"""
+import os
+import random
+import stat
+import subprocess
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+FONT_FILES = ("Marvin.ttf", "PlaypenSans-Medium.ttf")
+FONT_FAMILIES = ("Marvin", "Playpen Sans")
+
+_ONSETS = ["", "b", "ch", "d", "g", "h", "j", "k", "l", "m", "n", "p", "r", "s", "sh", "t", "v", "y"]
+_VOWELS = ["a", "aa", "e", "i", "ee", "o", "u", "ai"]
+_CODAS = ["", "", "n", "r", "sh", "t", "l", "m", "th", "y"]
+_STREETS = ["Main Road", "Cross Street", "Temple Street", "Station Road", "Lake View Layout", "Gandhi Nagar"]
+_CITIES = ["Bengaluru", "Hyderabad", "Chennai", "Mysuru", "Visakhapatnam", "Thiruvananthapuram"]
+_STATES = ["Karnataka", "Telangana", "Tamil Nadu", "Andhra Pradesh", "Kerala"]
+
+
+def _word(rng, syllables):
+    return "".join(
+        rng.choice(_ONSETS) + rng.choice(_VOWELS) + rng.choice(_CODAS) for _ in range(syllables)
+    ).capitalize() or "A"
+
+
+def synthetic_first_name(rng):
+    words = 1 if rng.random() < 0.8 else 2
+    return " ".join(_word(rng, rng.choice((1, 2, 2, 3))) for _ in range(words))
+
+
+def synthetic_last_name(rng):
+    roll = rng.random()
+    if roll < 0.1:
+        return ""
+    if roll < 0.97:
+        return " ".join(_word(rng, rng.choice((2, 2, 3))) for _ in range(1 if roll < 0.8 else 2))
+    # The long tail that drives the shrink-to-fit paths.
+    return " ".join(_word(rng, 4) for _ in range(rng.choice((3, 4))))
+
+
+def synthetic_full_name(rng, words, syllables=3):
+    """A name of exactly ``words`` words, for cases that need a known length."""
+    return " ".join(_word(rng, syllables) for _ in range(words))
+
+
+def synthetic_address(rng, lines=None):
+    parts = [
+        "#%d, %d%s %s" % (rng.randint(1, 999), rng.randint(1, 20), rng.choice(("st", "nd", "rd", "th")), rng.choice(_STREETS)),
+        "%s %s" % (_word(rng, 3), rng.choice(("Colony", "Layout", "Extension", "Nagar"))),
+        "%s, %s" % (rng.choice(_CITIES), rng.choice(_STATES)),
+        "PIN %06d" % rng.randint(500000, 699999),
+    ]
+    count = lines if lines is not None else rng.choice((2, 3, 3, 4))
+    return ", ".join(parts[:count])
+
+
+def synthetic_records(schools=2, kids=20, seed=1):
+    """Sheet rows with every column the book, ID card and report card sheets use."""
+    rng = random.Random(seed)
+    records = []
+    for school_index in range(schools):
+        school_id = str(101 + school_index)
+        school_name = "%s %s School" % (_word(rng, 3), rng.choice(("Public", "International", "Vidya")))
+        for kid in range(kids):
+            user_id = "%s%04d" % (school_id, kid)
+            records.append({
+                "school_id": school_id,
+                "school_name": school_name,
+                "user_id": user_id,
+                "book_id": kid + 1,
+                "first_name": synthetic_first_name(rng),
+                "last_name": synthetic_last_name(rng),
+                "class_name": rng.choice(("LKG", "UKG", "Grade 1")),
+                "outer_code": school_id + "%04d" % 1,
+                "subject_name": "English",
+                "numsub": 4,
+                "subidx": 1 + kid % 4,
+                "school_color_id": 12,
+                "class_color_id": 3,
+                "user_color_id": rng.randint(0, 120),
+                "gender": rng.choice(("Male", "Female")),
+                "blood_group": rng.choice(("A+", "B+", "O+", "AB-")),
+                "date_of_birth": "20%02d-%02d-%02d" % (rng.randint(15, 20), rng.randint(1, 12), rng.randint(1, 28)),
+                "address": synthetic_address(rng),
+                "guardian_1_type": 0,
+                "guardian_1_name": "%s %s" % (synthetic_first_name(rng), synthetic_last_name(rng)),
+                "guardian_1_mobile": "9%09d" % rng.randint(0, 10**9 - 1),
+                "guardian_1_id": user_id + "F",
+                "guardian_2_type": 1,
+                "guardian_2_name": "%s %s" % (synthetic_first_name(rng), synthetic_last_name(rng)),
+                "guardian_2_mobile": "8%09d" % rng.randint(0, 10**9 - 1),
+                "guardian_2_id": user_id + "M",
+            })
+    return records
+
+
+def write_photo(path, size=(300, 380), seed=0):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    colour = tuple(rng.randint(0, 255) for _ in range(3))
+    image = Image.effect_noise(size, 40).convert("RGB")
+    Image.blend(image, Image.new("RGB", size, colour), 0.6).save(path)
+
+
+def text_group(group_id, family, size, x, y, width, template_lines=("Sample Text",), anchor="middle"):
+    tspans = "".join(
+        '<tspan x="%s" y="%s">%s</tspan>' % (x, y + index * size * 1.2, line)
+        for index, line in enumerate(template_lines)
+    )
+    return (
+        '<g id="%s"><rect x="%s" y="%s" width="%s" height="%s" style="fill:none"/>'
+        '<text x="%s" y="%s" text-anchor="%s" style="font-size:%spx;font-family:%s">%s</text></g>'
+        % (group_id, x - width / 2 if anchor == "middle" else x, y - size, width, size * 1.4 * len(template_lines),
+           x, y, anchor, size, family, tspans)
+    )
+
+
+def image_group(group_id, x, y, width, height):
+    return (
+        '<g id="%s"><image x="%s" y="%s" width="%s" height="%s" xlink:href="placeholder.png"/></g>'
+        % (group_id, x, y, width, height)
+    )
+
+
+def _svg(width_mm, height_mm, body):
+    view_w, view_h = width_mm * 3.7795, height_mm * 3.7795
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+        'width="%smm" height="%smm" viewBox="0 0 %.2f %.2f">%s</svg>' % (width_mm, height_mm, view_w, view_h, body)
+    )
+
+
+def card_template(side, family):
+    """An ID / report card face with the groups ``_process_svg`` fills in."""
+    groups = [
+        text_group("name", family, 14, 102, 210, 170, ("Student Name",)),
+        text_group("fname", family, 9, 102, 250, 150, ("Father Name",)),
+        text_group("mname", family, 9, 102, 265, 150, ("Mother Name",)),
+        text_group("fcontact", family, 8, 102, 280, 120, ("+91 9999999999",)),
+        text_group("mcontact", family, 8, 102, 292, 120, ("+91 9999999999",)),
+        text_group("address", family, 7, 20, 300, 170, ("Line one", "Line two", "Line three"), anchor="start"),
+        text_group("dob", family, 8, 60, 230, 90, ("DD-MM-YYYY",)),
+        text_group("blood", family, 8, 150, 230, 50, ("AB+ve",)),
+    ]
+    if side == "FRONT":
+        groups += [
+            text_group("grade", family, 10, 20, 225, 80, ("Grade",), anchor="start"),
+            text_group("branch", family, 9, 102, 40, 160, ("Branch Name",)),
+            image_group("pic1", 62, 60, 80, 100),
+        ]
+    else:
+        groups += [image_group("pic2", 20, 60, 70, 90), image_group("pic3", 114, 60, 70, 90)]
+    return _svg(54, 86, "".join(groups))
+
+
+def cover_svg(family):
+    """A book cover with the ``head`` and ``name`` layers ``dc.personalize`` fills in."""
+    return _svg(420, 290, "".join([
+        image_group("head", 900, 200, 300, 380),
+        '<g id="name"><rect x="820" y="650" width="460" height="60"/>'
+        '<text x="1050" y="690" style="font-size:38px;font-family:%s">Name</text></g>' % family,
+        '<g id="art">%s</g>' % "".join(
+            '<path d="M%d 0 L%d 40 Z" style="fill:#%06x"/>' % (i * 5, i * 5 + 3, i * 7919 % 0xFFFFFF) for i in range(200)
+        ),
+    ]))
+
+
+STUB_INKSCAPE = r'''
+"""Stand-in for ``inkscape --export-filename=OUT IN``: writes a one-page PDF or PNG."""
+import re
+import sys
+
+import fitz
+
+MM = 72 / 25.4
+
+
+def page_size(svg_path):
+    try:
+        head = open(svg_path, encoding="utf-8").read(4096)
+    except OSError:
+        return 595.0, 842.0
+    sizes = [re.search(r'%s="([0-9.]+)mm"' % attr, head) for attr in ("width", "height")]
+    if all(sizes):
+        return float(sizes[0].group(1)) * MM, float(sizes[1].group(1)) * MM
+    return 595.0, 842.0
+
+
+def main(argv):
+    outputs = [arg.split("=", 1)[1] for arg in argv if arg.startswith("--export-filename=")]
+    sources = [arg for arg in argv if not arg.startswith("-")]
+    if not outputs or not sources:
+        return 1
+    width, height = page_size(sources[0])
+    doc = fitz.open()
+    page = doc.new_page(width=width, height=height)
+    page.insert_text((20, 40), sources[0][-60:], fontsize=8)
+    if outputs[0].lower().endswith(".png"):
+        page.get_pixmap(dpi=10).save(outputs[0])
+    else:
+        doc.save(outputs[0])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
+'''
+
+
+@contextmanager
+def stub_inkscape(bin_dir):
+    """Make ``inkscape`` resolve to STUB_INKSCAPE for the duration of the block.
+
+    On POSIX an executable ``inkscape`` script is put first on PATH. Windows
+    cannot launch a script by that name, so there ``subprocess.run`` calls
+    for ``inkscape`` are redirected to the stub, still in a child process.
+    """
+    bin_dir = Path(bin_dir)
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    script = bin_dir / "inkscape_stub.py"
+    script.write_text(STUB_INKSCAPE, encoding="utf-8")
+
+    if os.name != "nt":
+        shim = bin_dir / "inkscape"
+        shim.write_text("#!%s\n" % sys.executable + STUB_INKSCAPE, encoding="utf-8")
+        shim.chmod(shim.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        with mock.patch.dict(os.environ, {"PATH": str(bin_dir) + os.pathsep + os.environ.get("PATH", "")}):
+            yield
+        return
+
+    real_run = subprocess.run
+
+    def run(args, *rest, **kwargs):
+        if isinstance(args, (list, tuple)) and args and args[0] == "inkscape":
+            args = [sys.executable, str(script)] + list(args[1:])
+        return real_run(args, *rest, **kwargs)
+
+    with mock.patch.object(subprocess, "run", run):
+        yield
+
+
+def install_fonts(directory):
+    """Copy the bundled fonts next to the working directory (dc opens them by bare name)."""
+    for name in FONT_FILES:
+        target = Path(directory) / name
+        if not target.exists():
+            target.write_bytes((PROJECT_ROOT / name).read_bytes())
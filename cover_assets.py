@@ -0,0 +1,163 @@
+"""Persistent cache of school cover assets converted for Inkscape.
+
+Cover images on the NAS are often CMYK, which Inkscape renders wrongly, so
+each one is converted to RGB before use. Converted files are kept in
+``CACHE_ROOT`` with an index keyed by source path, mtime and size: an
+unchanged asset is copied straight from the cache without being decoded.
+
+The cache lives in ``asset_cache/`` under the working directory. Opening it
+drops conversions not used for ``MAX_UNUSED_DAYS`` days, so assets of
+schools that are no longer processed do not pile up. Deleting the folder
+clears the cache; it is rebuilt on the next run.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, NamedTuple, Tuple
+
+from PIL import Image
+
+CACHE_ROOT = "asset_cache"
+INDEX_NAME = "index.json"
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif')
+ASSET_WORKERS = min(8, (os.cpu_count() or 2) * 2)
+MAX_UNUSED_DAYS = 90
+
+
+class AssetKey(NamedTuple):
+    mtime_ns: int
+    size: int
+
+
+def is_image(path):
+    return os.path.splitext(path)[1].lower().endswith(IMAGE_EXTENSIONS)
+
+
+def convert_cmyk_to_rgb(input_path, output_path):
+    with Image.open(input_path) as img:
+        if img.mode == "CMYK":
+            img = img.convert("RGB")
+        img.save(output_path)
+
+
+def asset_key(path):
+    st = os.stat(path)
+    return AssetKey(st.st_mtime_ns, st.st_size)
+
+
+class AssetCache:
+    """Converted cover images, reused across runs while their source is unchanged."""
+
+    def __init__(self, root=CACHE_ROOT, workers=ASSET_WORKERS, max_unused_days=MAX_UNUSED_DAYS):
+        self.root = root
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(root, INDEX_NAME)
+        os.makedirs(root, exist_ok=True)
+        try:
+            with open(self._index_path, encoding="utf-8") as handle:
+                self._index = json.load(handle)
+        except (OSError, ValueError):
+            self._index = {}
+        now = time.time()
+        # Entries from before conversions were stamped start their clock now.
+        unstamped = [entry for entry in self._index.values() if "used" not in entry]
+        for entry in unstamped:
+            entry["used"] = now
+        if self.prune(max_unused_days * 86400, now) or unstamped:
+            self.save()
+
+    def prune(self, max_unused_seconds, now=None):
+        """Drop conversions unused for ``max_unused_seconds`` and delete their files.
+
+        Files the index does not know are deleted once they are that old too;
+        younger ones may belong to a conversion still in progress elsewhere.
+        Returns how many index entries were dropped.
+        """
+        cutoff = (time.time() if now is None else now) - max_unused_seconds
+        with self._lock:
+            stale = [source for source, entry in self._index.items() if entry["used"] < cutoff]
+            dropped = {self._index.pop(source)["file"] for source in stale}
+            kept = {entry["file"] for entry in self._index.values()}
+        for name in os.listdir(self.root):
+            if name == INDEX_NAME or name in kept:
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                if name in dropped or os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+        return len(stale)
+
+    def _cached_path(self, source):
+        digest = hashlib.sha1(os.path.abspath(source).encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest + os.path.splitext(source)[1].lower())
+
+    def lookup(self, source):
+        """Path of the converted copy of ``source`` if it is still current, else None."""
+        key = asset_key(source)
+        with self._lock:
+            entry = self._index.get(os.path.abspath(source))
+        if entry is None or AssetKey(*entry["key"]) != key:
+            return None
+        cached = os.path.join(self.root, entry["file"])
+        if not os.path.isfile(cached):
+            return None
+        with self._lock:
+            entry["used"] = time.time()
+        return cached
+
+    def converted(self, source):
+        """Return the converted copy of ``source``, converting it only when stale."""
+        cached = self.lookup(source)
+        if cached is not None:
+            return cached
+
+        key = asset_key(source)
+        cached = self._cached_path(source)
+        root, ext = os.path.splitext(cached)
+        partial = root + ".%d.%d" % (os.getpid(), threading.get_ident()) + ext
+        convert_cmyk_to_rgb(source, partial)
+        os.replace(partial, cached)
+        with self._lock:
+            self._index[os.path.abspath(source)] = {
+                "key": list(key), "file": os.path.basename(cached), "used": time.time(),
+            }
+        return cached
+
+    def copy_asset(self, source, destination):
+        """Copy one asset into place, going through the cache for images."""
+        if is_image(source):
+            shutil.copyfile(self.converted(source), destination)
+        else:
+            shutil.copyfile(source, destination)
+
+    def copy_assets(self, pairs: Iterable[Tuple[str, str]]) -> List[Tuple[Tuple[str, str], Exception]]:
+        """Copy ``(source, destination)`` pairs on a thread pool and save the index.
+
+        Returns the pairs that failed with their errors.
+        """
+        pairs = list(pairs)
+        failures = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [(pair, pool.submit(self.copy_asset, *pair)) for pair in pairs]
+            for pair, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    failures.append((pair, e))
+        self.save()
+        return failures
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self._index, indent=1, sort_keys=True)
+        partial = self._index_path + ".%d.tmp" % os.getpid()
+        with open(partial, "w", encoding="utf-8") as handle:
+            handle.write(data)
+        os.replace(partial, self._index_path)
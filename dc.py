@@ -7,6 +7,15 @@ sticker_path=None
 cmmn_doc=0
 
 import os,shutil,sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import NamedTuple, Optional
+
+import fitz
+import numpy as np
+import pandas as pd
+from doc_maker import node_path, resolve_path, write_svg
+import output_manifest
+import stage_timing
 
 
 def _sanitize_for_path(value, fallback):
@@ -131,6 +140,7 @@ def get_sibling_rect(element):
 
    
    
+@stage_timing.timed()
 def callInkscape(infile, outfile, timeout = 10, counter = 1,old = 0):
     try:
         if old == 0:
@@ -211,26 +221,333 @@ def callInkscape_png(infile, outfile, timeout = 10, counter = 1,old = 0):
         callInkscape_png(infile, outfile, 20, counter - 1, old)
 
 
-def personalize(outer_code,photoFolder ,id,school_color_code1,school_color_code2,grade_colour_code,kid_color_code1,kid_color_code2,name,bookid,tuple,multiple_schools=False):
+# School, grade and kid colour bars: an id ``n`` in 0..120 encodes the
+# colour pair (COLOR_CODES[n // 11], COLOR_CODES[n % 11]).
+COLOR_CODES = ['#ff0000', '#00ff00', '#8F7C00' ,'#0000ff', '#993F00'  ,'#ffff00', '#00ffff', '#ff00ff', '#000000', '#888888',
+'#234567']
+MAX_COLOR_ID = len(COLOR_CODES) ** 2 - 1
+COLOUR_COLUMNS = ["school_color_code1", "school_color_code2", "grade_colour_code", "kid_color_code1", "kid_color_code2"]
+
+
+def cover_colours(df):
+    """Resolve every row's colour bars in one vectorised pass.
+
+    Returns a frame indexed like ``df`` with the COLOUR_COLUMNS and an
+    ``invalid`` flag for rows whose colour ids are missing or out of range;
+    their colour columns are left empty.
+    """
+    school = pd.to_numeric(df["school_color_id"], errors="coerce")
+    grade = pd.to_numeric(df["class_color_id"], errors="coerce")
+    kid = pd.to_numeric(df["user_color_id"], errors="coerce")
+
+    invalid = (
+        ~school.between(0, MAX_COLOR_ID)
+        | ~kid.between(0, MAX_COLOR_ID)
+        | ~(grade >= 0)
+    ).to_numpy()
+
+    codes = np.array(COLOR_CODES, dtype=object)
+    n = len(COLOR_CODES)
+    school = school.where(~invalid, 0).astype(int).to_numpy()
+    grade = grade.where(~invalid, 0).astype(int).to_numpy()
+    kid = kid.where(~invalid, 0).astype(int).to_numpy()
+
+    colours = pd.DataFrame(
+        {
+            "school_color_code1": codes[school // n],
+            "school_color_code2": codes[school % n],
+            "grade_colour_code": codes[grade % n],
+            "kid_color_code1": codes[kid // n],
+            "kid_color_code2": codes[kid % n],
+        },
+        index=df.index,
+    )
+    colours.loc[invalid, COLOUR_COLUMNS] = None
+    colours["invalid"] = invalid
+    return colours
+
+
+class CoverJob(NamedTuple):
+    outer_code: str
+    photo_name: str
+    school_id: object
+    school_color_code1: str
+    school_color_code2: str
+    grade_colour_code: str
+    kid_color_code1: str
+    kid_color_code2: str
+    name: str
+    bookid: str
+    record: dict
+    multiple_schools: bool = False
+    copy_photo: bool = True
+
+
+def render_cover(job):
+    """Render one ``CoverJob``; module-level so it can run in a worker process.
+
+    Returns the book cover's CoverOutput, or None for a box sticker.
+    """
+    return personalize(job.outer_code, job.photo_name, job.school_id, job.school_color_code1, job.school_color_code2,
+                job.grade_colour_code, job.kid_color_code1, job.kid_color_code2, job.name, job.bookid,
+                job.record, job.multiple_schools, job.copy_photo)
+
+
+def copy_cover_photo(school_id, photo_name):
+    """Copy a kid's full photo from the NAS into ``store`` for the cover's head layer."""
+    shutil.copyfile(r"\\pixartnas\home\INTERNAL_PROCESSING\ALL_PHOTOS"+"\\"+str(school_id)+"\\"+"FULL"+"\\"+str(photo_name)+".png", 'store/' + str(photo_name)+".png" )
+
+
+PREVIEW_DPI = 100
+
+
+class PreviewRequest(NamedTuple):
+    pdf_path: str
+    png_path: str
+
+
+def render_preview(pdf_path, png_path):
+    """Rasterise the first page of an exported cover PDF as its PNG preview."""
+    with fitz.open(pdf_path) as doc:
+        doc[0].get_pixmap(dpi=PREVIEW_DPI, alpha=True).save(png_path)
+
+
+class CoverOutput(NamedTuple):
+    output_dir: str
+    child: str
+    pdf_path: str
+    preview: Optional[PreviewRequest]
+
+
+def record_cover(output):
+    """Add a rendered cover to its school's manifest.
+
+    Only the process driving the run calls this; cover workers never touch
+    the manifest.
+    """
+    if output is not None:
+        output_manifest.record_output(output.output_dir, output.child, output.pdf_path, flat=True)
+
+
+class PreviewWorker:
+    """Renders cover previews on one background thread, off the export path.
+
+    ``close`` waits for the queued previews and returns the failures.
+    """
+
+    def __init__(self):
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cover-preview")
+        self._pending = []
+
+    def submit(self, request):
+        if request is not None:
+            self._pending.append((request, self._pool.submit(render_preview, *request)))
+
+    def close(self):
+        failures = []
+        for request, future in self._pending:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Failed to render preview {request.png_path}: {e}")
+                failures.append((request, e))
+        self._pending = []
+        self._pool.shutdown()
+        return failures
+
+
+def render_covers(jobs, workers=1, on_done=None, cancelled=lambda: False):
+    """Render ``jobs`` in this process (``workers`` <= 1) or on a process pool.
+
+    Each finished cover is added to its manifest and queued for a preview
+    here, in the calling process, and the workers' stage timings are merged
+    into ``stage_timing.TIMINGS``. ``on_done(job, error)`` is called as every
+    job finishes, with ``error`` None on success. Once ``cancelled()`` is
+    true the remaining jobs are dropped. Returns the number of covers
+    rendered and the ``(job, error)`` failures.
+    """
+    previews = PreviewWorker()
+    created = 0
+    failures = []
+
+    def render_here(job):
+        with stage_timing.timer("cover", record=job.photo_name):
+            return render_cover(job)
+
+    def pooled(future):
+        result = future.result()
+        stage_timing.TIMINGS.merge(result.timings)
+        return result.value
+
+    def finish(job, render):
+        nonlocal created
+        try:
+            output = render()
+        except Exception as e:
+            print(f"Failed to generate cover {job.outer_code} for book {job.bookid}: {e}")
+            failures.append((job, e))
+            error = e
+        else:
+            record_cover(output)
+            if output is not None:
+                previews.submit(output.preview)
+            created += 1
+            error = None
+        if on_done is not None:
+            on_done(job, error)
+
+    try:
+        if workers <= 1:
+            for job in jobs:
+                if cancelled():
+                    break
+                finish(job, lambda: render_here(job))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(stage_timing.run_timed, "cover", job.photo_name, render_cover, job): job
+                    for job in jobs
+                }
+                for future in as_completed(futures):
+                    if cancelled():
+                        for pending in futures:
+                            pending.cancel()
+                        break
+                    finish(futures[future], lambda: pooled(future))
+    finally:
+        preview_failures = previews.close()
+    if preview_failures:
+        print(f"Cover previews failed for {len(preview_failures)} book(s).")
+    return created, failures
+
+
+COVERS_ROOT = r"\\pixartnas\home\INTERNAL_PROCESSING\SCHOOLCOVERS"
+
+
+def cover_folder(prefix):
+    """SCHOOLCOVERS folder holding one school's covers and Assets."""
+    return os.path.join(COVERS_ROOT, str(prefix))
+
+
+def cover_svg_path(outer_code):
+    """Cover template for ``outer_code``: SCHOOLCOVERS/<first 3 digits>/<outer_code>.svg."""
+    return os.path.join(cover_folder(str(outer_code)[0:3]), str(outer_code) + ".svg")
+
+
+class CoverTemplate(NamedTuple):
+    doc: object
+    layers: dict
+    anchor: Optional[tuple]
+    view_box_width: str
+    view_box_height: str
+
+
+_cover_templates = {}
+
+
+def clear_cover_cache():
+    """Forget parsed covers so the next run re-reads SCHOOLCOVERS."""
+    _cover_templates.clear()
+
+
+def cover_template(outer_code, school_color_code1, school_color_code2):
+    """Parse ``outer_code``'s cover once and add the decorations every kid shares.
+
+    Book covers get the school colour bars and the grade band guide lines;
+    ``anchor`` is the path of the top guide line, before which the kid colour
+    bars are inserted so the element order matches a freshly built cover.
+    Box stickers (``...b``) only get their page size.
+    """
+    key = (str(outer_code), school_color_code1, school_color_code2)
+    try:
+        return _cover_templates[key]
+    except KeyError:
+        pass
+
+    cmmn_doc = p(cover_svg_path(outer_code))
+
+    layers = {}
+    for g in cmmn_doc.getElementsByTagName("g"):
+        if g.getAttribute("id").lower() in ["head", "name", "rectLayer"]:
+            layers[g.getAttribute("id").lower()] = node_path(g)
+
+    svg = cmmn_doc.getElementsByTagName("svg")[0]
+    values = svg.getAttribute("viewBox").split()
+    view_box_width = values[2]
+    view_box_height = values[3]
+    anchor = None
+
+    if not str(outer_code).endswith("b"):
+        rect_width = "20"
+        rect_height = float(view_box_height)
+        rect_y = 15
+        rect_x = float(view_box_width)/2-float(rect_width)/2
+
+        school_rect1 = cmmn_doc.createElement("rect")
+        school_rect1.setAttribute("x", str(rect_x))
+        school_rect1.setAttribute("y", str(rect_y))
+        school_rect1.setAttribute("width", str(20))
+        school_rect1.setAttribute("height", str(30))
+        school_rect1.setAttribute("fill", str(school_color_code1))
+        cmmn_doc.documentElement.appendChild(school_rect1)
+
+        school_rect2 = cmmn_doc.createElement("rect")
+        school_rect2.setAttribute("x", str(rect_x))
+        school_rect2.setAttribute("y", str(rect_y+60))
+        school_rect2.setAttribute("width", str(20))
+        school_rect2.setAttribute("height", str(30))
+        school_rect2.setAttribute("fill", str(school_color_code2))
+        cmmn_doc.documentElement.appendChild(school_rect2)
+
+        grade_start_bound = 0.3*rect_height
+        grade_end_bound = rect_height - 115
+
+        top_line = cmmn_doc.createElement("line")
+        top_line.setAttribute("x1", str(rect_x-5))
+        top_line.setAttribute("x2", str(rect_x-5+float(rect_width)+10))
+        top_line.setAttribute("stroke-width", str(1))
+        top_line.setAttribute("stroke", "black")
+        top_line.setAttribute("y1", str(grade_start_bound))
+        top_line.setAttribute("y2", str(grade_start_bound))
+        cmmn_doc.documentElement.appendChild(top_line)
+
+        bottom_line = cmmn_doc.createElement("line")
+        bottom_line.setAttribute("x1", str(rect_x-5))
+        bottom_line.setAttribute("x2", str(rect_x-5+float(rect_width)+10))
+        bottom_line.setAttribute("y1", str(grade_end_bound))
+        bottom_line.setAttribute("y2", str(grade_end_bound))
+        bottom_line.setAttribute("x2", str(rect_x+25))
+        bottom_line.setAttribute("stroke-width", str(1))
+        bottom_line.setAttribute("stroke", "black")
+        cmmn_doc.documentElement.appendChild(bottom_line)
+
+        svg.setAttribute("width", str(math.floor(convert_to_mm(view_box_width))) + "mm")
+        svg.setAttribute("height", str(math.floor(convert_to_mm(view_box_height))) + "mm")
+        anchor = node_path(top_line)
+    else:
+        svg.setAttribute("width", "300mm")
+        svg.setAttribute("height", "220mm")
+
+    template = CoverTemplate(cmmn_doc, layers, anchor, view_box_width, view_box_height)
+    _cover_templates[key] = template
+    return template
+
+
+def personalize(outer_code,photoFolder ,id,school_color_code1,school_color_code2,grade_colour_code,kid_color_code1,kid_color_code2,name,bookid,tuple,multiple_schools=False,copy_photo=True):
        
-        cmmn_doc =p( r"\\pixartnas\home\INTERNAL_PROCESSING\SCHOOLCOVERS"+"\\"+str(outer_code)[0:3]+"\\"+str(outer_code)+".svg")
+        template = cover_template(outer_code, school_color_code1, school_color_code2)
+        cmmn_doc = template.doc.cloneNode(True)
         
-        shutil.copyfile(r"\\pixartnas\home\INTERNAL_PROCESSING\ALL_PHOTOS"+"\\"+str(id)+"\\"+"FULL"+"\\"+photoFolder+".png", 'store/' + str(photoFolder)+".png" )
+        if copy_photo:
+            copy_cover_photo(id, photoFolder)
         
+        # Named per job so covers rendered concurrently never share a file;
+        # it stays in Temp/<prefix> so relative asset links still resolve.
+        svg_path = "Temp"+"/"+ str(outer_code)[:3]+"/"+bookid+"_"+str(outer_code)+"_"+str(photoFolder)+".svg"
         
         
-        notelist = cmmn_doc.getElementsByTagName("g")                                                       
-    
-        def find_element(id):
-            definitions = {}
-            i=0
-            for i in range(len(notelist)):
-                if notelist[i].getAttribute("id").lower() in id:
-                    definitions[notelist[i].getAttribute("id").lower()] = notelist[i] 
-            
-            return definitions
         
-        allLayers = find_element(["head", "name","rectLayer"])
+        allLayers = {key: resolve_path(cmmn_doc, path) for key, path in template.layers.items()}
         
        
         try:
@@ -313,10 +630,8 @@ def personalize(outer_code,photoFolder ,id,school_color_code1,school_color_code2
             print(exc_type, fname, exc_tb.tb_lineno)
 
         svg = cmmn_doc.getElementsByTagName("svg")[0]  # Ensure the first <svg> element is accessed
-        view_box = svg.getAttribute("viewBox")
-        values = view_box.split()
-        view_box_width = values[2]
-        view_box_height = values[3]
+        view_box_width = template.view_box_width
+        view_box_height = template.view_box_height
 
         if not str(outer_code).endswith("b"): 
                    
@@ -332,22 +647,6 @@ def personalize(outer_code,photoFolder ,id,school_color_code1,school_color_code2
             text_x=float(rect_x)-20
             text_y=float(rect_y)+rect_height*0.5
             
-            school_rect1=cmmn_doc.createElement("rect")
-            school_rect1.setAttribute("x", str(rect_x))
-            school_rect1.setAttribute("y", str(rect_y))  
-            school_rect1.setAttribute("width",str(20))
-            school_rect1.setAttribute("height",str(30)) 
-            school_rect1.setAttribute("fill", str(school_color_code1)) 
-            cmmn_doc.documentElement.appendChild(school_rect1)
-            
-            school_rect2=cmmn_doc.createElement("rect")
-            school_rect2.setAttribute("x", str(rect_x))  
-            school_rect2.setAttribute("y", str(rect_y+60))  
-            school_rect2.setAttribute("width",str(20))
-            school_rect2.setAttribute("height",str(30))
-            school_rect2.setAttribute("fill", str(school_color_code2)) 
-            cmmn_doc.documentElement.appendChild(school_rect2)
-            
             # grade_rect1=cmmn_doc.createElement("rect")
             # grade_rect1.setAttribute("x", str(rect_x))
             # grade_rect1.setAttribute("y", str(rect_y+diff*2)  ) 
@@ -358,6 +657,10 @@ def personalize(outer_code,photoFolder ,id,school_color_code1,school_color_code2
             
            
             
+            # Kid bars go before the template's guide lines, where a freshly
+            # built cover has them.
+            anchor = resolve_path(cmmn_doc, template.anchor)
+
             kid_color_rect1=cmmn_doc.createElement("rect")
             kid_color_rect1.setAttribute("x", str(rect_x))
             kid_color_rect1.setAttribute("y", str(rect_height-97))   
@@ -365,7 +668,7 @@ def personalize(outer_code,photoFolder ,id,school_color_code1,school_color_code2
             kid_color_rect1.setAttribute("height",str(30))
             kid_color_rect1.setAttribute("fill", kid_color_code1) 
             
-            cmmn_doc.documentElement.appendChild(kid_color_rect1)
+            cmmn_doc.documentElement.insertBefore(kid_color_rect1, anchor)
             
             kid_color_rect2=cmmn_doc.createElement("rect")
             kid_color_rect2.setAttribute("x", str(rect_x))
@@ -373,37 +676,13 @@ def personalize(outer_code,photoFolder ,id,school_color_code1,school_color_code2
             kid_color_rect2.setAttribute("width",str(20))
             kid_color_rect2.setAttribute("height",str(30))
             kid_color_rect2.setAttribute("fill", kid_color_code2) 
-            cmmn_doc.documentElement.appendChild(kid_color_rect2)  
+            cmmn_doc.documentElement.insertBefore(kid_color_rect2, anchor)
             
       
             grade_start_bound=0.3*rect_height
             grade_end_bound=rect_height  - 115
             
                              
-            top_line=cmmn_doc.createElement("line")
-            top_line.setAttribute("x1",str(rect_x-5))
-            top_line.setAttribute("x2",str(rect_x-5+float(rect_width)+10))
-            top_line.setAttribute("stroke-width",str(1))
-            top_line.setAttribute("stroke", "black")
-            top_line.setAttribute("y1",str(grade_start_bound))
-            top_line.setAttribute("y2",str(grade_start_bound))
-            cmmn_doc.documentElement.appendChild(top_line)
-            
-            bottom_line=cmmn_doc.createElement("line")
-            bottom_line.setAttribute("x1",str(rect_x-5))
-            bottom_line.setAttribute("x2",str(rect_x-5+float(rect_width)+10))
-            bottom_line.setAttribute("y1",str(grade_end_bound))
-            bottom_line.setAttribute("y2",str(grade_end_bound))
-            bottom_line.setAttribute("x2",str(rect_x+25))
-            bottom_line.setAttribute("stroke-width",str(1))
-            bottom_line.setAttribute("stroke", "black")
-            cmmn_doc.documentElement.appendChild(bottom_line)
-             
-            
-            
-            
-            
-            
             ht = (grade_end_bound - grade_start_bound)/int(tuple['numsub'])
             y_pos = grade_start_bound + (ht * (int(tuple['subidx']) -1))
             
@@ -435,12 +714,7 @@ def personalize(outer_code,photoFolder ,id,school_color_code1,school_color_code2
             
             cmmn_doc.documentElement.appendChild(new_text)
 
-            svg = cmmn_doc.getElementsByTagName("svg")[0]
-                   
-            svg.setAttribute("width", str(math.floor(convert_to_mm(view_box_width))) + "mm")
-            svg.setAttribute("height", str(math.floor(convert_to_mm(view_box_height))) + "mm")
-            
-            open("Temp"+"/"+ str(outer_code)[:3]+"/"+bookid+".svg", "w", encoding="utf-8").write(cmmn_doc.toprettyxml())
+            write_svg(cmmn_doc, svg_path)
 
             school_name_raw = tuple.get("school_name", "")
             subject_name_raw = (
@@ -465,18 +739,26 @@ def personalize(outer_code,photoFolder ,id,school_color_code1,school_color_code2
             )
 
             output_path = os.path.join(output_dir, output_name)
+            # A PDF left by an earlier run must not pass for this export.
+            if os.path.isfile(output_path):
+                os.remove(output_path)
 
-            callInkscape("Temp"+"/"+ str(outer_code)[:3]+"/"+bookid+".svg",output_path,10,10,0)
+            callInkscape(svg_path,output_path,10,10,0)
+            output = CoverOutput(output_dir, os.path.splitext(output_name)[0], output_path, None)
             
             if int(tuple['subidx']) == 1:
                 png_folder = os.path.join("Temp", str(outer_code)[:3], "PNG")
-                if not os.path.isdir(png_folder):
-                    os.makedirs(png_folder)
-                callInkscape_png("Temp"+"/"+str(outer_code)[:3]+"/"+bookid+".svg","Temp"+"/"+str(outer_code)[:3]+"/"+"PNG"+"/"+bookid+".png",10,3,0)
+                os.makedirs(png_folder, exist_ok=True)
+                png_path = "Temp"+"/"+str(outer_code)[:3]+"/"+"PNG"+"/"+bookid+".png"
+                # The preview is rasterised from the exported PDF by a
+                # PreviewWorker; Inkscape is only relaunched if the export
+                # left no PDF behind.
+                if os.path.isfile(output_path):
+                    return output._replace(preview=PreviewRequest(output_path, png_path))
+                callInkscape_png(svg_path,png_path,10,3,0)
+            return output
         # callInkscape(school_code+"/"+in_code+code+".svg",school_code+"/"+"PDF"+"/"+in_code+code+".pdf")f")
         else:
-            svg.setAttribute("width","300mm")
-            svg.setAttribute("height","220mm")
             canvas_width=view_box_width
             canvas_height=view_box_height
             school_id_x=float(canvas_width)*0.35
@@ -492,12 +774,11 @@ def personalize(outer_code,photoFolder ,id,school_color_code1,school_color_code2
             school_name.appendChild(cmmn_doc.createTextNode(tuple["school_name"]))
             cmmn_doc.documentElement.appendChild(school_name)
             
-            open("Temp"+"/"+ str(outer_code)[:3]+"/"+bookid+".svg", "w", encoding="utf-8").write(cmmn_doc.toprettyxml()) 
-            if  not os.path.isdir("Temp"+"/"+ str(outer_code)[:3]+"/"+"Boxstickers"):
-                os.makedirs("Temp"+"/"+ str(outer_code)[:3]+"/"+"Boxstickers")
+            write_svg(cmmn_doc, svg_path) 
+            os.makedirs("Temp"+"/"+ str(outer_code)[:3]+"/"+"Boxstickers", exist_ok=True)
                 
             if str(outer_code).endswith("b"):
-                callInkscape("Temp"+"/"+ str(outer_code)[:3]+"/"+bookid+".svg","Temp"+"/"+ str(outer_code)[:3]+"/"+"Boxstickers"+"/"+bookid+".pdf",10,4,0)
+                callInkscape(svg_path,"Temp"+"/"+ str(outer_code)[:3]+"/"+"Boxstickers"+"/"+bookid+".pdf",10,4,0)
             
        
     
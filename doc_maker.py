@@ -3,8 +3,116 @@ import os,shutil
 import subprocess
 from pathlib import Path
 import pandas as pd
+from typing import NamedTuple, Optional
+import stage_timing
 #parse your XML-document
 
+PER_ROOT = r"\\pixartnas\home\INTERNAL_PROCESSING\ALL BOOKS FORM\PER"
+LAYER_IDS = ["head", "name", "grade", "gender", "dob", "fphoto", "mphoto", "mname", "fname"]
+
+
+class SvgTemplate(NamedTuple):
+    file: str
+    doc: object
+    layers: dict
+
+
+class SubjectTemplates(NamedTuple):
+    assets: str
+    asset_files: list
+    svgs: list
+
+
+# Rows arrive grouped by subject, so only the subject being generated is
+# kept; loading the next one drops the previous parsed tree.
+_subject_templates = {}
+
+
+def clear_template_cache():
+    """Forget parsed subject templates so the next run re-reads the share."""
+    _subject_templates.clear()
+
+
+def node_path(node):
+    """Child-index chain from the document to ``node``, valid in any deep clone."""
+    path = []
+    while node.parentNode is not None:
+        path.append(node.parentNode.childNodes.index(node))
+        node = node.parentNode
+    path.reverse()
+    return tuple(path)
+
+
+def resolve_path(doc, path):
+    node = doc
+    for index in path:
+        node = node.childNodes[index]
+    return node
+
+
+def layer_paths(doc, ids):
+    """Same lookup as the old per-page ``find_element``, stored as node paths."""
+    definitions = {}
+    for g in doc.getElementsByTagName("g"):
+        if g.getAttribute("id").lower() in ids:
+            definitions[g.getAttribute("id").lower()] = node_path(g)
+    return definitions
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def subject_templates(subject) -> Optional[SubjectTemplates]:
+    """List, stage and parse ``PER\\{subject}`` once per subject change.
+
+    Non-SVG assets are copied to a local ``SVGS/{subject}/_assets`` folder and
+    every SVG page is parsed with its layers located. Returns ``None`` when
+    the subject has no personalised pages.
+    """
+    try:
+        return _subject_templates[subject]
+    except KeyError:
+        _subject_templates.clear()
+
+    source = PER_ROOT + "\\" + subject
+    if os.path.exists(source) == False:
+        _subject_templates[subject] = None
+        return None
+
+    assets = "SVGS" + "/" + subject + "/_assets/"
+    if os.path.isdir(assets):
+        shutil.rmtree(assets)
+    os.makedirs(assets, exist_ok=True)
+
+    asset_files = []
+    svgs = []
+    for file in os.listdir(source):
+        name, ext = os.path.splitext(file)
+        if ext != '.svg':
+            shutil.copyfile(source + "\\" + file, assets + file)
+            asset_files.append(file)
+            continue
+        doc = p(source + "\\" + file)
+        svgs.append(SvgTemplate(file, doc, layer_paths(doc, LAYER_IDS)))
+
+    templates = SubjectTemplates(assets, asset_files, svgs)
+    _subject_templates[subject] = templates
+    return templates
+
+def write_svg(doc, path):
+    """Stream ``doc`` to ``path`` as compact XML.
+
+    ``toprettyxml`` re-indents the whole tree in memory first, which bloats
+    the file and gives Inkscape more whitespace to parse.
+    """
+    with open(path, "w", encoding="utf-8") as handle:
+        doc.writexml(handle, encoding="utf-8")
+
+@stage_timing.timed()
 def callInkscape(infile, outfile, timeout = 10, counter = 1,old = 0):
     try:
         # Do not override the DPI when exporting PDFs so the output canvas
@@ -37,7 +145,8 @@ def callInkscape(infile, outfile, timeout = 10, counter = 1,old = 0):
 def personalize(tuple, subject, old = 0,sticker=False):
     print(tuple["first_name"])
 
-    if os.path.exists(r"\\pixartnas\home\INTERNAL_PROCESSING\ALL BOOKS FORM\PER"+"\\"+ subject) == False:
+    templates = subject_templates(subject)
+    if templates is None:
         pdfFolder = "PDFS" + "/" + subject + "/"  + str(tuple["book_id"]).zfill(3)+ "/"
         os.makedirs(pdfFolder, exist_ok=True)
         return
@@ -97,34 +206,13 @@ def personalize(tuple, subject, old = 0,sticker=False):
     # if tuple["guardian_2_image"]!=None and tuple["guardian_2_image"]!="":
     #      shutil.copyfile(photoFolder + "\\"+"PARTIAL"+"\\" + str(tuple["guardian_2_id"])  + '.png', 'store/' + str(tuple["guardian_2_id"]) + '.png')
         
-    for file in os.listdir(r"\\pixartnas\home\INTERNAL_PROCESSING\ALL BOOKS FORM\PER"+"\\" + subject):
-        
-        name, ext = os.path.splitext(file)
-        
-        if ext != '.svg':
-            shutil.copyfile(r"\\pixartnas\home\INTERNAL_PROCESSING\ALL BOOKS FORM\PER"+"\\" + subject + "\\" + file, svgFolder + "/" + file)
-
-    for file in os.listdir(r"\\pixartnas\home\INTERNAL_PROCESSING\ALL BOOKS FORM\PER"+"\\" + subject):
-        
-        name, ext = os.path.splitext(file)
-        
-        if ext != '.svg':
-            continue
-        
-        cmmn_doc = p(r"\\pixartnas\home\INTERNAL_PROCESSING\ALL BOOKS FORM\PER"+"\\" + subject + "\\" + file)
-
-        notelist = cmmn_doc.getElementsByTagName("g")
-        
-        def find_element(id):
-            definitions = {}
-            i=0
-            for i in range(len(notelist)):
-                if notelist[i].getAttribute("id").lower() in id:
-                    definitions[notelist[i].getAttribute("id").lower()] = notelist[i] #(or whatever you want to do)
-
-            return definitions
+    for file in templates.asset_files:
+        _link_or_copy(templates.assets + file, svgFolder + "/" + file)
 
-        allLayers = find_element(["head", "name", "grade", "gender", "dob", "fphoto", "mphoto", "mname", "fname"])
+    for template in templates.svgs:
+        file = template.file
+        cmmn_doc = template.doc.cloneNode(True)
+        allLayers = {key: resolve_path(cmmn_doc, path) for key, path in template.layers.items()}
 
         try:
             allLayers["head"]
@@ -279,6 +367,6 @@ def personalize(tuple, subject, old = 0,sticker=False):
             new_text.appendChild(cmmn_doc.createTextNode(str(tuple["book_id"]).zfill(3)))
             cmmn_doc.documentElement.appendChild(new_text)
 
-        open(svgFolder + file, "w", encoding="utf-8").write(cmmn_doc.toprettyxml())
+        write_svg(cmmn_doc, svgFolder + file)
         print(svgFolder)
         callInkscape (svgFolder + file, pdfFolder + file, 10, 4, old)
\ No newline at end of file
@@ -1,12 +1,15 @@
-import os, fitz
+import argparse, os, sys, time, fitz
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 from PIL import Image, ImageFile
 ImageFile.LOAD_TRUNCATED_IMAGES = True
+from reportlab import rl_config
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
-from reportlab.lib.pagesizes import A3
-from tkinter import filedialog, messagebox
-import tkinter as tk
+from typing import NamedTuple, Optional, Tuple
 
 # ---------------- CONFIG ----------------
 PAGE_W_MM, PAGE_H_MM = 297.0, 420.0
@@ -17,15 +20,93 @@ KIDS_PER_PAGE = 10
 DPI = 300
 FRONT_SUFFIX, BACK_SUFFIX = "_FRONT.pdf", "_BACK.pdf"
 FIRST_COL_X_MM = 6.0
+RENDER_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+RENDER_QUEUE_SIZE = 16  # cards rendered ahead of the writer, caps memory
 
 # Fixed template path (must exist in same folder as this script)
 TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "ID Layout.pdf")
 
+class SheetGeometry(NamedTuple):
+    """Card grid of one sheet; the defaults match the A3 ID Layout template."""
+    page_w_mm: float = PAGE_W_MM
+    page_h_mm: float = PAGE_H_MM
+    card_w_mm: float = CARD_W_MM
+    card_h_mm: float = CARD_H_MM
+    cols: int = COLS
+    rows: int = ROWS
+    kids_per_page: int = KIDS_PER_PAGE
+    first_col_x_mm: float = FIRST_COL_X_MM
+    row_tops_mm: Tuple[float, ...] = tuple(ROW_TOPS_MM)
+    dpi: int = DPI
+
+class ImageEncoding(NamedTuple):
+    """How rasterised images are embedded in the sheet PDF.
+
+    ``inline`` keeps the original lossless inline images; ``jpeg`` embeds
+    DCT-compressed images at ``quality`` (1-95); ``flate`` embeds lossless
+    image XObjects. ``downsample_dpi`` resamples below the rasterisation DPI
+    first and only applies to jpeg/flate.
+    """
+    mode: str = "inline"
+    quality: int = 85
+    downsample_dpi: Optional[int] = None
+
+ENCODING_MODES = ("inline", "jpeg", "flate")
+
+class PageStats(NamedTuple):
+    number: int
+    cards: int
+    seconds: float
+    bytes: Optional[int] = None
+
 # ---------------- HELPERS ----------------
-def rasterize(pdf_path):
+def even_row_tops(rows, card_h_mm, page_h_mm):
+    """Spread ``rows`` card rows evenly down the page (mm from top)."""
+    gap = (page_h_mm - rows * card_h_mm) / (rows + 1)
+    return tuple(round(gap + i * (card_h_mm + gap), 3) for i in range(rows))
+
+def validate_geometry(geometry):
+    """Raise ValueError when the cards cannot be placed on the sheet."""
+    g = geometry
+    if g.cols < 1 or g.rows < 2 or g.rows % 2:
+        raise ValueError("COLS must be at least 1 and ROWS an even number of at least 2.")
+    if len(g.row_tops_mm) != g.rows:
+        raise ValueError(f"Expected {g.rows} row tops, got {len(g.row_tops_mm)}.")
+    if not 1 <= g.kids_per_page <= g.cols * (g.rows // 2):
+        raise ValueError(
+            f"KIDS_PER_PAGE must be between 1 and {g.cols * (g.rows // 2)} "
+            f"for a {g.cols}x{g.rows} grid."
+        )
+    if g.first_col_x_mm + g.cols * g.card_w_mm > g.page_w_mm:
+        raise ValueError("Card columns do not fit the page width.")
+    if max(g.row_tops_mm) + g.card_h_mm > g.page_h_mm:
+        raise ValueError("Card rows do not fit the page height.")
+
+def validate_encoding(encoding):
+    """Raise ValueError for settings encode_image cannot honour."""
+    if encoding.mode not in ENCODING_MODES:
+        raise ValueError(f"Unknown image encoding: {encoding.mode}")
+    if not 1 <= encoding.quality <= 95:
+        raise ValueError("JPEG quality must be between 1 and 95.")
+    if encoding.downsample_dpi is not None:
+        if encoding.mode == "inline":
+            raise ValueError("Downsampling needs the jpeg or flate encoding; inline images are embedded as rendered.")
+        if encoding.downsample_dpi < 1:
+            raise ValueError("Downsample DPI must be positive.")
+
+def slot_position(slot, geometry):
+    """Return (front row, back row, column) for a slot on the sheet.
+
+    Fronts fill the top half row by row; each back sits in the mirrored row
+    of the bottom half (row 1→back row 4, row 2→back row 3 on the A3 layout).
+    """
+    row_f, col = divmod(slot, geometry.cols)
+    return row_f, geometry.rows - 1 - row_f, col
+
+def rasterize(pdf_path, dpi=DPI):
     """Convert a one-page PDF to a Pillow image (PNG)."""
     doc = fitz.open(pdf_path)
-    pix = doc[0].get_pixmap(dpi=DPI)
+    pix = doc[0].get_pixmap(dpi=dpi)
     img_bytes = pix.tobytes("png")
     doc.close()
     return Image.open(BytesIO(img_bytes))
@@ -43,71 +124,287 @@ def gather_pairs(folder):
     kids.sort(key=lambda t: t[0].lower())
     return kids
 
-def mm_to_bottom_left_y(top_mm, box_h_mm):
+def mm_to_bottom_left_y(top_mm, box_h_mm, page_h_mm=PAGE_H_MM):
     """Convert top-Y mm to ReportLab bottom-left coordinate."""
-    return PAGE_H_MM - top_mm - box_h_mm
-
-def draw_template_background(c):
-    """Draw fixed A3 template on current page."""
-    if not os.path.exists(TEMPLATE_PATH):
-        raise FileNotFoundError(f"Template not found: {TEMPLATE_PATH}")
-    doc = fitz.open(TEMPLATE_PATH)
-    pix = doc[0].get_pixmap(dpi=300)
-    img_bytes = pix.tobytes("png")
-    doc.close()
-    img = Image.open(BytesIO(img_bytes))
-    c.drawInlineImage(img, 0, 0, width=PAGE_W_MM*mm, height=PAGE_H_MM*mm)
+    return page_h_mm - top_mm - box_h_mm
+
+def load_template_image(template_path=None, dpi=DPI):
+    """Rasterise the sheet background template."""
+    template_path = template_path or TEMPLATE_PATH
+    if not os.path.exists(template_path):
+        raise FileNotFoundError(f"Template not found: {template_path}")
+    return rasterize(template_path, dpi)
+
+def encode_image(img, encoding=None, dpi=DPI):
+    """Prepare a rasterised image for embedding with the given encoding.
+
+    Returns the Pillow image for ``inline``/``flate`` and the JPEG bytes for
+    ``jpeg``; make_sheets stores JPEG bytes as the image stream unchanged
+    (see binary_image_streams).
+    """
+    encoding = encoding or ImageEncoding()
+    validate_encoding(encoding)
+    if encoding.mode == "inline":
+        return img
+    if encoding.downsample_dpi and encoding.downsample_dpi < dpi:
+        factor = encoding.downsample_dpi / dpi
+        size = (max(1, round(img.width * factor)), max(1, round(img.height * factor)))
+        img = img.resize(size, Image.LANCZOS)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if encoding.mode == "flate":
+        return img
+    buf = BytesIO()
+    img.save(buf, "JPEG", quality=encoding.quality, optimize=True)
+    return buf.getvalue()
+
+def place_image(c, payload, x, y, width, height, encoding=None):
+    """Draw an image prepared by encode_image."""
+    encoding = encoding or ImageEncoding()
+    if encoding.mode == "inline":
+        c.drawInlineImage(payload, x, y, width=width, height=height)
+        return
+    if isinstance(payload, bytes):
+        payload = BytesIO(payload)
+    c.drawImage(ImageReader(payload), x, y, width=width, height=height)
+
+@contextmanager
+def binary_image_streams(enabled=True):
+    """Turn off ReportLab's ASCII85 wrapping of streams while building a PDF.
+
+    With ``rl_config.useA85`` on, JPEG data is stored as
+    ``[/ASCII85Decode/DCTDecode]`` and typically grows by a quarter; with it off the
+    JPEG bytes are the stream. The setting is global, so it is restored on
+    exit.
+    """
+    previous = rl_config.useA85
+    if enabled:
+        rl_config.useA85 = 0
+    try:
+        yield
+    finally:
+        rl_config.useA85 = previous
+
+def render_card(front, back, dpi=DPI, encoding=None):
+    """Rasterise one FRONT/BACK pair; the back comes out rotated for the sheet."""
+    img_f = rasterize(front, dpi)
+    img_b = rasterize(back, dpi).rotate(180, expand=True)
+    return encode_image(img_f, encoding, dpi), encode_image(img_b, encoding, dpi)
+
+def page_byte_sizes(pdf_path):
+    """Return the stored bytes of each page's content streams and images.
+
+    Images shared between pages (the jpeg/flate background) count on every
+    page that shows them.
+    """
+    sizes = []
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            xrefs = set(page.get_contents())
+            xrefs.update(img[0] for img in page.get_images(full=True))
+            sizes.append(sum(len(doc.xref_stream_raw(xref) or b"") for xref in xrefs))
+    return sizes
 
-def make_sheets(folders, out_pdf, log_fn=print):
-    """Process multiple folders sequentially, filling pages continuously."""
+def iter_rendered_cards(cards, workers=RENDER_WORKERS, queue_size=RENDER_QUEUE_SIZE, dpi=DPI,
+                        encoding=None):
+    """Yield (base, images, error) for each card, in input order.
+
+    With more than one worker the cards are rasterised in a process pool
+    ahead of the caller; at most ``queue_size`` finished or in-flight cards
+    are held at once.
+    """
+    if workers <= 1:
+        for base, front, back in cards:
+            try:
+                yield base, render_card(front, back, dpi, encoding), None
+            except Exception as e:
+                yield base, None, e
+        return
+
+    cards = iter(cards)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            while len(pending) < max(1, queue_size):
+                card = next(cards, None)
+                if card is None:
+                    break
+                base, front, back = card
+                pending.append((base, pool.submit(render_card, front, back, dpi, encoding)))
+            if not pending:
+                break
+            base, future = pending.popleft()
+            try:
+                yield base, future.result(), None
+            except Exception as e:
+                yield base, None, e
+
+def make_sheets(folders, out_pdf, log_fn=print, workers=RENDER_WORKERS,
+                geometry=None, template_path=None, encoding=None):
+    """Process multiple folders sequentially, filling pages continuously.
+
+    Returns one PageStats per sheet with the wall time spent filling it and
+    the bytes it takes up in the saved PDF.
+    """
+    g = geometry or SheetGeometry()
+    validate_geometry(g)
+    encoding = encoding or ImageEncoding()
+    validate_encoding(encoding)
     # Collect all kids, preserving folder order
     schools = [(folder, gather_pairs(folder)) for folder in folders]
     schools = [(f, kids) for f, kids in schools if kids]
     if not schools:
         raise RuntimeError("No FRONT/BACK pairs found in selected folders.")
 
-    c = canvas.Canvas(out_pdf, pagesize=A3)
-    col_xs = [FIRST_COL_X_MM + i * CARD_W_MM for i in range(COLS)]
-    row_bottoms = [mm_to_bottom_left_y(t, CARD_H_MM) for t in ROW_TOPS_MM]
-    slot_index = 0
+    # The background is rasterised and encoded once; with jpeg/flate every
+    # page shares a single image XObject.
+    background = encode_image(load_template_image(template_path, g.dpi), encoding, g.dpi)
+    page_w, page_h = g.page_w_mm*mm, g.page_h_mm*mm
+    card_w, card_h = g.card_w_mm*mm, g.card_h_mm*mm
 
-    for folder, pairs in schools:
-        for base, front, back in pairs:
-            slot = slot_index % KIDS_PER_PAGE
+    # inline keeps ReportLab's defaults so its output is unchanged.
+    with binary_image_streams(encoding.mode != "inline"):
+        c = canvas.Canvas(out_pdf, pagesize=(page_w, page_h))
+        col_xs = [g.first_col_x_mm + i * g.card_w_mm for i in range(g.cols)]
+        row_bottoms = [mm_to_bottom_left_y(t, g.card_h_mm, g.page_h_mm) for t in g.row_tops_mm]
+        slot_index = 0
+        pages = []
+        page_start = time.perf_counter()
+
+        # Rasterisation runs ahead in worker processes; this loop is the single
+        # writer and only places finished images, in the original card order.
+        cards = (card for _, pairs in schools for card in pairs)
+        for base, images, error in iter_rendered_cards(cards, workers, dpi=g.dpi, encoding=encoding):
+            slot = slot_index % g.kids_per_page
             if slot == 0:
                 if slot_index > 0:
                     c.showPage()
-                draw_template_background(c)
+                    now = time.perf_counter()
+                    pages.append(PageStats(len(pages) + 1, g.kids_per_page, now - page_start))
+                    page_start = now
+                place_image(c, background, 0, 0, page_w, page_h, encoding)
 
-            # Row mapping: row 1→back row 4, row 2→back row 3
-            if slot < 5:
-                row_f, row_b, col = 0, 3, slot
-            else:
-                row_f, row_b, col = 1, 2, slot - 5
+            row_f, row_b, col = slot_position(slot, g)
 
             try:
+                if error is not None:
+                    raise error
+                img_f, img_b = images
+
                 # FRONT
-                img_f = rasterize(front)
                 fx, fy = col_xs[col]*mm, row_bottoms[row_f]*mm
-                c.drawInlineImage(img_f, fx, fy, width=CARD_W_MM*mm, height=CARD_H_MM*mm)
+                place_image(c, img_f, fx, fy, card_w, card_h, encoding)
 
                 # BACK (rotated)
-                img_b = rasterize(back).rotate(180, expand=True)
                 bx, by = col_xs[col]*mm, row_bottoms[row_b]*mm
-                c.drawInlineImage(img_b, bx, by, width=CARD_W_MM*mm, height=CARD_H_MM*mm)
+                place_image(c, img_b, bx, by, card_w, card_h, encoding)
 
                 log_fn(f"✅ {base}")
             except Exception as e:
                 log_fn(f"❌ {base}: {e}")
             slot_index += 1
 
-    c.save()
+        c.save()
+    remaining = slot_index - (len(pages) * g.kids_per_page)
+    pages.append(PageStats(len(pages) + 1, remaining, time.perf_counter() - page_start))
+    pages = [page._replace(bytes=size) for page, size in zip(pages, page_byte_sizes(out_pdf))]
     log_fn(f"✅ Done. Saved to {out_pdf}")
-    messagebox.showinfo("Success", f"Combined PDF created:\n{out_pdf}")
+    return pages
+
+# ---------------- CLI ----------------
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Impose FRONT/BACK ID card PDFs onto print sheets without the GUI.")
+    parser.add_argument("folders", nargs="+", help="School folders containing *_FRONT.pdf/*_BACK.pdf pairs")
+    parser.add_argument("-o", "--output", required=True, help="Combined PDF to write")
+    parser.add_argument("--template", default=TEMPLATE_PATH, help="Sheet background template PDF")
+    parser.add_argument("--dpi", type=int, default=DPI, help="Rasterisation DPI")
+    parser.add_argument("--kids-per-page", type=int, default=None, help="Cards per sheet (KIDS_PER_PAGE)")
+    parser.add_argument("--cols", type=int, default=COLS, help="Card columns per sheet (COLS)")
+    parser.add_argument("--rows", type=int, default=ROWS, help="Card rows per sheet, fronts and backs (ROWS)")
+    parser.add_argument("--card-width", type=float, default=CARD_W_MM, help="Card width in mm")
+    parser.add_argument("--card-height", type=float, default=CARD_H_MM, help="Card height in mm")
+    parser.add_argument("--page-width", type=float, default=PAGE_W_MM, help="Sheet width in mm")
+    parser.add_argument("--page-height", type=float, default=PAGE_H_MM, help="Sheet height in mm")
+    parser.add_argument("--first-col-x", type=float, default=FIRST_COL_X_MM, help="Left edge of the first column in mm")
+    parser.add_argument("--row-tops", type=float, nargs="+", default=None,
+                        help="Top of each row in mm; spread evenly when the grid differs from the template")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS, help="Rasterisation processes")
+    parser.add_argument("--encoding", choices=ENCODING_MODES, default="inline",
+                        help="How card images are embedded (inline = lossless, as before)")
+    parser.add_argument("--jpeg-quality", type=int, default=ImageEncoding().quality, help="JPEG quality (1-95)")
+    parser.add_argument("--downsample-dpi", type=int, default=None,
+                        help="Resample card images to this DPI before embedding (jpeg/flate only)")
+    return parser.parse_args(argv)
+
+def geometry_from_args(args):
+    """Build the sheet geometry from parsed CLI arguments."""
+    row_tops = args.row_tops
+    if row_tops is None:
+        if (args.rows, args.card_height, args.page_height) == (ROWS, CARD_H_MM, PAGE_H_MM):
+            row_tops = ROW_TOPS_MM
+        else:
+            row_tops = even_row_tops(args.rows, args.card_height, args.page_height)
+    kids_per_page = args.kids_per_page
+    if kids_per_page is None:
+        kids_per_page = KIDS_PER_PAGE if (args.cols, args.rows) == (COLS, ROWS) else args.cols * (args.rows // 2)
+    return SheetGeometry(
+        page_w_mm=args.page_width,
+        page_h_mm=args.page_height,
+        card_w_mm=args.card_width,
+        card_h_mm=args.card_height,
+        cols=args.cols,
+        rows=args.rows,
+        kids_per_page=kids_per_page,
+        first_col_x_mm=args.first_col_x,
+        row_tops_mm=tuple(row_tops),
+        dpi=args.dpi,
+    )
+
+def main(argv=None):
+    args = _parse_args(argv)
+    try:
+        geometry = geometry_from_args(args)
+        validate_geometry(geometry)
+        encoding = ImageEncoding(args.encoding, args.jpeg_quality, args.downsample_dpi)
+        validate_encoding(encoding)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 2
+
+    started = time.perf_counter()
+    try:
+        pages = make_sheets(args.folders, args.output, log_fn=print, workers=args.workers,
+                            geometry=geometry, template_path=args.template, encoding=encoding)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return 1
+
+    for page in pages:
+        print(f"⏱ Page {page.number}: {page.cards} card(s) in {page.seconds:.2f}s, "
+              f"{page.bytes / 1024:.0f} KB")
+    total = time.perf_counter() - started
+    cards = sum(page.cards for page in pages)
+    size = os.path.getsize(args.output)
+    print(f"⏱ {len(pages)} page(s), {cards} card(s) in {total:.2f}s, "
+          f"{size / 1024:.0f} KB total ({size / len(pages) / 1024:.0f} KB per page)")
+    return 0
 
 # ---------------- GUI ----------------
+# tkinter is imported once, by _import_tkinter() when the GUI starts, so the
+# CLI and make_sheets run headless.
+tk = filedialog = messagebox = None
+
+def _import_tkinter():
+    global tk, filedialog, messagebox
+    if tk is None:
+        import tkinter
+        from tkinter import filedialog as _filedialog, messagebox as _messagebox
+        tk, filedialog, messagebox = tkinter, _filedialog, _messagebox
+
 class App:
     def __init__(self, root):
+        _import_tkinter()
         self.root = root
         root.title("A3 ID Card Combiner — Final Continuous Version")
         root.geometry("800x550")
@@ -169,9 +466,17 @@ class App:
         except Exception as e:
             self.logit(f"❌ Error: {e}")
             messagebox.showerror("Error", str(e))
+        else:
+            messagebox.showinfo("Success", f"Combined PDF created:\n{out}")
 
 # ---------------- MAIN ----------------
-if __name__ == "__main__":
+def run_gui():
+    _import_tkinter()
     root = tk.Tk()
     App(root)
     root.mainloop()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        raise SystemExit(main())
+    run_gui()
@@ -11,6 +11,8 @@ from PIL import ImageFont
 from xml.dom.minidom import Document, Element, Node, parse
 
 from doc_maker import callInkscape
+import output_manifest
+import stage_timing
 
 
 DEFAULT_TEMPLATE_ROOT = Path(r"\\pixartnas\home\INTERNAL_PROCESSING\ALL ID CARD SRC")
@@ -1277,6 +1279,7 @@ def _guardian_type(value: object) -> Optional[int]:
     return None
 
 
+@stage_timing.timed()
 def _copy_photo(source: Path, destination_dir: Path) -> Optional[str]:
     if not source.exists():
         return None
@@ -1290,6 +1293,7 @@ def _copy_photo(source: Path, destination_dir: Path) -> Optional[str]:
     return relative_path.as_posix()
 
 
+@stage_timing.timed()
 def _prepare_working_directory(template_dir: Path, working_dir: Path) -> None:
     if working_dir.exists():
         shutil.rmtree(working_dir)
@@ -1300,6 +1304,7 @@ TextUpdate = Tuple[str, Optional[int], float]
 ExtendedTextUpdate = Tuple[str, Optional[int], float, Optional[int]]
 
 
+@stage_timing.timed()
 def _process_svg(
     svg_path: Path,
     updates: Dict[str, Union[TextUpdate, ExtendedTextUpdate]],
@@ -1572,6 +1577,7 @@ def personalize_id_card(
     }
 
     generated = False
+    front_pdf_path = back_pdf_path = None
 
     if front_template is not None:
         front_svg_path = working_dir / front_template.name
@@ -1587,6 +1593,9 @@ def personalize_id_card(
         callInkscape(str(back_svg_path), str(back_pdf_path))
         generated = True
 
+    if generated:
+        output_manifest.record_output(school_output_dir, child_output_dir.name, front_pdf_path, back_pdf_path)
+
     return generated
 
 
@@ -0,0 +1,251 @@
+"""Background jobs for the processing UI.
+
+Generation and merge runs are submitted to a ``JobEngine``, which runs at
+most ``max_workers`` of them at once and queues the rest in submission order.
+Each job function receives its ``Job`` handle: it reports progress and status
+through it and checks it for cancellation between items. Events are put on a
+queue and only delivered to listeners by ``dispatch()``, which the UI calls
+from Tk's ``after()`` loop, so listeners may touch widgets freely.
+``ProgressBoard`` turns a job's progress events into per-stage throughput,
+ETA, current school and failure counts for the progress panel.
+"""
+import itertools
+import queue
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+JOB_WORKERS = 1
+
+QUEUED = "queued"
+STARTED = "started"
+PROGRESS = "progress"
+STATUS = "status"
+FINISHED = "finished"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by ``Job.check()`` once it has been cancelled."""
+
+
+class JobEvent(NamedTuple):
+    job_id: int
+    job: str
+    kind: str
+    stage: Optional[str] = None
+    done: int = 0
+    total: Optional[int] = None
+    message: str = ""
+    level: str = "green"
+    school: Optional[str] = None
+    failed: int = 0
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise JobCancelled()
+
+
+class Job:
+    """Handle passed to a job function, and returned by ``JobEngine.submit``."""
+
+    def __init__(self, engine, job_id: int, name: str):
+        self.id = job_id
+        self.name = name
+        self.token = CancelToken()
+        self.future = None
+        self._engine = engine
+
+    @property
+    def cancelled(self) -> bool:
+        return self.token.cancelled
+
+    def check(self) -> None:
+        self.token.check()
+
+    def emit(self, kind, **fields) -> None:
+        self._engine.post(JobEvent(self.id, self.name, kind, **fields))
+
+    def progress(self, stage: str, done: int, total: Optional[int] = None, message: str = "",
+                 school: Optional[str] = None, failed: int = 0) -> None:
+        """Report ``done`` of ``total`` items of ``stage``, ``failed`` of them failed so far."""
+        self.emit(PROGRESS, stage=stage, done=done, total=total, message=message,
+                  school=school, failed=failed)
+
+    def status(self, message: str, level: str = "green") -> None:
+        self.emit(STATUS, message=message, level=level)
+
+    def cancel(self) -> None:
+        self.token.cancel()
+        # A job that has not started yet is dropped from the queue at once.
+        if self.future is not None and self.future.cancel():
+            self._engine._forget(self)
+            self.emit(CANCELLED)
+
+
+class JobEngine:
+    def __init__(self, max_workers=JOB_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._events = queue.Queue()
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._listeners: List[Callable[[JobEvent], None]] = []
+        self._ids = itertools.count(1)
+
+    def subscribe(self, listener: Callable[[JobEvent], None]) -> None:
+        self._listeners.append(listener)
+
+    def post(self, event: JobEvent) -> None:
+        """Queue ``event`` for the next ``dispatch()``; safe from any thread."""
+        self._events.put(event)
+
+    def submit(self, name: str, fn, *args, **kwargs) -> Job:
+        """Queue ``fn(job, *args, **kwargs)`` and return its ``Job``."""
+        job = Job(self, next(self._ids), name)
+        with self._lock:
+            self._jobs[job.id] = job
+        job.emit(QUEUED)
+        job.future = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        try:
+            job.check()
+            job.emit(STARTED)
+            result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            job.emit(CANCELLED)
+        except Exception as exc:
+            traceback.print_exc()
+            job.emit(FAILED, message=str(exc), level="red")
+        else:
+            job.emit(FINISHED)
+            return result
+        finally:
+            self._forget(job)
+
+    def _forget(self, job) -> None:
+        with self._lock:
+            self._jobs.pop(job.id, None)
+
+    def active(self) -> List[Job]:
+        """Running and queued jobs, oldest first."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel_all(self) -> int:
+        jobs = self.active()
+        for job in jobs:
+            job.cancel()
+        return len(jobs)
+
+    def dispatch(self) -> int:
+        """Deliver queued events to the listeners; call from the UI thread."""
+        delivered = 0
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                return delivered
+            for listener in self._listeners:
+                try:
+                    listener(event)
+                except Exception:
+                    traceback.print_exc()
+            delivered += 1
+
+    def shutdown(self, wait=True) -> None:
+        self.cancel_all()
+        self._pool.shutdown(wait=wait)
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return "%dh %02dm" % (seconds // 3600, seconds % 3600 // 60)
+    return "%dm %02ds" % (seconds // 60, seconds % 60)
+
+
+class StageProgress:
+    """Running totals of one stage of a job."""
+
+    def __init__(self, stage: str, started: float):
+        self.stage = stage
+        self.started = started
+        self.done = 0
+        self.total: Optional[int] = None
+        self.failed = 0
+        self.school: Optional[str] = None
+
+    def items_per_minute(self, now: float) -> Optional[float]:
+        elapsed = now - self.started
+        if self.done <= 0 or elapsed <= 0:
+            return None
+        return self.done * 60.0 / elapsed
+
+    def eta(self, now: float) -> Optional[float]:
+        """Seconds left at the current rate, or None when unknown."""
+        rate = self.items_per_minute(now)
+        if rate is None or self.total is None:
+            return None
+        return max(0, self.total - self.done) * 60.0 / rate
+
+    def describe(self, now: float) -> str:
+        parts = ["%s: %d" % (self.stage, self.done) + ("/%d" % self.total if self.total is not None else "")]
+        rate = self.items_per_minute(now)
+        if rate is not None:
+            parts.append("%.1f/min" % rate)
+        eta = self.eta(now)
+        if eta is not None and self.done < (self.total or 0):
+            parts.append("ETA " + format_duration(eta))
+        if self.school:
+            parts.append(self.school)
+        if self.failed:
+            parts.append("%d failed" % self.failed)
+        return " | ".join(parts)
+
+
+class ProgressBoard:
+    """Per-stage progress of the job currently running, fed with its events."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.job_id: Optional[int] = None
+        self.stages: Dict[str, StageProgress] = OrderedDict()
+
+    def update(self, event: JobEvent) -> Optional[StageProgress]:
+        """Apply ``event``; returns the stage it changed, if any.
+
+        A STARTED event resets the board for the new job.
+        """
+        if event.kind == STARTED:
+            self.job_id = event.job_id
+            self.stages.clear()
+            return None
+        if event.kind != PROGRESS or event.job_id != self.job_id:
+            return None
+        stage = self.stages.get(event.stage)
+        if stage is None:
+            stage = self.stages[event.stage] = StageProgress(event.stage, self.clock())
+        stage.done = event.done
+        stage.total = event.total
+        stage.failed = event.failed
+        if event.school:
+            stage.school = event.school
+        return stage
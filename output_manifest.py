@@ -0,0 +1,197 @@
+"""Per-school manifests of generated PDFs, read by the merge step.
+
+Generators append one JSON line per child to ``<school dir>/manifest.jsonl``
+as they write its PDFs, so Merge can list a school's outputs without
+walking every child folder. Only the process driving a run writes
+manifests (cover workers hand their outputs back to it), and writes within
+it are serialised by a lock. The first write to a school seeds the manifest
+from what is already on disk. A manifest is only trusted while its school
+folder has not changed since it was written; otherwise the folder is
+scanned again and any PDFs the manifest misses, such as ones copied in by
+hand or left by an older run, are added to it. Schools without a manifest
+are still found by an ``os.scandir`` walk, run for several schools at once.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+MANIFEST_NAME = "manifest.jsonl"
+SCAN_WORKERS = 8
+
+
+class ManifestEntry(NamedTuple):
+    child: str
+    front: Optional[str]  # relative to the school folder, "/" separated
+    back: Optional[str]
+    time: float
+
+
+def manifest_path(school_dir) -> Path:
+    return Path(school_dir) / MANIFEST_NAME
+
+
+def scan_child_entries(school_dir) -> List[ManifestEntry]:
+    """``<school>/<child>/*_FRONT.pdf`` and ``*_BACK.pdf`` (ID and report cards)."""
+    entries = []
+    with os.scandir(school_dir) as children:
+        for child in children:
+            if not child.is_dir() or child.name.lower() in {"working"}:
+                continue
+            front = back = None
+            with os.scandir(child.path) as files:
+                names = sorted((f.name for f in files if f.name.lower().endswith(".pdf")), key=str.lower)
+            for name in names:
+                upper_name = name.upper()
+                if upper_name.endswith("_FRONT.PDF"):
+                    front = child.name + "/" + name
+                elif upper_name.endswith("_BACK.PDF"):
+                    back = child.name + "/" + name
+            if front is not None or back is not None:
+                entries.append(ManifestEntry(child.name, front, back, 0.0))
+    return entries
+
+
+def scan_flat_entries(school_dir) -> List[ManifestEntry]:
+    """``<school>/*.pdf``, one entry per file (covers)."""
+    with os.scandir(school_dir) as files:
+        return [
+            ManifestEntry(os.path.splitext(f.name)[0], f.name, None, 0.0)
+            for f in files
+            if f.name.lower().endswith(".pdf") and f.is_file()
+        ]
+
+
+def _relative(school_dir, path):
+    if path is None:
+        return None
+    return Path(os.path.relpath(str(path), str(school_dir))).as_posix()
+
+
+_write_lock = threading.Lock()
+
+
+def _append(path, entries) -> None:
+    with open(path, "a", encoding="utf-8") as handle:
+        handle.write("".join(json.dumps(entry._asdict()) + "\n" for entry in entries))
+
+
+def record_output(school_dir, child, front=None, back=None, flat=False) -> None:
+    """Append ``child``'s PDFs to the school's manifest, seeding it on first use."""
+    path = manifest_path(school_dir)
+    entry = ManifestEntry(str(child), _relative(school_dir, front), _relative(school_dir, back), time.time())
+    with _write_lock:
+        entries = []
+        if not path.exists():
+            scan = scan_flat_entries if flat else scan_child_entries
+            entries.extend(scan(school_dir))
+        entries.append(entry)
+        _append(path, entries)
+
+
+def read_manifest(school_dir) -> Optional[Dict[str, ManifestEntry]]:
+    """Latest entry per child, or None when the school has no manifest."""
+    try:
+        with open(manifest_path(school_dir), encoding="utf-8") as handle:
+            raw_lines = handle.read().splitlines()
+    except OSError:
+        return None
+    entries = {}
+    for line in raw_lines:
+        try:
+            entry = ManifestEntry(**json.loads(line))
+        except (ValueError, TypeError):
+            continue
+        entries[entry.child] = entry
+    return entries
+
+
+def _is_stale(school_dir, entries, flat) -> bool:
+    """Whether the school folder changed after its manifest was last written."""
+    try:
+        if os.stat(school_dir).st_mtime > manifest_path(school_dir).stat().st_mtime:
+            return True
+        if flat:
+            with os.scandir(school_dir) as files:
+                return sum(1 for f in files if f.name.lower().endswith(".pdf")) != len(entries)
+    except OSError:
+        return False
+    return False
+
+
+def reconcile(school_dir, flat=False) -> Optional[Dict[str, ManifestEntry]]:
+    """``read_manifest``, plus PDFs on disk that the manifest does not list.
+
+    Missing entries are appended to the manifest so later reads find them
+    without scanning. Returns None when the school has no manifest.
+    """
+    entries = read_manifest(school_dir)
+    if entries is None or not _is_stale(school_dir, entries, flat):
+        return entries
+
+    scan = scan_flat_entries if flat else scan_child_entries
+    missing = []
+    for found in scan(school_dir):
+        known = entries.get(found.child)
+        if known is None:
+            merged = found
+        elif (found.front and not known.front) or (found.back and not known.back):
+            merged = ManifestEntry(found.child, known.front or found.front, known.back or found.back, 0.0)
+        else:
+            continue
+        missing.append(merged._replace(time=time.time()))
+        entries[found.child] = missing[-1]
+
+    with _write_lock:
+        if missing:
+            print(f"Manifest for {school_dir} was missing {len(missing)} PDF(s); added them.")
+            _append(manifest_path(school_dir), missing)
+        else:
+            # Mark the manifest as checked against the folder as it is now.
+            try:
+                os.utime(manifest_path(school_dir))
+            except OSError:
+                pass
+    return entries
+
+
+def _existing(school_dir, relative):
+    if relative is None:
+        return None
+    path = Path(school_dir) / relative
+    return path if path.is_file() else None
+
+
+def child_pdf_paths(school_dir) -> List[Path]:
+    """FRONT then BACK PDF of every child, children in name order."""
+    entries = reconcile(school_dir)
+    if entries is None:
+        entries = {entry.child: entry for entry in scan_child_entries(school_dir)}
+    pdf_paths: List[Path] = []
+    for child in sorted(entries, key=str.lower):
+        for relative in (entries[child].front, entries[child].back):
+            path = _existing(school_dir, relative)
+            if path is not None:
+                pdf_paths.append(path)
+    return pdf_paths
+
+
+def flat_pdf_paths(school_dir) -> List[Path]:
+    """Every PDF directly in ``school_dir``, in name order."""
+    entries = reconcile(school_dir, flat=True)
+    if entries is None:
+        entries = {entry.child: entry for entry in scan_flat_entries(school_dir)}
+    paths = [_existing(school_dir, entry.front) for entry in entries.values()]
+    return sorted((path for path in paths if path is not None), key=lambda path: path.name.lower())
+
+
+def resolve_many(school_dirs: Sequence[Path], resolver: Callable[[Path], List[Path]],
+                 workers: int = SCAN_WORKERS) -> List[List[Path]]:
+    """Run ``resolver`` over several school folders at once, keeping their order."""
+    if len(school_dirs) <= 1:
+        return [resolver(school_dir) for school_dir in school_dirs]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(resolver, school_dirs))
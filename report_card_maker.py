@@ -6,6 +6,7 @@ from pathlib import Path
 from typing import Dict, Iterable, Iterator, Optional, Sequence, Set, Tuple
 
 from doc_maker import callInkscape
+import output_manifest
 from id_card_maker import (
     DEFAULT_PHOTO_ROOT,
     TemplateNotFoundError,
@@ -324,6 +325,7 @@ def personalize_report_card(
     }
 
     generated = False
+    front_pdf_path = back_pdf_path = None
 
     if front_template is not None:
         front_svg_path = working_dir / front_template.name
@@ -339,6 +341,9 @@ def personalize_report_card(
         callInkscape(str(back_svg_path), str(back_pdf_path))
         generated = True
 
+    if generated:
+        output_manifest.record_output(school_output_dir, child_output_dir.name, front_pdf_path, back_pdf_path)
+
     return generated
 
 
@@ -0,0 +1,200 @@
+"""Parsed book, ID card and report card sheets, shared across the UI.
+
+``read_excel`` on a large workbook takes seconds, and the UI used to parse
+the same file each time another sheet was picked and again in ``make()``.
+``SheetCache`` parses each file once per ``(path, mtime, size)`` and hands
+out copies. With pyarrow installed, the parsed frame is also written as a
+Feather sidecar under ``CACHE_ROOT`` so the next run skips the parse too.
+
+Sidecars live in ``sheet_cache/`` under the working directory. Writing a
+sheet's sidecar removes the ones for its earlier versions, and the first
+sheet a ``SheetCache`` loads prunes sidecars not read for
+``MAX_UNUSED_DAYS``. Deleting the folder clears the cache; sheets are
+parsed again on next use.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (pandas' Feather support)
+    HAVE_FEATHER = True
+except ImportError:
+    HAVE_FEATHER = False
+
+CACHE_ROOT = "sheet_cache"
+MAX_UNUSED_DAYS = 30
+
+
+class SheetKey(NamedTuple):
+    path: str
+    mtime_ns: int
+    size: int
+
+
+def sheet_key(path) -> SheetKey:
+    st = os.stat(path)
+    return SheetKey(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+def read_sheet(path, **kwargs) -> pd.DataFrame:
+    """Load a spreadsheet or CSV file based on its extension."""
+    if Path(path).suffix.lower() == ".csv":
+        return pd.read_csv(path, **kwargs)
+    return pd.read_excel(path, **kwargs)
+
+
+def school_names(df: pd.DataFrame) -> Set[str]:
+    """Non-blank, stripped ``school_name`` values of ``df``."""
+    if "school_name" not in df.columns:
+        return set()
+    names = df["school_name"].dropna().astype(str).str.strip()
+    return set(names[names != ""])
+
+
+def selection_mask(df: pd.DataFrame, school_names: Iterable[str] = (),
+                   user_id: Optional[str] = None, book_id: Optional[int] = None) -> pd.Series:
+    """Rows of ``df`` picked in the UI, as a boolean Series aligned with ``df``.
+
+    A user id or book id selects that kid alone; otherwise rows whose stripped
+    ``school_name`` is one of ``school_names`` are selected.
+    """
+    def column(name):
+        return df[name] if name in df.columns else pd.Series(None, index=df.index, dtype=object)
+
+    if user_id is not None:
+        return column("user_id").astype(str).str.strip() == user_id
+    if book_id is not None:
+        numbers = pd.to_numeric(column("book_id"), errors="coerce")
+        return pd.Series(np.trunc(numbers) == book_id, index=df.index)
+    schools = column("school_name").fillna("").astype(str).str.strip()
+    return schools.isin(set(school_names))
+
+
+class SheetCache:
+    """Parsed sheets, reused while the file on disk is unchanged."""
+
+    def __init__(self, root=CACHE_ROOT, sidecars=HAVE_FEATHER, max_unused_days=MAX_UNUSED_DAYS):
+        self.root = root
+        self.sidecars = sidecars
+        self.max_unused_days = max_unused_days
+        self._lock = threading.Lock()
+        self._frames: Dict[Tuple[str, str], Tuple[SheetKey, pd.DataFrame]] = {}
+        self._schools: Dict[Tuple[str, str], Set[str]] = {}
+        # Pruned on first use rather than here: the UI builds its cache at import time.
+        self._pruned = False
+
+    def _sidecar_prefix(self, key: SheetKey, options: str) -> str:
+        return hashlib.sha1(json.dumps([key.path, options]).encode("utf-8")).hexdigest() + "_"
+
+    def _sidecar_path(self, key: SheetKey, options: str) -> str:
+        prefix = self._sidecar_prefix(key, options)
+        return os.path.join(self.root, "%s%d_%d.feather" % (prefix, key.mtime_ns, key.size))
+
+    def prune(self, now=None) -> int:
+        """Delete sidecars (and stray partial writes) not read for ``max_unused_days``.
+
+        Returns how many files were removed.
+        """
+        cutoff = (time.time() if now is None else now) - self.max_unused_days * 86400
+        removed = 0
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def _read_sidecar(self, key, options) -> Optional[pd.DataFrame]:
+        if not self.sidecars:
+            return None
+        path = self._sidecar_path(key, options)
+        try:
+            df = pd.read_feather(path)
+        except Exception:
+            return None
+        try:
+            # The sidecar's mtime is its last use for prune.
+            os.utime(path)
+        except OSError:
+            pass
+        return df
+
+    def _write_sidecar(self, key, options, df) -> None:
+        if not self.sidecars:
+            return
+        path = self._sidecar_path(key, options)
+        partial = path + ".%d.tmp" % os.getpid()
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            df.to_feather(partial)
+            os.replace(partial, path)
+        except Exception as exc:
+            # Mixed-type columns cannot be stored; the in-memory copy still is.
+            print(f"Sheet cache sidecar skipped for {key.path}: {exc}")
+            if os.path.exists(partial):
+                os.remove(partial)
+            return
+        # Earlier versions of this sheet can never match again.
+        prefix = self._sidecar_prefix(key, options)
+        for name in os.listdir(self.root):
+            if name.startswith(prefix) and name.endswith(".feather") and name != os.path.basename(path):
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except OSError:
+                    pass
+
+    def _frame(self, path, kwargs) -> Tuple[Tuple[str, str], pd.DataFrame]:
+        key = sheet_key(path)
+        options = json.dumps(kwargs, sort_keys=True, default=str)
+        slot = (key.path, options)
+        with self._lock:
+            cached = self._frames.get(slot)
+            prune = not self._pruned
+            self._pruned = True
+        if prune:
+            self.prune()
+        if cached is not None and cached[0] == key:
+            return slot, cached[1]
+
+        df = self._read_sidecar(key, options)
+        if df is None:
+            df = read_sheet(path, **kwargs)
+            self._write_sidecar(key, options, df)
+        with self._lock:
+            self._frames[slot] = (key, df)
+            self._schools.pop(slot, None)
+        return slot, df
+
+    def load(self, path, **kwargs) -> pd.DataFrame:
+        """A private copy of the parsed sheet; callers may modify it."""
+        return self._frame(path, kwargs)[1].copy()
+
+    def schools(self, path, **kwargs) -> Set[str]:
+        """School names listed in the sheet."""
+        slot, df = self._frame(path, kwargs)
+        with self._lock:
+            names = self._schools.get(slot)
+        if names is None:
+            names = school_names(df)
+            with self._lock:
+                self._schools[slot] = names
+        return set(names)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+            self._schools.clear()
@@ -0,0 +1,232 @@
+"""Wall-clock timings of the generation and merge stages.
+
+Stages are timed with the ``timed`` decorator or the ``timer`` context
+manager and aggregated in ``TIMINGS``: call count, total, min, max and a
+histogram per stage, plus the ``TOP_N`` slowest timings that were tagged
+with a record (a child's user id, a book id, a school). ``write_summary``
+dumps all of it as JSON and CSV at the end of a run.
+
+Timings are kept per process. Work sent to the cover and binder process
+pools goes through ``run_timed``, which hands the worker's timings back
+with its result for the parent to ``merge`` into ``TIMINGS``.
+"""
+import csv
+import functools
+import heapq
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+TIMINGS_ROOT = "stage_timings"
+TOP_N = 20
+# Histogram bucket upper bounds, in seconds; the last bucket is open.
+BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+
+
+class SlowRecord(NamedTuple):
+    seconds: float
+    stage: str
+    record: str
+
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max = 0.0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                break
+        else:
+            index = len(BUCKETS)
+        self.histogram[index] += 1
+
+    def merge(self, other: "StageStats") -> None:
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.histogram = [mine + theirs for mine, theirs in zip(self.histogram, other.histogram)]
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total": round(self.total, 6),
+            "mean": round(self.total / self.count, 6) if self.count else 0.0,
+            "min": round(self.min or 0.0, 6),
+            "max": round(self.max, 6),
+            "histogram": dict(zip(bucket_labels(), self.histogram)),
+        }
+
+
+def bucket_labels() -> List[str]:
+    return ["<=%gs" % bound for bound in BUCKETS] + [">%gs" % BUCKETS[-1]]
+
+
+class StageTimer:
+    """Thread-safe collector of stage timings for one run."""
+
+    def __init__(self, top_n=TOP_N):
+        self.top_n = top_n
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages: Dict[str, StageStats] = {}
+            self._slowest: List[SlowRecord] = []
+            self.started = time.time()
+
+    def add(self, stage: str, seconds: float, record=None) -> None:
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+            stats.add(seconds)
+            if record is not None:
+                self._rank(SlowRecord(seconds, stage, str(record)))
+
+    def _rank(self, entry: SlowRecord) -> None:
+        if len(self._slowest) < self.top_n:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    def export(self) -> Tuple[Dict[str, StageStats], List[SlowRecord]]:
+        """Picklable copy of the stages and slowest records, for ``merge`` in another process."""
+        with self._lock:
+            return dict(self.stages), list(self._slowest)
+
+    def merge(self, exported: Tuple[Dict[str, StageStats], List[SlowRecord]]) -> None:
+        """Fold timings ``export``-ed by another timer (a pool worker's) into this one."""
+        stages, slowest = exported
+        with self._lock:
+            for stage, other in stages.items():
+                stats = self.stages.get(stage)
+                if stats is None:
+                    stats = self.stages[stage] = StageStats()
+                stats.merge(other)
+            for entry in slowest:
+                self._rank(SlowRecord(*entry))
+
+    @contextmanager
+    def timer(self, stage: str, record=None):
+        """Time the ``with`` body as ``stage``.
+
+        A stage entered again on the same thread while it is already being
+        timed (``callInkscape`` retrying itself) is only counted once.
+        """
+        active = self._local.__dict__.setdefault("active", set())
+        if stage in active:
+            yield
+            return
+        active.add(stage)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            active.discard(stage)
+            self.add(stage, time.perf_counter() - start, record)
+
+    def slowest(self) -> List[SlowRecord]:
+        with self._lock:
+            return sorted(self._slowest, reverse=True)
+
+    def summary(self) -> dict:
+        with self._lock:
+            stages = {name: stats.as_dict() for name, stats in sorted(self.stages.items())}
+        return {
+            "started": self.started,
+            "elapsed": round(time.time() - self.started, 3),
+            "stages": stages,
+            "slowest": [entry._asdict() for entry in self.slowest()],
+        }
+
+    def write_summary(self, name: str, root=TIMINGS_ROOT) -> Tuple[str, str]:
+        """Write ``<root>/<name>.json`` and ``<root>/<name>.csv``; returns both paths."""
+        os.makedirs(root, exist_ok=True)
+        summary = self.summary()
+        json_path = os.path.join(root, name + ".json")
+        with open(json_path, "w", encoding="utf-8") as handle:
+            json.dump(summary, handle, indent=1)
+
+        csv_path = os.path.join(root, name + ".csv")
+        with open(csv_path, "w", newline="", encoding="utf-8") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(["stage", "count", "total", "mean", "min", "max"] + bucket_labels())
+            for stage, stats in summary["stages"].items():
+                writer.writerow(
+                    [stage, stats["count"], stats["total"], stats["mean"], stats["min"], stats["max"]]
+                    + list(stats["histogram"].values())
+                )
+        return json_path, csv_path
+
+    def report(self, limit=10) -> str:
+        """Short text summary for the console: total per stage, then the slowest records."""
+        lines = []
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: item[1].total, reverse=True)
+            for stage, stats in stages:
+                lines.append("%-40s %6d x %8.3fs = %9.2fs" % (stage, stats.count, stats.total / stats.count, stats.total))
+        for entry in self.slowest()[:limit]:
+            lines.append("slow: %8.2fs %s %s" % (entry.seconds, entry.stage, entry.record))
+        return "\n".join(lines)
+
+
+TIMINGS = StageTimer()
+
+
+def timer(stage: str, record=None):
+    return TIMINGS.timer(stage, record)
+
+
+class TimedResult(NamedTuple):
+    value: object
+    timings: Tuple[Dict[str, StageStats], List[SlowRecord]]
+
+
+def run_timed(stage: str, record, fn, *args, **kwargs) -> TimedResult:
+    """Call ``fn`` in a pool worker, timed as ``stage``, and return its result with the timings.
+
+    The call gets a fresh ``TIMINGS`` so only its own stages are returned;
+    the parent adds them to its timer with ``TIMINGS.merge(result.timings)``.
+    Not for use on a thread of the process whose timings it would hide.
+    """
+    global TIMINGS
+    outer = TIMINGS
+    TIMINGS = StageTimer(outer.top_n)
+    try:
+        with TIMINGS.timer(stage, record):
+            value = fn(*args, **kwargs)
+        return TimedResult(value, TIMINGS.export())
+    finally:
+        TIMINGS = outer
+
+
+def timed(stage: Optional[str] = None):
+    """Decorator timing every call of a function as ``stage`` in ``TIMINGS``.
+
+    ``stage`` defaults to ``<module>.<function name>``.
+    """
+    def decorate(fn):
+        name = stage or "%s.%s" % (fn.__module__, fn.__name__)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with TIMINGS.timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import cover_assets
+from cover_assets import AssetCache
+
+
+class AssetCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.source = self.root / "logo.jpg"
+        Image.new("CMYK", (8, 8), (0, 255, 0, 0)).save(self.source)
+        (self.root / "out").mkdir()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _cache(self):
+        return AssetCache(root=str(self.root / "cache"), workers=2)
+
+    def test_images_are_converted_to_rgb(self):
+        failures = self._cache().copy_assets([(str(self.source), str(self.root / "out" / "logo.jpg"))])
+        self.assertEqual(failures, [])
+        with Image.open(self.root / "out" / "logo.jpg") as img:
+            self.assertEqual(img.mode, "RGB")
+
+    def test_unchanged_assets_are_not_decoded_again(self):
+        pairs = [(str(self.source), str(self.root / "out" / "logo.jpg"))]
+        self._cache().copy_assets(pairs)
+
+        with mock.patch.object(cover_assets, "convert_cmyk_to_rgb") as convert:
+            self.assertEqual(self._cache().copy_assets(pairs), [])
+        convert.assert_not_called()
+
+    def test_changed_source_is_converted_again(self):
+        pairs = [(str(self.source), str(self.root / "out" / "logo.jpg"))]
+        self._cache().copy_assets(pairs)
+
+        Image.new("CMYK", (16, 16), (0, 0, 255, 0)).save(self.source)
+        os.utime(self.source, ns=(0, 10**9))
+        self._cache().copy_assets(pairs)
+        with Image.open(self.root / "out" / "logo.jpg") as img:
+            self.assertEqual(img.size, (16, 16))
+
+    def _age_index(self, days):
+        index_path = self.root / "cache" / cover_assets.INDEX_NAME
+        index = json.loads(index_path.read_text(encoding="utf-8"))
+        for entry in index.values():
+            entry["used"] -= days * 86400
+        index_path.write_text(json.dumps(index), encoding="utf-8")
+
+    def test_conversions_unused_for_too_long_are_pruned_on_open(self):
+        pairs = [(str(self.source), str(self.root / "out" / "logo.jpg"))]
+        cache = self._cache()
+        cache.copy_assets(pairs)
+        converted = Path(cache.lookup(str(self.source)))
+        old_orphan = self.root / "cache" / "left_by_a_crash.jpg"
+        old_orphan.write_bytes(b"x")
+        stamp = time.time() - 100 * 86400
+        os.utime(old_orphan, (stamp, stamp))
+        young_orphan = self.root / "cache" / "still_converting.jpg"
+        young_orphan.write_bytes(b"x")
+
+        self._age_index(cover_assets.MAX_UNUSED_DAYS - 1)
+        self.assertIsNotNone(self._cache().lookup(str(self.source)))
+        self.assertFalse(old_orphan.exists())
+        self.assertTrue(young_orphan.exists())
+
+        self._age_index(cover_assets.MAX_UNUSED_DAYS + 1)
+        self.assertIsNone(self._cache().lookup(str(self.source)))
+        self.assertFalse(converted.exists())
+
+    def test_cache_hits_keep_an_asset_alive(self):
+        pairs = [(str(self.source), str(self.root / "out" / "logo.jpg"))]
+        self._cache().copy_assets(pairs)
+        self._age_index(cover_assets.MAX_UNUSED_DAYS - 1)
+        self._cache().copy_assets(pairs)
+
+        self._age_index(2)
+        self.assertIsNotNone(self._cache().lookup(str(self.source)))
+
+    def test_other_files_are_copied_verbatim(self):
+        font = self.root / "font.ttf"
+        font.write_bytes(b"not an image")
+        self._cache().copy_assets([(str(font), str(self.root / "out" / "font.ttf"))])
+        self.assertEqual((self.root / "out" / "font.ttf").read_bytes(), b"not an image")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,223 @@
+import multiprocessing
+import os
+import stat
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import fitz
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# test_id_card_maker may have installed a bare stub under this name.
+if not hasattr(sys.modules.get("doc_maker"), "write_svg"):
+    sys.modules.pop("doc_maker", None)
+
+import dc
+
+
+COVER = """<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" viewBox="0 0 800 600">
+  <g id="head"><image xlink:href="old.png"/></g>
+  <g id="name"><text>Name</text></g>
+</svg>
+"""
+
+
+class CoverTemplateTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        # Mirror the share layout: COVERS_ROOT/<prefix>/<outer_code>.svg
+        (root / "covers" / "001").mkdir(parents=True)
+        (root / "covers" / "001" / "0011234.svg").write_text(COVER)
+        self._root, dc.COVERS_ROOT = dc.COVERS_ROOT, str(root / "covers")
+        dc.clear_cover_cache()
+
+    def tearDown(self):
+        dc.COVERS_ROOT = self._root
+        dc.clear_cover_cache()
+        self._tmp.cleanup()
+
+    def test_cover_path_is_built_from_components(self):
+        self.assertEqual(
+            dc.cover_svg_path("0011234"), os.path.join(dc.COVERS_ROOT, "001", "0011234.svg")
+        )
+        self.assertTrue(os.path.isfile(dc.cover_svg_path("0011234")))
+
+    def test_cover_is_parsed_once_per_outer_code_and_colours(self):
+        first = dc.cover_template("0011234", "#ff0000", "#00ff00")
+        self.assertIs(dc.cover_template("0011234", "#ff0000", "#00ff00"), first)
+        self.assertIsNot(dc.cover_template("0011234", "#000000", "#00ff00"), first)
+
+    def test_static_decorations_are_prebuilt(self):
+        template = dc.cover_template("0011234", "#ff0000", "#00ff00")
+        root = template.doc.documentElement
+        fills = [rect.getAttribute("fill") for rect in root.getElementsByTagName("rect")]
+        self.assertEqual(fills, ["#ff0000", "#00ff00"])
+        self.assertEqual(len(root.getElementsByTagName("line")), 2)
+        self.assertEqual(dc.resolve_path(template.doc, template.anchor).tagName, "line")
+        self.assertEqual(sorted(template.layers), ["head", "name"])
+
+    def test_box_stickers_only_get_their_page_size(self):
+        (Path(self._tmp.name) / "covers" / "001" / "0011234b.svg").write_text(COVER)
+        template = dc.cover_template("0011234b", "#ff0000", "#00ff00")
+        svg = template.doc.documentElement
+        self.assertEqual(svg.getAttribute("width"), "300mm")
+        self.assertEqual(svg.getElementsByTagName("rect").length, 0)
+        self.assertIsNone(template.anchor)
+
+
+STUB_INKSCAPE = """#!{python}
+import sys
+import fitz
+
+output = [arg.split("=", 1)[1] for arg in sys.argv if arg.startswith("--export-filename=")][0]
+doc = fitz.open()
+doc.new_page(width=200, height=100)
+doc.save(output)
+"""
+
+
+@unittest.skipUnless(
+    os.name != "nt" and multiprocessing.get_start_method() == "fork",
+    "workers must inherit the patched COVERS_ROOT and the stub inkscape on PATH",
+)
+class RenderCoversTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        (root / "covers" / "001").mkdir(parents=True)
+        (root / "covers" / "001" / "0011234.svg").write_text(COVER)
+        (root / "bin").mkdir()
+        inkscape = root / "bin" / "inkscape"
+        inkscape.write_text(STUB_INKSCAPE.format(python=sys.executable))
+        inkscape.chmod(inkscape.stat().st_mode | stat.S_IXUSR)
+
+        self._root, dc.COVERS_ROOT = dc.COVERS_ROOT, str(root / "covers")
+        self._cwd = os.getcwd()
+        path = str(root / "bin") + os.pathsep + os.environ.get("PATH", "")
+        self._path = mock.patch.dict(os.environ, {"PATH": path})
+        self._path.start()
+        dc.clear_cover_cache()
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._path.stop()
+        dc.COVERS_ROOT = self._root
+        dc.clear_cover_cache()
+        self._tmp.cleanup()
+
+    def _jobs(self):
+        jobs = []
+        for book in range(1, 5):
+            record = {"school_name": "Green Valley", "subject_name": "English", "first_name": "Kid%d" % book,
+                      "last_name": "Rao", "numsub": 2, "subidx": 1 + book % 2}
+            jobs.append(dc.CoverJob(
+                outer_code="0011234", photo_name="kid%d" % book, school_id=1, school_color_code1="#ff0000",
+                school_color_code2="#00ff00", grade_colour_code="#0000ff", kid_color_code1="#111111",
+                kid_color_code2="#222222", name="Kid%d Rao" % book, bookid=str(book).zfill(3), record=record,
+                copy_photo=False,
+            ))
+        return jobs
+
+    def _render(self, name, workers):
+        work = Path(self._tmp.name) / name
+        (work / "Temp" / "001").mkdir(parents=True)
+        os.chdir(work)
+        done = []
+        dc.stage_timing.TIMINGS.reset()
+        created, failures = dc.render_covers(self._jobs(), workers, on_done=lambda job, error: done.append(error))
+        os.chdir(self._cwd)
+        stages = dc.stage_timing.TIMINGS.stages
+        timed = {stage: stages[stage].count for stage in ("cover", "dc.callInkscape")}
+        school = work / "finalcovers" / "001_Green_Valley"
+        files = sorted(path.name for path in school.iterdir())
+        manifest = sorted(dc.output_manifest.read_manifest(school))
+        previews = sorted(path.name for path in (work / "Temp" / "001" / "PNG").iterdir())
+        return created, failures, done, files, manifest, previews, timed
+
+    def test_serial_and_parallel_runs_write_the_same_outputs(self):
+        serial = self._render("serial", 1)
+        parallel = self._render("parallel", 2)
+
+        created, failures, done, files, manifest, previews, timed = serial
+        self.assertEqual((created, failures, done), (4, [], [None] * 4))
+        self.assertEqual(len(files), 5)
+        self.assertIn("manifest.jsonl", files)
+        self.assertEqual(manifest, sorted(name[:-4] for name in files if name.endswith(".pdf")))
+        self.assertEqual(previews, ["002.png", "004.png"])
+        self.assertEqual(timed, {"cover": 4, "dc.callInkscape": 4})
+        self.assertEqual(parallel, serial)
+
+    def test_failures_are_reported_per_job(self):
+        jobs = self._jobs()
+        jobs[1] = jobs[1]._replace(outer_code="0019999")
+        work = Path(self._tmp.name) / "failing"
+        (work / "Temp" / "001").mkdir(parents=True)
+        os.chdir(work)
+        created, failures = dc.render_covers(jobs, 2)
+        self.assertEqual(created, 3)
+        self.assertEqual([job.bookid for job, _ in failures], ["002"])
+
+
+class CoverColourTests(unittest.TestCase):
+    def test_matches_per_row_lookup(self):
+        df = pd.DataFrame(
+            {"school_color_id": [0, 120, 57.0], "class_color_id": [3, 14, 0], "user_color_id": [12, 0, 110]}
+        )
+        colours = dc.cover_colours(df)
+        codes = dc.COLOR_CODES
+        for key, row in df.iterrows():
+            self.assertEqual(
+                colours.loc[key, dc.COLOUR_COLUMNS].tolist(),
+                [
+                    codes[int(int(row["school_color_id"]) / 11)],
+                    codes[int(row["school_color_id"]) % 11],
+                    codes[int(row["class_color_id"]) % 11],
+                    codes[int(int(row["user_color_id"]) / 11)],
+                    codes[int(row["user_color_id"] % 11)],
+                ],
+            )
+        self.assertFalse(colours["invalid"].any())
+
+    def test_flags_missing_and_out_of_range_ids(self):
+        df = pd.DataFrame(
+            {"school_color_id": [121, None, 4, 4], "class_color_id": [1, 1, -1, 1], "user_color_id": [1, 1, 1, "x"]}
+        )
+        colours = dc.cover_colours(df)
+        self.assertEqual(colours["invalid"].tolist(), [True, True, True, True])
+        self.assertTrue(colours[dc.COLOUR_COLUMNS].isna().all().all())
+
+
+class PreviewTests(unittest.TestCase):
+    def test_worker_rasterises_exported_pdf_at_preview_dpi(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_path = str(Path(tmp) / "cover.pdf")
+            png_path = str(Path(tmp) / "cover.png")
+            doc = fitz.open()
+            doc.new_page(width=144, height=72)
+            doc.save(pdf_path)
+            doc.close()
+
+            worker = dc.PreviewWorker()
+            worker.submit(dc.PreviewRequest(pdf_path, png_path))
+            worker.submit(None)
+            self.assertEqual(worker.close(), [])
+
+            pix = fitz.Pixmap(png_path)
+            self.assertEqual((pix.width, pix.height), (200, 100))
+
+    def test_failures_are_returned_on_close(self):
+        worker = dc.PreviewWorker()
+        worker.submit(dc.PreviewRequest("missing.pdf", "missing.png"))
+        failures = worker.close()
+        self.assertEqual([request.pdf_path for request, _ in failures], ["missing.pdf"])
+
+
+if __name__ == "__main__":
+    unittest.main()
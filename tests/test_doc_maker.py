@@ -0,0 +1,139 @@
+import sys
+import tempfile
+import unittest
+import unittest.mock
+from pathlib import Path
+from xml.dom import Node
+from xml.dom.minidom import parse, parseString
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# test_id_card_maker may have installed a bare stub under this name.
+if not hasattr(sys.modules.get("doc_maker"), "layer_paths"):
+    sys.modules.pop("doc_maker", None)
+
+import doc_maker
+from doc_maker import LAYER_IDS, layer_paths, resolve_path, write_svg
+
+
+TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<!-- page 1 -->
+<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">
+  <g id="Background"><rect width="10" height="10"/></g>
+  <g id="Head"><image xlink:href="old.png"/></g>
+  <g id="outer">
+    <g id="name"><text>Name</text></g>
+  </g>
+</svg>
+"""
+
+
+INKSCAPE_TEMPLATE = """<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN" "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">
+<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink"
+     xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape"
+     xmlns:sodipodi="http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd"
+     width="210mm" height="297mm" viewBox="0 0 793.7 1122.5" sodipodi:docname="page.svg">
+  <sodipodi:namedview id="base" inkscape:document-units="mm"/>
+  <g id="Head" inkscape:label="Head" inkscape:groupmode="layer">
+    <image xlink:href="../_assets/photo.png" width="80" height="100"/>
+  </g>
+  <g id="name" inkscape:label="Name" inkscape:groupmode="layer">
+    <text xml:space="preserve" style="font-family:Marvin;font-size:14px"><tspan x="10" y="20">Ananya &amp; Rāghav</tspan></text>
+  </g>
+</svg>
+"""
+
+
+def _content(node):
+    """What Inkscape reads from a node: name, namespaced attributes, text and children.
+
+    Whitespace-only text between elements is indentation and is left out.
+    """
+    if node.nodeType == Node.TEXT_NODE:
+        return node.data
+    attributes = sorted(
+        (attribute.namespaceURI or "", attribute.name, attribute.value)
+        for attribute in node.attributes.values()
+    )
+    children = [
+        _content(child)
+        for child in node.childNodes
+        if child.nodeType == Node.ELEMENT_NODE or (child.nodeType == Node.TEXT_NODE and child.data.strip())
+    ]
+    return (node.namespaceURI, node.tagName, attributes, children)
+
+
+class WriteSvgTests(unittest.TestCase):
+    def test_matches_pretty_printed_output_for_inkscape(self):
+        doc = parseString(INKSCAPE_TEMPLATE.encode("utf-8"))
+        with tempfile.TemporaryDirectory() as tmp:
+            compact_path = Path(tmp) / "compact.svg"
+            pretty_path = Path(tmp) / "pretty.svg"
+            write_svg(doc, str(compact_path))
+            # What the generators wrote before write_svg.
+            pretty_path.write_text(doc.toprettyxml(), encoding="utf-8")
+
+            self.assertLess(compact_path.stat().st_size, pretty_path.stat().st_size)
+            compact = parse(str(compact_path))
+            pretty = parse(str(pretty_path))
+            head = compact_path.read_bytes()[:60]
+
+        self.assertTrue(head.startswith(b'<?xml version="1.0" encoding="utf-8"?>'))
+        for written in (compact, pretty):
+            self.assertEqual(written.doctype.name, "svg")
+            self.assertEqual(written.doctype.publicId, "-//W3C//DTD SVG 1.1//EN")
+        self.assertEqual(compact.doctype.systemId, pretty.doctype.systemId)
+        self.assertEqual(_content(compact.documentElement), _content(pretty.documentElement))
+
+        tspan = compact.getElementsByTagName("tspan")[0]
+        self.assertEqual(tspan.firstChild.data, "Ananya & Rāghav")
+        self.assertEqual(
+            compact.getElementsByTagName("g")[0].getAttributeNS("http://www.inkscape.org/namespaces/inkscape", "label"),
+            "Head",
+        )
+
+
+class LayerPathTests(unittest.TestCase):
+    def test_paths_resolve_to_the_same_layers_in_a_clone(self):
+        template = parseString(TEMPLATE)
+        paths = layer_paths(template, LAYER_IDS)
+        self.assertEqual(sorted(paths), ["head", "name"])
+
+        clone = template.cloneNode(True)
+        layers = {key: resolve_path(clone, path) for key, path in paths.items()}
+        self.assertEqual(layers["name"].getAttribute("id"), "name")
+        image = layers["head"].getElementsByTagName("image")[0]
+        self.assertEqual(image.getAttribute("xlink:href"), "old.png")
+
+    def test_filling_a_clone_leaves_the_template_untouched(self):
+        template = parseString(TEMPLATE)
+        paths = layer_paths(template, LAYER_IDS)
+
+        clone = template.cloneNode(True)
+        resolve_path(clone, paths["name"]).getElementsByTagName("text")[0].firstChild.data = "Asha"
+
+        text = resolve_path(template, paths["name"]).getElementsByTagName("text")[0]
+        self.assertEqual(text.firstChild.data, "Name")
+
+
+class SubjectTemplateCacheTests(unittest.TestCase):
+    def setUp(self):
+        doc_maker.clear_template_cache()
+        self.addCleanup(doc_maker.clear_template_cache)
+
+    def test_loading_a_subject_drops_the_previous_one(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                unittest.mock.patch.object(doc_maker, "PER_ROOT", tmp):
+            self.assertIsNone(doc_maker.subject_templates("MATHS"))
+            self.assertIsNone(doc_maker.subject_templates("MATHS"))
+            self.assertEqual(list(doc_maker._subject_templates), ["MATHS"])
+
+            doc_maker.subject_templates("SCIENCE")
+            self.assertEqual(list(doc_maker._subject_templates), ["SCIENCE"])
+
+
+if __name__ == "__main__":
+    unittest.main()
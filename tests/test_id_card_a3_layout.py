@@ -0,0 +1,180 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import fitz
+from PIL import Image
+from reportlab import rl_config
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from id_card_a3_layout import (
+    ImageEncoding,
+    SheetGeometry,
+    encode_image,
+    even_row_tops,
+    iter_rendered_cards,
+    main,
+    make_sheets,
+    page_byte_sizes,
+    slot_position,
+    validate_encoding,
+    validate_geometry,
+)
+
+
+def _write_card(path: Path, label: str) -> None:
+    doc = fitz.open()
+    page = doc.new_page(width=161, height=255)
+    page.insert_text((20, 50), label)
+    doc.save(str(path))
+    doc.close()
+
+
+class RenderPipelineTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _cards(self, count):
+        cards = []
+        for index in range(count):
+            base = f"kid{index:02}"
+            front = self.root / f"{base}_FRONT.pdf"
+            back = self.root / f"{base}_BACK.pdf"
+            _write_card(front, base + " front")
+            _write_card(back, base + " back")
+            cards.append((base, str(front), str(back)))
+        return cards
+
+    def test_pool_preserves_card_order(self):
+        cards = self._cards(5)
+        results = list(iter_rendered_cards(cards, workers=2, queue_size=2))
+
+        self.assertEqual([base for base, _, _ in results], [c[0] for c in cards])
+        for _, images, error in results:
+            self.assertIsNone(error)
+            img_f, img_b = images
+            self.assertEqual(img_f.size, img_b.size)
+
+    def test_render_errors_are_reported_in_place(self):
+        cards = self._cards(2)
+        broken = self.root / "broken_FRONT.pdf"
+        broken.write_text("not a pdf")
+        cards.insert(1, ("broken", str(broken), str(broken)))
+
+        results = list(iter_rendered_cards(cards, workers=2, queue_size=1))
+
+        self.assertEqual([base for base, _, _ in results], ["kid00", "broken", "kid01"])
+        self.assertIsNone(results[1][1])
+        self.assertIsNotNone(results[1][2])
+        self.assertIsNone(results[2][2])
+
+
+class ImageEncodingTests(unittest.TestCase):
+    def setUp(self):
+        self.image = Image.effect_noise((600, 300), 40).convert("RGBA")
+
+    def test_inline_keeps_the_rendered_image(self):
+        self.assertIs(encode_image(self.image, ImageEncoding("inline")), self.image)
+
+    def test_jpeg_returns_jpeg_bytes_at_the_requested_quality(self):
+        high = encode_image(self.image, ImageEncoding("jpeg", 95))
+        low = encode_image(self.image, ImageEncoding("jpeg", 20))
+        self.assertTrue(high.startswith(b"\xff\xd8"))
+        self.assertLess(len(low), len(high))
+
+    def test_flate_and_downsampling(self):
+        flate = encode_image(self.image, ImageEncoding("flate", downsample_dpi=150), dpi=300)
+        self.assertEqual((flate.mode, flate.size), ("RGB", (300, 150)))
+        # A target above the rendering DPI leaves the size alone.
+        self.assertEqual(encode_image(self.image, ImageEncoding("flate", downsample_dpi=600), dpi=300).size, (600, 300))
+
+    def test_rejects_bad_settings(self):
+        for encoding in (ImageEncoding("jpeg", 0), ImageEncoding("jpeg", 96), ImageEncoding("png"),
+                         ImageEncoding("inline", downsample_dpi=150), ImageEncoding("jpeg", downsample_dpi=0)):
+            with self.assertRaises(ValueError, msg=encoding):
+                validate_encoding(encoding)
+
+    def test_cli_rejects_bad_settings(self):
+        self.assertEqual(main(["folder", "-o", "out.pdf", "--jpeg-quality", "100"]), 2)
+        self.assertEqual(main(["folder", "-o", "out.pdf", "--downsample-dpi", "150"]), 2)
+
+
+class MakeSheetsTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.template = self.root / "layout.pdf"
+        doc = fitz.open()
+        page = doc.new_page(width=842, height=1191)
+        page.draw_rect(fitz.Rect(20, 20, 820, 1170), color=(0, 0, 1), fill=(0.9, 0.9, 1))
+        doc.save(str(self.template))
+        doc.close()
+        self.school = self.root / "School"
+        self.school.mkdir()
+        for index in range(11):
+            _write_card(self.school / f"kid{index:02}_FRONT.pdf", f"kid{index} front")
+            _write_card(self.school / f"kid{index:02}_BACK.pdf", f"kid{index} back")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _make(self, encoding):
+        out = self.root / f"{encoding.mode}.pdf"
+        pages = make_sheets([str(self.school)], str(out), log_fn=lambda msg: None, workers=1,
+                            geometry=SheetGeometry(dpi=60), template_path=str(self.template), encoding=encoding)
+        return out, pages
+
+    def test_jpeg_images_are_stored_as_plain_dct_streams(self):
+        use_a85 = rl_config.useA85
+        out, pages = self._make(ImageEncoding("jpeg", 80))
+        self.assertEqual(rl_config.useA85, use_a85)
+
+        with fitz.open(str(out)) as doc:
+            self.assertEqual(doc.page_count, 2)
+            images = {img[0] for page in doc for img in page.get_images(full=True)}
+            # One shared background plus a front and a back per card.
+            self.assertEqual(len(images), 1 + 2 * 11)
+            for xref in images:
+                self.assertEqual(doc.xref_get_key(xref, "Filter")[1].strip("[]"), "/DCTDecode")
+                self.assertTrue(doc.xref_stream_raw(xref).startswith(b"\xff\xd8"))
+
+    def test_page_stats_carry_the_stored_page_sizes(self):
+        out, pages = self._make(ImageEncoding("flate"))
+        self.assertEqual([(page.number, page.cards) for page in pages], [(1, 10), (2, 1)])
+        self.assertEqual([page.bytes for page in pages], page_byte_sizes(str(out)))
+        # The shared background counts on both pages; the first also has ten cards.
+        self.assertGreater(pages[0].bytes, pages[1].bytes)
+        self.assertGreater(pages[1].bytes, 0)
+
+
+class SheetGeometryTests(unittest.TestCase):
+    def test_default_slots_match_a3_row_mapping(self):
+        geometry = SheetGeometry()
+        self.assertEqual(slot_position(0, geometry), (0, 3, 0))
+        self.assertEqual(slot_position(4, geometry), (0, 3, 4))
+        self.assertEqual(slot_position(5, geometry), (1, 2, 0))
+        self.assertEqual(slot_position(9, geometry), (1, 2, 4))
+
+    def test_even_row_tops_fit_page(self):
+        tops = even_row_tops(6, 60.0, 420.0)
+        self.assertEqual(len(tops), 6)
+        self.assertAlmostEqual(tops[0], 420.0 - (tops[-1] + 60.0), places=2)
+        validate_geometry(
+            SheetGeometry(card_h_mm=60.0, cols=4, rows=6, kids_per_page=12, row_tops_mm=tops)
+        )
+
+    def test_rejects_more_kids_than_front_slots(self):
+        with self.assertRaises(ValueError):
+            validate_geometry(SheetGeometry(kids_per_page=11))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import job_engine
+from job_engine import JobEngine
+
+
+class JobEngineTests(unittest.TestCase):
+    def setUp(self):
+        self.engine = JobEngine(max_workers=1)
+        self.events = []
+        self.engine.subscribe(self.events.append)
+
+    def tearDown(self):
+        self.engine.shutdown()
+
+    def _kinds(self, job):
+        return [event.kind for event in self.events if event.job_id == job.id]
+
+    def test_events_wait_for_dispatch(self):
+        def work(job):
+            job.progress("covers", 1, 2)
+            job.status("done")
+            return 42
+
+        job = self.engine.submit("Generation", work)
+        self.assertEqual(job.future.result(timeout=5), 42)
+        self.assertEqual(self.events, [])
+
+        self.engine.dispatch()
+        self.assertEqual(
+            self._kinds(job),
+            [job_engine.QUEUED, job_engine.STARTED, job_engine.PROGRESS, job_engine.STATUS, job_engine.FINISHED],
+        )
+        self.assertEqual(self.engine.active(), [])
+
+    def test_jobs_run_back_to_back(self):
+        release = threading.Event()
+        order = []
+        first = self.engine.submit("Generation", lambda job: (release.wait(5), order.append("generation")))
+        second = self.engine.submit("Merge", lambda job: order.append("merge"))
+        self.assertEqual([job.name for job in self.engine.active()], ["Generation", "Merge"])
+
+        release.set()
+        second.future.result(timeout=5)
+        self.assertEqual(order, ["generation", "merge"])
+        self.assertTrue(first.future.done())
+
+    def test_cancel_stops_running_and_drops_queued_jobs(self):
+        started = threading.Event()
+        processed = []
+
+        def work(job):
+            started.set()
+            for item in range(1000):
+                job.check()
+                processed.append(item)
+                threading.Event().wait(0.001)
+
+        running = self.engine.submit("Generation", work)
+        queued = self.engine.submit("Merge", lambda job: processed.append("merge"))
+        started.wait(5)
+        self.assertEqual(self.engine.cancel_all(), 2)
+        running.future.result(timeout=5)
+
+        self.engine.dispatch()
+        self.assertEqual(self._kinds(running)[-1], job_engine.CANCELLED)
+        self.assertEqual(self._kinds(queued)[-1], job_engine.CANCELLED)
+        self.assertNotIn("merge", processed)
+        self.assertLess(len(processed), 1000)
+
+    def test_failures_are_reported_as_events(self):
+        def work(job):
+            raise ValueError("bad sheet")
+
+        job = self.engine.submit("Generation", work)
+        job.future.result(timeout=5)
+        self.engine.dispatch()
+        failed = [event for event in self.events if event.kind == job_engine.FAILED]
+        self.assertEqual([event.message for event in failed], ["bad sheet"])
+
+
+class ProgressBoardTests(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        self.board = job_engine.ProgressBoard(clock=lambda: self.now)
+
+    def _event(self, kind, job_id=1, **fields):
+        return job_engine.JobEvent(job_id, "Generation", kind, **fields)
+
+    def test_rate_eta_school_and_failures(self):
+        self.board.update(self._event(job_engine.STARTED))
+        self.board.update(self._event(job_engine.PROGRESS, stage="covers", done=0, total=40))
+        self.now += 60
+        stage = self.board.update(
+            self._event(job_engine.PROGRESS, stage="covers", done=10, total=40, school="Alpha", failed=2)
+        )
+
+        self.assertAlmostEqual(stage.items_per_minute(self.now), 10.0)
+        self.assertAlmostEqual(stage.eta(self.now), 180.0)
+        self.assertEqual(stage.describe(self.now), "covers: 10/40 | 10.0/min | ETA 3m 00s | Alpha | 2 failed")
+
+    def test_new_job_resets_the_board(self):
+        self.board.update(self._event(job_engine.STARTED))
+        self.board.update(self._event(job_engine.PROGRESS, stage="covers", done=1, total=2))
+        self.board.update(self._event(job_engine.STARTED, job_id=2))
+
+        self.assertEqual(dict(self.board.stages), {})
+        self.assertIsNone(self.board.update(self._event(job_engine.PROGRESS, stage="covers", done=2)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import importlib.util
+import io
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import fitz
+from PIL import Image
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# test_id_card_maker may have installed a bare stub under this name.
+if not hasattr(sys.modules.get("doc_maker"), "write_svg"):
+    sys.modules.pop("doc_maker", None)
+
+try:
+    import tkinter  # noqa: F401  (the UI module imports it at the top)
+except ImportError:
+    ui = None
+else:
+    # The UI script has spaces in its name; importing it builds no window.
+    spec = importlib.util.spec_from_file_location(
+        "user_interface", PROJECT_ROOT / "user_interface with school name inner.py"
+    )
+    ui = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ui)
+
+
+def _card(path: Path, image: bytes, label: str) -> Path:
+    """One card page with the shared background image and embedded font."""
+    doc = fitz.open()
+    page = doc.new_page(width=153, height=243)
+    page.insert_image(page.rect, stream=image)
+    page.insert_font(fontname="marvin", fontfile=str(PROJECT_ROOT / "Marvin.ttf"))
+    page.insert_text((20, 200), label, fontname="marvin", fontsize=12)
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+def _count(pdf_path: Path, key: str) -> int:
+    """Objects whose dictionary names ``key`` (an image or an embedded font program)."""
+    with fitz.open(str(pdf_path)) as doc:
+        return sum(1 for xref in range(1, doc.xref_length()) if key in doc.xref_object(xref, compressed=True))
+
+
+@unittest.skipIf(ui is None, "tkinter is not available")
+class MergePdfFilesTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        buffer = io.BytesIO()
+        Image.effect_noise((120, 180), 60).convert("RGB").save(buffer, "PNG")
+        self.cards = [_card(self.root / f"kid{index}.pdf", buffer.getvalue(), f"Kid {index}") for index in range(3)]
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_shared_image_and_font_are_stored_once(self):
+        deduped = self.root / "out" / "deduped.pdf"
+        plain = self.root / "out" / "plain.pdf"
+        self.assertTrue(ui._merge_pdf_files(self.cards, deduped, dedupe=True))
+        self.assertTrue(ui._merge_pdf_files(self.cards, plain, dedupe=False))
+
+        for merged in (deduped, plain):
+            with fitz.open(str(merged)) as doc:
+                self.assertEqual(doc.page_count, 3)
+                self.assertEqual([page.get_text().strip() for page in doc], ["Kid 0", "Kid 1", "Kid 2"])
+        self.assertEqual(_count(plain, "/Subtype/Image"), 3)
+        self.assertEqual(_count(plain, "/FontFile2"), 3)
+        self.assertEqual(_count(deduped, "/Subtype/Image"), 1)
+        self.assertEqual(_count(deduped, "/FontFile2"), 1)
+        self.assertLess(deduped.stat().st_size, plain.stat().st_size)
+
+    def test_unreadable_inputs_are_skipped(self):
+        broken = self.root / "broken.pdf"
+        broken.write_bytes(b"not a pdf")
+        merged = self.root / "merged.pdf"
+
+        self.assertTrue(ui._merge_pdf_files([self.cards[0], broken], merged))
+        with fitz.open(str(merged)) as doc:
+            self.assertEqual(doc.page_count, 1)
+        self.assertFalse(ui._merge_pdf_files([broken], self.root / "empty.pdf"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import output_manifest
+
+
+def _touch(path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"%PDF-1.4")
+    return path
+
+
+class OutputManifestTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.school = Path(self._tmp.name) / "School"
+        self.school.mkdir()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_scan_is_used_without_manifest(self):
+        _touch(self.school / "b_kid" / "b_kid_BACK.pdf")
+        _touch(self.school / "b_kid" / "b_kid_FRONT.pdf")
+        _touch(self.school / "A_kid" / "A_kid_FRONT.pdf")
+        _touch(self.school / "working" / "x_FRONT.pdf")
+
+        paths = output_manifest.child_pdf_paths(self.school)
+        self.assertEqual(
+            [p.relative_to(self.school).as_posix() for p in paths],
+            ["A_kid/A_kid_FRONT.pdf", "b_kid/b_kid_FRONT.pdf", "b_kid/b_kid_BACK.pdf"],
+        )
+        self.assertIsNone(output_manifest.read_manifest(self.school))
+
+    def test_first_record_seeds_manifest_from_disk(self):
+        _touch(self.school / "old" / "old_FRONT.pdf")
+        front = _touch(self.school / "new" / "new_FRONT.pdf")
+        output_manifest.record_output(self.school, "new", front)
+
+        entries = output_manifest.read_manifest(self.school)
+        self.assertEqual(sorted(entries), ["new", "old"])
+        self.assertEqual(entries["new"].front, "new/new_FRONT.pdf")
+        self.assertIsNone(entries["new"].back)
+
+    def _age_manifest(self, seconds=60):
+        """Backdate the manifest so later folder changes are seen whatever the mtime resolution."""
+        path = output_manifest.manifest_path(self.school)
+        stamp = path.stat().st_mtime - seconds
+        os.utime(path, (stamp, stamp))
+
+    def test_manifest_skips_missing_files_and_bad_lines(self):
+        front = _touch(self.school / "kid" / "kid_FRONT.pdf")
+        output_manifest.record_output(self.school, "kid", front, self.school / "kid" / "kid_BACK.pdf")
+        with open(output_manifest.manifest_path(self.school), "a", encoding="utf-8") as handle:
+            handle.write("{truncated\n")
+
+        self.assertEqual(output_manifest.child_pdf_paths(self.school), [front])
+
+    def test_pdfs_missing_from_the_manifest_are_added(self):
+        front = _touch(self.school / "kid" / "kid_FRONT.pdf")
+        output_manifest.record_output(self.school, "kid", front)
+        self._age_manifest()
+        # Copied in by hand after the manifest was written.
+        stray = _touch(self.school / "stray" / "stray_FRONT.pdf")
+
+        self.assertEqual(output_manifest.child_pdf_paths(self.school), [front, stray])
+        self.assertEqual(sorted(output_manifest.read_manifest(self.school)), ["kid", "stray"])
+
+    def test_flat_pdf_missing_from_the_manifest_is_added(self):
+        cover = _touch(self.school / "a.pdf")
+        output_manifest.record_output(self.school, "a", cover, flat=True)
+        # Same second as the manifest write: found by the entry count.
+        _touch(self.school / "old_run.pdf")
+
+        self.assertEqual([p.name for p in output_manifest.flat_pdf_paths(self.school)], ["a.pdf", "old_run.pdf"])
+        self.assertEqual(sorted(output_manifest.read_manifest(self.school)), ["a", "old_run"])
+
+    def test_unchanged_folder_is_not_rescanned(self):
+        front = _touch(self.school / "kid" / "kid_FRONT.pdf")
+        output_manifest.record_output(self.school, "kid", front)
+        self.assertEqual(output_manifest.child_pdf_paths(self.school), [front])
+
+        with mock.patch.object(output_manifest, "scan_child_entries") as scan:
+            self.assertEqual(output_manifest.child_pdf_paths(self.school), [front])
+        scan.assert_not_called()
+
+    def test_concurrent_writers_keep_every_entry(self):
+        _touch(self.school / "seeded" / "seeded_FRONT.pdf")
+        kids = ["kid%02d" % index for index in range(40)]
+        for kid in kids:
+            _touch(self.school / kid / f"{kid}_FRONT.pdf")
+        start = threading.Barrier(2)
+        real_scan = output_manifest.scan_child_entries
+
+        def slow_scan(school_dir):
+            # Widen the window in which both writers could see no manifest yet.
+            time.sleep(0.05)
+            return real_scan(school_dir)
+
+        def write(names):
+            start.wait()
+            for kid in names:
+                output_manifest.record_output(self.school, kid, self.school / kid / f"{kid}_FRONT.pdf")
+
+        writers = [threading.Thread(target=write, args=(kids[index::2],)) for index in range(2)]
+        with mock.patch.object(output_manifest, "scan_child_entries", slow_scan):
+            for writer in writers:
+                writer.start()
+            for writer in writers:
+                writer.join()
+
+        with open(output_manifest.manifest_path(self.school), encoding="utf-8") as handle:
+            lines = handle.read().splitlines()
+        entries = output_manifest.read_manifest(self.school)
+        self.assertEqual(sorted(entries), sorted(kids + ["seeded"]))
+        # Seeded once from disk (41 folders), then one line per write.
+        self.assertEqual(len(lines), 41 + len(kids))
+
+    def test_flat_outputs(self):
+        _touch(self.school / "b.pdf")
+        cover = _touch(self.school / "a.pdf")
+        output_manifest.record_output(self.school, "a", cover, flat=True)
+
+        self.assertEqual(
+            [p.name for p in output_manifest.flat_pdf_paths(self.school)], ["a.pdf", "b.pdf"]
+        )
+
+    def test_resolve_many_keeps_order(self):
+        schools = []
+        for name in ("one", "two", "three"):
+            school = Path(self._tmp.name) / name
+            _touch(school / f"{name}.pdf")
+            schools.append(school)
+
+        results = output_manifest.resolve_many(schools, output_manifest.flat_pdf_paths, workers=3)
+        self.assertEqual([[p.name for p in r] for r in results], [["one.pdf"], ["two.pdf"], ["three.pdf"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
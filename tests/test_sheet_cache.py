@@ -0,0 +1,149 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import sheet_cache
+from sheet_cache import SheetCache
+
+
+class SheetCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.sheet = self.root / "books.csv"
+        pd.DataFrame(
+            {"school_name": [" Alpha ", "Beta", None, ""], "book_id": [1, 2, 3, 4]}
+        ).to_csv(self.sheet, index=False)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _cache(self, sidecars=False):
+        return SheetCache(root=str(self.root / "cache"), sidecars=sidecars)
+
+    def test_sheet_is_parsed_once_for_every_consumer(self):
+        cache = self._cache()
+        with mock.patch.object(sheet_cache, "read_sheet", wraps=sheet_cache.read_sheet) as read:
+            self.assertEqual(cache.schools(self.sheet, header=0), {"Alpha", "Beta"})
+            self.assertEqual(len(cache.load(self.sheet, header=0)), 4)
+            cache.load(self.sheet, header=0)
+        self.assertEqual(read.call_count, 1)
+
+    def test_changed_file_is_parsed_again(self):
+        cache = self._cache()
+        cache.load(self.sheet, header=0)
+        pd.DataFrame({"school_name": ["Gamma"], "book_id": [9]}).to_csv(self.sheet, index=False)
+        os.utime(self.sheet, ns=(0, 10**9))
+
+        self.assertEqual(cache.schools(self.sheet, header=0), {"Gamma"})
+
+    def test_loaded_frames_are_private_copies(self):
+        cache = self._cache()
+        df = cache.load(self.sheet, header=0)
+        df.loc[0, "book_id"] = 99
+        self.assertEqual(cache.load(self.sheet, header=0).loc[0, "book_id"], 1)
+
+    @unittest.skipUnless(sheet_cache.HAVE_FEATHER, "pyarrow not installed")
+    def test_sidecar_survives_a_new_cache(self):
+        self._cache(sidecars=True).load(self.sheet, header=0)
+        with mock.patch.object(sheet_cache, "read_sheet") as read:
+            df = self._cache(sidecars=True).load(self.sheet, header=0)
+        read.assert_not_called()
+        self.assertEqual(list(df["book_id"]), [1, 2, 3, 4])
+
+
+class SidecarPruneTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.cache_root = self.root / "cache"
+        self.cache_root.mkdir()
+        self.sheet = self.root / "books.csv"
+        pd.DataFrame({"school_name": ["Alpha"], "book_id": [1]}).to_csv(self.sheet, index=False)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _file(self, name, days_ago):
+        path = self.cache_root / name
+        path.write_bytes(b"feather")
+        stamp = time.time() - days_ago * 86400
+        os.utime(path, (stamp, stamp))
+        return path
+
+    def test_first_load_prunes_sidecars_unused_for_too_long(self):
+        old = self._file("old_1_1.feather", sheet_cache.MAX_UNUSED_DAYS + 1)
+        partial = self._file("old_1_1.feather.123.tmp", sheet_cache.MAX_UNUSED_DAYS + 1)
+        recent = self._file("recent_1_1.feather", 1)
+        cache = SheetCache(root=str(self.cache_root), sidecars=False)
+
+        self.assertTrue(old.exists())
+        cache.load(self.sheet, header=0)
+        self.assertEqual([old.exists(), partial.exists(), recent.exists()], [False, False, True])
+
+        # Only the first load prunes.
+        old = self._file("old_1_1.feather", sheet_cache.MAX_UNUSED_DAYS + 1)
+        cache.load(self.sheet, header=0)
+        self.assertTrue(old.exists())
+
+    def test_writing_a_sidecar_removes_earlier_versions_of_the_sheet(self):
+        def to_feather(df, path):
+            Path(path).write_bytes(b"feather")
+
+        cache = SheetCache(root=str(self.cache_root), sidecars=True)
+        with mock.patch.object(pd.DataFrame, "to_feather", to_feather), \
+                mock.patch.object(pd, "read_feather", side_effect=OSError):
+            cache.load(self.sheet, header=0)
+            first = set(os.listdir(self.cache_root))
+            pd.DataFrame({"school_name": ["Beta"], "book_id": [2]}).to_csv(self.sheet, index=False)
+            os.utime(self.sheet, ns=(0, 10**9))
+            cache.load(self.sheet, header=0)
+            cache.load(self.sheet, header=1)
+            second = set(os.listdir(self.cache_root))
+
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(second), 2)
+        self.assertFalse(first & second)
+
+
+class SelectionMaskTests(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "school_name": [" Alpha ", "Beta", None, "Alpha"],
+                "user_id": [" 101", "102", None, 104],
+                "book_id": [1, "2", None, 4.0],
+            },
+            index=[10, 11, 12, 13],
+        )
+
+    def _selected(self, **kwargs):
+        return list(self.df.index[sheet_cache.selection_mask(self.df, **kwargs)])
+
+    def test_schools_are_matched_after_stripping(self):
+        self.assertEqual(self._selected(school_names={"Alpha"}), [10, 13])
+        self.assertEqual(self._selected(school_names=set()), [])
+
+    def test_single_kid_ignores_school_selection(self):
+        self.assertEqual(self._selected(school_names={"Beta"}, user_id="101"), [10])
+        self.assertEqual(self._selected(user_id="104"), [13])
+        self.assertEqual(self._selected(school_names={"Alpha"}, book_id=2), [11])
+        self.assertEqual(self._selected(book_id=4), [13])
+
+    def test_missing_column_selects_nothing(self):
+        mask = sheet_cache.selection_mask(self.df[["school_name"]], book_id=1)
+        self.assertFalse(mask.any())
+
+
+if __name__ == "__main__":
+    unittest.main()
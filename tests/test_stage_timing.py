@@ -0,0 +1,122 @@
+import csv
+import json
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import stage_timing
+from stage_timing import StageTimer
+
+
+def _pool_task(value):
+    with stage_timing.timer("inner", record="task %d" % value):
+        return value * 2
+
+
+class StageTimerTests(unittest.TestCase):
+    def test_stats_and_histogram(self):
+        timer = StageTimer()
+        for seconds in (0.005, 0.2, 120.0):
+            timer.add("inkscape", seconds)
+
+        stats = timer.summary()["stages"]["inkscape"]
+        self.assertEqual(stats["count"], 3)
+        self.assertAlmostEqual(stats["total"], 120.205)
+        self.assertEqual(stats["min"], 0.005)
+        self.assertEqual(stats["max"], 120.0)
+        self.assertEqual(stats["histogram"]["<=0.01s"], 1)
+        self.assertEqual(stats["histogram"]["<=0.5s"], 1)
+        self.assertEqual(stats["histogram"][">60s"], 1)
+
+    def test_slowest_records_keep_top_n(self):
+        timer = StageTimer(top_n=2)
+        timer.add("ID card", 1.0, record="u1")
+        timer.add("ID card", 3.0, record="u2")
+        timer.add("ID card", 2.0, record="u3")
+        timer.add("ID card", 9.0)  # untagged timings are not ranked
+
+        self.assertEqual([entry.record for entry in timer.slowest()], ["u2", "u3"])
+
+    def test_recursive_calls_are_timed_once(self):
+        timer = StageTimer()
+        with timer.timer("callInkscape"):
+            with timer.timer("callInkscape"):
+                pass
+            with timer.timer("other"):
+                pass
+        self.assertEqual(timer.stages["callInkscape"].count, 1)
+        self.assertEqual(timer.stages["other"].count, 1)
+
+    def test_decorator_uses_module_and_function_name(self):
+        stage_timing.TIMINGS.reset()
+
+        @stage_timing.timed()
+        def export(value):
+            return value * 2
+
+        self.assertEqual(export(4), 8)
+        self.assertIn(__name__ + ".export", stage_timing.TIMINGS.stages)
+        self.assertEqual(export.__name__, "export")
+
+    def test_merge_adds_exported_timings(self):
+        worker = StageTimer()
+        worker.add("binder", 2.0, record="0011234")
+        worker.add("build_doc", 0.02)
+        parent = StageTimer()
+        parent.add("binder", 0.5, record="0015678")
+
+        parent.merge(worker.export())
+
+        stats = parent.summary()["stages"]
+        self.assertEqual((stats["binder"]["count"], stats["binder"]["min"], stats["binder"]["max"]), (2, 0.5, 2.0))
+        self.assertEqual(stats["build_doc"]["count"], 1)
+        self.assertEqual(stats["binder"]["histogram"]["<=5s"], 1)
+        self.assertEqual([entry.record for entry in parent.slowest()], ["0011234", "0015678"])
+
+    def test_pool_worker_timings_reach_the_parent(self):
+        stage_timing.TIMINGS.reset()
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            results = [pool.submit(stage_timing.run_timed, "task", value, _pool_task, value) for value in (1, 2, 3)]
+            for future in results:
+                result = future.result()
+                stage_timing.TIMINGS.merge(result.timings)
+
+        self.assertEqual([future.result().value for future in results], [2, 4, 6])
+        self.assertEqual(stage_timing.TIMINGS.stages["task"].count, 3)
+        self.assertEqual(stage_timing.TIMINGS.stages["inner"].count, 3)
+        self.assertEqual(len(stage_timing.TIMINGS.slowest()), 6)
+
+    def test_run_timed_leaves_the_callers_timings_alone(self):
+        stage_timing.TIMINGS.reset()
+        timings = stage_timing.TIMINGS
+        stage_timing.TIMINGS.add("outer", 1.0)
+
+        result = stage_timing.run_timed("task", None, _pool_task, 5)
+
+        self.assertIs(stage_timing.TIMINGS, timings)
+        self.assertEqual(sorted(timings.stages), ["outer"])
+        self.assertEqual(sorted(result.timings[0]), ["inner", "task"])
+
+    def test_summary_files(self):
+        timer = StageTimer()
+        timer.add("merge", 0.3, record="School A")
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path, csv_path = timer.write_summary("run", root=tmp)
+            with open(json_path, encoding="utf-8") as handle:
+                summary = json.load(handle)
+            with open(csv_path, newline="", encoding="utf-8") as handle:
+                rows = list(csv.reader(handle))
+
+        self.assertEqual(summary["slowest"][0]["record"], "School A")
+        self.assertEqual(rows[0][:6], ["stage", "count", "total", "mean", "min", "max"])
+        self.assertEqual(rows[1][:2], ["merge", "1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
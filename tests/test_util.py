@@ -0,0 +1,248 @@
+import contextlib
+import io
+import multiprocessing
+import queue
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+import fitz
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import util
+from util import BinderWriter, assemble_sticker_binders, build_doc, imposition_plan, placement_rect
+
+
+SHEET = (420 * 2.83465, 290 * 2.83465)
+
+
+class ImpositionPlanTests(unittest.TestCase):
+    def test_plan_is_reused_for_the_same_key(self):
+        first = imposition_plan(16, SHEET, 90)
+        second = imposition_plan(16, SHEET, 90)
+        self.assertIs(first, second)
+
+    def test_slots_cover_every_page_once(self):
+        plan = imposition_plan(16, SHEET, 100)
+        self.assertEqual(sorted(slot.page for slot in plan.slots), list(range(16)))
+        self.assertEqual(sum(slot.new_sheet for slot in plan.slots), 8)
+
+    def test_completion_markers_sit_on_the_last_slots(self):
+        plan = imposition_plan(16, SHEET, 100)
+        marked = [index for index, slot in enumerate(plan.slots) if slot.marker]
+        self.assertEqual(marked, [11, 13, 15])
+        self.assertTrue(plan.slots[1].book_id)
+        self.assertTrue(plan.slots[15].book_id)
+
+
+class PlacementRectTests(unittest.TestCase):
+    def test_left_and_right_halves_are_mirrored(self):
+        left = placement_rect(SHEET, 90, False, 420.0, 595.0)
+        right = placement_rect(SHEET, 90, True, 420.0, 595.0)
+        self.assertEqual(right[1], left[1])
+        self.assertAlmostEqual(right[0] - left[0], SHEET[0] / 2, delta=1)
+
+    def test_rejects_scale_above_100(self):
+        with self.assertRaises(ValueError):
+            placement_rect(SHEET, 110, False, 420.0, 595.0)
+
+
+class BuildDocTests(unittest.TestCase):
+    """build_doc output pinned to what the pre-plan implementation produced."""
+
+    # Per sheet: the boxes drawn on it (placed source pages and completion
+    # markers) and the words with their top-left corner. Page 4 is missing
+    # and page 6 is landscape.
+    EXPECTED_AT_90 = [
+        ([(36, 41, 558, 780), (632, 41, 1153, 780)],
+         [("007", 574, 378), ("School", 582, 169), ("p1", 644, 51), ("p8", 49, 51)]),
+        ([(36, 41, 558, 780), (632, 41, 1153, 780), (794, 0, 926, 20)],
+         [("School", 582, 169), ("p2", 49, 51), ("p7", 644, 51)]),
+        ([(29, 221, 565, 600), (632, 41, 1153, 780), (926, 0, 1058, 20)],
+         [("School", 582, 169), ("p3", 644, 51), ("p6", 38, 229)]),
+        ([(632, 41, 1153, 780), (1058, 0, 1191, 20)],
+         [("007", 574, 378), ("School", 582, 169), ("p5", 644, 51)]),
+    ]
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.book = Path(self._tmp.name) / "007"
+        self.book.mkdir()
+        for number in (1, 2, 3, 5, 6, 7, 8):
+            width, height = (595, 420) if number == 6 else (420, 595)
+            doc = fitz.open()
+            page = doc.new_page(width=width, height=height)
+            page.draw_rect(page.rect, color=(0, 0, 0), fill=(0.8, 0.8, 0.8), width=0)
+            page.insert_text((10, 20), f"p{number}")
+            doc.save(str(self.book / f"{number:02}.pdf"))
+            doc.close()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _build(self, page_scale):
+        out = fitz.open()
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_doc(str(self.book), "", "007", 8, SHEET, out, page_scale, 0, True, "School")
+        return out
+
+    def test_pages_and_placements_match_previous_output(self):
+        with self._build(90) as out:
+            sheets = [
+                (
+                    sorted(tuple(round(v) for v in drawing["rect"]) for drawing in page.get_drawings()),
+                    sorted((word[4], round(word[0]), round(word[1])) for word in page.get_text("words")),
+                )
+                for page in out
+            ]
+        self.assertEqual(sheets, self.EXPECTED_AT_90)
+
+    def test_rejects_scale_above_100(self):
+        with self.assertRaises(ValueError):
+            self._build(110)
+
+
+class BinderWriterTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.finished = []
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _writer(self, **kwargs):
+        return BinderWriter(
+            lambda number: str(self.root / f"binder{number}.pdf"),
+            on_finish=lambda path, number: self.finished.append((Path(path).name, number)),
+            **kwargs,
+        )
+
+    def _add_book(self, writer, pages):
+        for _ in range(pages):
+            writer.doc.new_page(width=100, height=100)
+        writer.added(pages)
+
+    def test_rolls_over_after_max_pages(self):
+        writer = self._writer(max_pages=8, flush_pages=4)
+        for _ in range(5):
+            self._add_book(writer, 4)
+        self.assertEqual(self.finished, [("binder0.pdf", 0)])
+        self.assertTrue(writer.close())
+
+        self.assertEqual(self.finished, [("binder0.pdf", 0), ("binder1.pdf", 1)])
+        with fitz.open(str(self.root / "binder0.pdf")) as doc:
+            self.assertEqual(doc.page_count, 12)
+        with fitz.open(str(self.root / "binder1.pdf")) as doc:
+            self.assertEqual(doc.page_count, 8)
+
+    def test_incremental_flush_writes_pages_before_close(self):
+        writer = self._writer(max_pages=300, flush_pages=2)
+        self._add_book(writer, 2)
+        with fitz.open(str(self.root / "binder0.pdf")) as doc:
+            self.assertEqual(doc.page_count, 2)
+        self._add_book(writer, 2)
+        writer.close()
+        with fitz.open(str(self.root / "binder0.pdf")) as doc:
+            self.assertEqual(doc.page_count, 4)
+
+    def test_close_without_pages_reports_empty(self):
+        writer = self._writer()
+        self.assertFalse(writer.close())
+        self.assertEqual(self.finished, [])
+
+
+def _write_books(subject_dir: Path, books: int, pages: int) -> None:
+    for book in range(books):
+        folder = subject_dir / f"{book:03}"
+        folder.mkdir(parents=True)
+        for page in range(pages):
+            doc = fitz.open()
+            doc.new_page(width=420, height=595)
+            doc.save(str(folder / f"{page + 1:02}.pdf"))
+            doc.close()
+
+
+class AssembleBindersTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        _write_books(self.root / "PDFS" / "0011234", books=3, pages=4)
+        (self.root / "FINAL BINDERS").mkdir()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _assemble(self, on_finish):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return util.assemble_binders(
+                "0011234", 4, "001", SHEET, 100, max_pages=4, flush_pages=4,
+                in_root=str(self.root / "PDFS"), out_root=str(self.root / "FINAL BINDERS"), on_finish=on_finish,
+            )
+
+    def test_binder_is_reported_before_its_subject_finishes(self):
+        finished = queue.Queue()
+        events = []
+        real_build_doc = util.build_doc
+
+        def build_doc(*args, **kwargs):
+            events.append(("build", args[2], finished.qsize()))
+            return real_build_doc(*args, **kwargs)
+
+        with mock.patch.object(util, "build_doc", build_doc):
+            result = self._assemble(util.FinishedBinders(finished, "0011234"))
+
+        # Binder 0 rolled over after the second book and was on the queue
+        # before the third book was imposed.
+        self.assertEqual([waiting for _, _, waiting in events], [0, 0, 1])
+        self.assertEqual(sorted(book for _, book, _ in events), ["000", "001", "002"])
+        reported = [finished.get_nowait() for _ in range(finished.qsize())]
+        self.assertEqual(reported, [("0011234",) + binder for binder in result])
+        self.assertEqual([number for _, number in result], [0, 1])
+
+    def test_worker_process_reports_through_a_manager_queue(self):
+        with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=1) as pool:
+            finished = manager.Queue()
+            future = pool.submit(
+                util.assemble_binders, "0011234", 4, "001", SHEET, 100, 4, None, 4,
+                str(self.root / "PDFS"), str(self.root / "FINAL BINDERS"), util.FinishedBinders(finished, "0011234"),
+            )
+            result = future.result(timeout=60)
+            reported = [finished.get(timeout=5) for _ in result]
+        self.assertEqual([number for _, _, number in reported], [0, 1])
+        self.assertEqual([path for _, path, _ in reported], [path for path, _ in result])
+
+
+class AssembleStickerBindersTests(unittest.TestCase):
+    def test_books_are_split_across_binders(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            for book in range(3):
+                folder = root / "PDFS" / "0001234s" / f"{book:03}"
+                folder.mkdir(parents=True)
+                for page in range(2):
+                    doc = fitz.open()
+                    doc.new_page(width=100, height=100)
+                    doc.save(str(folder / f"page{page}.pdf"))
+                    doc.close()
+            out = root / "STICKERS"
+            out.mkdir()
+
+            finished = assemble_sticker_binders(
+                "0001234s", max_pages=3, flush_pages=2,
+                in_root=str(root / "PDFS"), out_root=str(out),
+            )
+
+            self.assertEqual([number for _, number in finished], [0, 1])
+            with fitz.open(finished[0][0]) as doc:
+                self.assertEqual(doc.page_count, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
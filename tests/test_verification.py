@@ -0,0 +1,168 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import fitz
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import verification
+from verification import VerificationRenderer
+
+
+def _write_pdf(path: Path, pages: int, label: str) -> None:
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page(width=144, height=216)
+        page.insert_text((20, 50), f"{label} {number}")
+    doc.save(str(path))
+    doc.close()
+
+
+class VerificationRendererTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.cache = str(self.root / "cache")
+        self.front = self.root / "kid_FRONT.pdf"
+        self.back = self.root / "kid_BACK.pdf"
+        _write_pdf(self.front, 1, "front")
+        _write_pdf(self.back, 2, "back")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_pages_keep_order_and_size(self):
+        output = self.root / "out" / "verify.pdf"
+        with VerificationRenderer(workers=2, cache_root=self.cache) as renderer:
+            self.assertTrue(renderer.create_verification_pdf([self.front, self.back], output))
+
+        with fitz.open(str(output)) as doc:
+            self.assertEqual(doc.page_count, 3)
+            self.assertAlmostEqual(doc[0].rect.width, 144, delta=1)
+            self.assertAlmostEqual(doc[0].rect.height, 216, delta=1)
+
+    def test_unchanged_pdfs_are_served_from_cache(self):
+        with VerificationRenderer(workers=1, cache_root=self.cache) as renderer:
+            renderer.create_verification_pdf([self.front], self.root / "first.pdf")
+            with mock.patch.object(verification.fitz.Page, "get_pixmap") as get_pixmap:
+                renderer.create_verification_pdf([self.front], self.root / "second.pdf")
+            get_pixmap.assert_not_called()
+
+            _write_pdf(self.front, 1, "changed")
+            result = renderer.render([self.front])[0]
+            self.assertIsNone(result.error)
+            self.assertEqual(len(list((self.root / "cache").iterdir())), 2)
+
+    def test_broken_pdf_is_reported_and_skipped(self):
+        broken = self.root / "broken.pdf"
+        broken.write_text("not a pdf")
+        output = self.root / "verify.pdf"
+        with VerificationRenderer(workers=1, cache_root=self.cache) as renderer:
+            self.assertTrue(renderer.create_verification_pdf([broken, self.front], output))
+            self.assertIsNotNone(renderer.render([broken])[0].error)
+        with fitz.open(str(output)) as doc:
+            self.assertEqual(doc.page_count, 1)
+
+
+class PruneCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.cache = str(self.root / "cache")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _render(self, name, days_ago=0):
+        pdf = self.root / f"{name}.pdf"
+        _write_pdf(pdf, 1, name)
+        result = verification.render_pages(str(pdf), self.cache)
+        folder = Path(result.pages[0].path).parent
+        stamp = time.time() - days_ago * 86400
+        os.utime(folder / verification.MANIFEST_NAME, (stamp, stamp))
+        return pdf, folder
+
+    def test_renders_unused_for_too_long_are_removed(self):
+        _, old = self._render("old", days_ago=verification.CACHE_MAX_UNUSED_DAYS + 1)
+        _, recent = self._render("recent", days_ago=1)
+
+        self.assertEqual(verification.prune_cache(self.cache), 1)
+        self.assertFalse(old.exists())
+        self.assertTrue(recent.exists())
+
+    def test_least_recently_used_go_first_when_over_size(self):
+        _, oldest = self._render("oldest", days_ago=3)
+        _, middle = self._render("middle", days_ago=2)
+        _, newest = self._render("newest", days_ago=1)
+        budget = sum(path.stat().st_size for path in newest.iterdir()) + 1
+
+        verification.prune_cache(self.cache, max_bytes=budget)
+        self.assertEqual([path.exists() for path in (oldest, middle, newest)], [False, False, True])
+
+    def test_cache_hits_count_as_use_and_renderer_prunes_on_open(self):
+        kept_pdf, kept = self._render("kept", days_ago=verification.CACHE_MAX_UNUSED_DAYS + 1)
+        _, dropped = self._render("dropped", days_ago=verification.CACHE_MAX_UNUSED_DAYS + 1)
+        verification.render_pages(str(kept_pdf), self.cache)
+
+        with VerificationRenderer(workers=1, cache_root=self.cache):
+            pass
+        self.assertTrue(kept.exists())
+        self.assertFalse(dropped.exists())
+
+
+class VectorProofTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _cards(self, count):
+        paths = []
+        for index in range(count):
+            path = self.root / f"kid{index:02}_FRONT.pdf"
+            _write_pdf(path, 1, f"kid{index:02}")
+            paths.append(path)
+        return paths
+
+    def test_cards_are_imposed_nine_per_page_with_labels(self):
+        output = self.root / "proof.pdf"
+        self.assertTrue(verification.create_vector_proof(self._cards(10), output))
+
+        with fitz.open(str(output)) as doc:
+            self.assertEqual(doc.page_count, 2)
+            text = doc[0].get_text()
+            self.assertIn("kid00_FRONT", text)
+            self.assertIn("kid08_FRONT", text)
+            self.assertNotIn("kid09_FRONT", text)
+            self.assertEqual(doc[0].get_images(), [])
+
+    def test_transparency_heavy_pages_are_flattened(self):
+        path = self.root / "glassy.pdf"
+        doc = fitz.open()
+        page = doc.new_page(width=144, height=216)
+        for step in range(3):
+            page.draw_rect(fitz.Rect(10, 10 + step, 100, 100), fill=(0, 1, 0), fill_opacity=0.2 + step / 10)
+        doc.save(str(path))
+        doc.close()
+
+        output = self.root / "proof.pdf"
+        verification.create_vector_proof([path], output, flatten_threshold=2)
+        with fitz.open(str(output)) as proof:
+            self.assertEqual(len(proof[0].get_images(full=True)), 1)
+
+        verification.create_vector_proof([path], output, flatten_threshold=None)
+        with fitz.open(str(output)) as proof:
+            self.assertEqual(proof[0].get_images(full=True), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -15,16 +15,24 @@ from collections import OrderedDict
 import math
 import shutil
 import _pickle as pickle
-import _thread
+import threading
 import time
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor
 
 from pathlib import Path
 from datetime import datetime
-from PIL import Image
 import os
 
 
 import doc_maker,dc
+import cover_assets
+import verification
+import output_manifest
+import sheet_cache
+import job_engine
+import stage_timing
 import id_card_maker
 import report_card_maker
 import util
@@ -33,36 +41,62 @@ global Input
 
 import os
 
-root = tk.Tk()
-import time
-# create root window
+# The window is built by main(). Worker processes started with spawn
+# re-import this script, so nothing below may create widgets or folders
+# at import time.
+root = None
 
-if not os.path.isdir("finalcovers"):
-   os.makedirs("finalcovers")
-   
-   
 folder = ""
 file = ""
 id_card_file = ""
 report_card_file = ""
 
 
-if os.path.isdir("STICKERS")==False:
-   os.makedirs("STICKERS")
-
 #DOCDRIVER = DOC["DriverData"]
 print_jobs = []
 
+# A binder rolls over once it holds more than BINDER_MAX_PAGES source pages
+# (or its file passes BINDER_MAX_BYTES) and is flushed to disk every
+# BINDER_FLUSH_PAGES pages while it fills.
+BINDER_MAX_PAGES = 300
+BINDER_MAX_BYTES = None
+BINDER_FLUSH_PAGES = 60
+# Finished subjects are imposed into binders by up to BINDER_WORKERS
+# processes while the next subject is personalised.
+BINDER_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+# Covers are personalised and exported by COVER_WORKERS processes.
+COVER_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# Vector proofs rasterise pages with at least this many transparency
+# objects (see verification.transparency_score); None keeps all vector.
+PROOF_FLATTEN_THRESHOLD = verification.FLATTEN_THRESHOLD
+# Merged print files share identical fonts/images/XObjects across cards.
+MERGE_DEDUPE = True
+# Book, ID card and report card sheets are parsed once per file version.
+SHEETS = sheet_cache.SheetCache()
+# Generation and merge runs are queued on JOBS and run JOB_WORKERS at a
+# time; their events reach the widgets every JOB_POLL_MS.
+JOB_WORKERS = job_engine.JOB_WORKERS
+JOB_POLL_MS = 100
+JOBS: Optional[job_engine.JobEngine] = None
+PROGRESS_BOARD: Optional[job_engine.ProgressBoard] = None
+
 SEEKPOS = 9938
 Input=(420*2.83465,(290*2.83465))
+page_scale = 100
 
 school_vars = []
 schools_inner_frame = None
 school_canvas = None
 kid_index_entry = None
 status_label = None
+progress_frame = None
+progress_labels: Dict[str, tk.Label] = {}
 size_info_label = None
 scale_info_label = None
+selected_size = None
+selected_scale = None
+CheckVar1 = CheckVar2 = None
+checkVar3 = checkVar4 = checkVar5 = checkVar6 = checkVar7 = None
 
 last_processed_school_labels: Set[str] = set()
 last_processed_school_ids: Set[str] = set()
@@ -70,17 +104,94 @@ last_processed_school_ids: Set[str] = set()
 
 def set_status_message(message: str, color: str = "green") -> None:
    """Safely update the status label from any thread."""
+   JOBS.post(job_engine.JobEvent(0, "", job_engine.STATUS, message=message, level=color))
+
+
+class RunOptions(NamedTuple):
+   """The UI choices a generation or merge job runs with.
+
+   Taken on the Tk thread when the job is queued, so jobs never read
+   widgets or Tk variables themselves.
+   """
+   covers: bool
+   inner_pages: bool
+   id_cards: bool
+   report_cards: bool
+   vector_proofs: bool
+   old_form: bool
+   size: str
+   input_size: Tuple[float, float]  # page size in points, from ``size``
+   page_scale: int
+   kid_index: str
+   schools: FrozenSet[str]
+   sheet_path: str
+   id_card_sheet: str
+   report_card_sheet: str
+
+
+def _snapshot_options() -> RunOptions:
+   return RunOptions(
+      covers=checkVar3.get() == 1,
+      inner_pages=checkVar4.get() == 1,
+      id_cards=checkVar5.get() == 1,
+      report_cards=checkVar6.get() == 1,
+      vector_proofs=checkVar7.get() == 1,
+      old_form=CheckVar2.get() == 1,
+      size=selected_size.get(),
+      input_size=Input,
+      page_scale=page_scale,
+      kid_index=kid_index_entry.get().strip() if kid_index_entry is not None else "",
+      schools=frozenset(name for var, name in school_vars if var.get() == 1),
+      sheet_path=file,
+      id_card_sheet=id_card_file,
+      report_card_sheet=report_card_file,
+   )
+
+
+def _update_progress_panel(event: job_engine.JobEvent) -> None:
+   """Show one line per pipeline stage of the running job."""
+   if progress_frame is None:
+      return
+   if event.kind == job_engine.STARTED:
+      for label in progress_labels.values():
+         label.destroy()
+      progress_labels.clear()
+   stage = PROGRESS_BOARD.update(event)
+   if stage is None:
+      return
+   label = progress_labels.get(stage.stage)
+   if label is None:
+      label = progress_labels[stage.stage] = tk.Label(progress_frame, anchor="w", justify="left")
+      label.pack(fill="x", anchor="w")
+   label.configure(
+      text=stage.describe(PROGRESS_BOARD.clock()),
+      fg="red" if stage.failed else "black",
+   )
+
+
+def _on_job_event(event: job_engine.JobEvent) -> None:
    if status_label is None:
       return
+   if event.kind == job_engine.STATUS:
+      status_label.configure(text=event.message, fg=event.level)
+   elif event.kind == job_engine.STARTED:
+      status_label.configure(text=f"{event.job} running...", fg="blue")
+   elif event.kind == job_engine.QUEUED and len(JOBS.active()) > 1:
+      status_label.configure(text=f"{event.job} queued.", fg="blue")
+   elif event.kind == job_engine.FAILED:
+      status_label.configure(text=f"{event.job} failed: {event.message}", fg="red")
+   elif event.kind == job_engine.CANCELLED:
+      status_label.configure(text=f"{event.job} cancelled.", fg="red")
 
-   def _update() -> None:
-      status_label.configure(text=message, fg=color)
 
-   try:
-      status_label.after(0, _update)
-   except RuntimeError:
-      # The widget may have been destroyed during shutdown.
-      pass
+def _pump_job_events() -> None:
+   JOBS.dispatch()
+   root.after(JOB_POLL_MS, _pump_job_events)
+
+
+def cancel_jobs() -> None:
+   if not JOBS.cancel_all():
+      set_status_message("Nothing to cancel.", "red")
 
 
 class SchoolDocuments(NamedTuple):
@@ -103,7 +214,16 @@ def _sanitize_school_label(value: str) -> str:
    return sanitized
 
 
-def _merge_pdf_files(pdf_paths: Sequence[Path], output_path: Path) -> bool:
+@stage_timing.timed("merge._merge_pdf_files")
+def _merge_pdf_files(
+   pdf_paths: Sequence[Path], output_path: Path, dedupe: bool = MERGE_DEDUPE
+) -> bool:
+   """Concatenate ``pdf_paths``; with ``dedupe`` identical objects are stored once.
+
+   Cards made from one template each carry their own copy of its fonts,
+   background images and form XObjects; ``garbage=4`` collapses those
+   duplicates when the merged file is saved.
+   """
    combined = fitz.open()
    try:
       for pdf_path in pdf_paths:
@@ -114,68 +234,55 @@ def _merge_pdf_files(pdf_paths: Sequence[Path], output_path: Path) -> bool:
             print(f"Failed to include {pdf_path}: {exc}")
       if combined.page_count:
          output_path.parent.mkdir(parents=True, exist_ok=True)
-         combined.save(str(output_path))
+         if dedupe:
+            combined.save(str(output_path), garbage=4, deflate=True)
+         else:
+            combined.save(str(output_path))
          return True
       return False
    finally:
       combined.close()
 
 
-def _create_verification_pdf(pdf_paths: Sequence[Path], output_path: Path) -> bool:
-   verification_doc = fitz.open()
-   matrix = fitz.Matrix(100 / 72, 100 / 72)
-   try:
-      for pdf_path in pdf_paths:
-         try:
-            with fitz.open(str(pdf_path)) as src:
-               for page in src:
-                  pix = page.get_pixmap(matrix=matrix, alpha=False)
-                  width_pt = pix.width * 72 / 100
-                  height_pt = pix.height * 72 / 100
-                  new_page = verification_doc.new_page(width=width_pt, height=height_pt)
-                  new_page.insert_image(new_page.rect, stream=pix.tobytes("png"))
-         except Exception as exc:
-            print(f"Failed to render {pdf_path}: {exc}")
-      if verification_doc.page_count:
-         output_path.parent.mkdir(parents=True, exist_ok=True)
-         verification_doc.save(str(output_path))
-         return True
-      return False
-   finally:
-      verification_doc.close()
+@stage_timing.timed("merge._create_verification_pdf")
+def _create_verification_pdf(
+   pdf_paths: Sequence[Path],
+   output_path: Path,
+   renderer: Optional[verification.VerificationRenderer] = None,
+   vector: bool = False,
+) -> bool:
+   """Proof of ``pdf_paths``, rasterised or imposed as vectors.
+
+   Rasterised proofs reuse ``renderer``'s pool when one is passed.
+   """
+   if vector:
+      return verification.create_vector_proof(
+         pdf_paths, output_path, flatten_threshold=PROOF_FLATTEN_THRESHOLD
+      )
+   if renderer is None:
+      with verification.VerificationRenderer(workers=1) as renderer:
+         return renderer.create_verification_pdf(pdf_paths, output_path)
+   return renderer.create_verification_pdf(pdf_paths, output_path)
+
+
+def _school_dirs(root_dir: Path) -> List[Path]:
+   return sorted(
+      (Path(entry.path) for entry in os.scandir(root_dir) if entry.is_dir()),
+      key=lambda path: path.name.lower(),
+   )
 
 
 def _collect_child_pdf_paths(school_dir: Path) -> List[Path]:
-   pdf_paths: List[Path] = []
-   child_dirs = [
-      entry
-      for entry in school_dir.iterdir()
-      if entry.is_dir() and entry.name.lower() not in {"working"}
-   ]
-   for child_dir in sorted(child_dirs, key=lambda path: path.name.lower()):
-      front_path: Optional[Path] = None
-      back_path: Optional[Path] = None
-      for pdf_path in sorted(child_dir.glob("*.pdf"), key=lambda path: path.name.lower()):
-         upper_name = pdf_path.name.upper()
-         if upper_name.endswith("_FRONT.PDF"):
-            front_path = pdf_path
-         elif upper_name.endswith("_BACK.PDF"):
-            back_path = pdf_path
-      if front_path is not None:
-         pdf_paths.append(front_path)
-      if back_path is not None:
-         pdf_paths.append(back_path)
-   return pdf_paths
+   """Child PDFs from the school's output manifest, or a scan without one."""
+   return output_manifest.child_pdf_paths(school_dir)
 
 
 def _collect_cover_documents(cover_root: Path) -> List[SchoolDocuments]:
    documents: List[SchoolDocuments] = []
    if not cover_root.is_dir():
       return documents
-   for entry in sorted(cover_root.iterdir(), key=lambda path: path.name.lower()):
-      if not entry.is_dir():
-         continue
-      pdfs = sorted(entry.glob("*.pdf"), key=lambda path: path.name.lower())
+   school_dirs = _school_dirs(cover_root)
+   for entry, pdfs in zip(school_dirs, output_manifest.resolve_many(school_dirs, output_manifest.flat_pdf_paths)):
       if not pdfs:
          continue
       school_id: Optional[str] = None
@@ -195,10 +302,8 @@ def _collect_report_card_documents(report_root: Path) -> List[SchoolDocuments]:
    documents: List[SchoolDocuments] = []
    if not report_root.is_dir():
       return documents
-   for school_dir in sorted(report_root.iterdir(), key=lambda path: path.name.lower()):
-      if not school_dir.is_dir():
-         continue
-      pdfs = _collect_child_pdf_paths(school_dir)
+   school_dirs = _school_dirs(report_root)
+   for school_dir, pdfs in zip(school_dirs, output_manifest.resolve_many(school_dirs, _collect_child_pdf_paths)):
       if not pdfs:
          continue
       school_id: Optional[str] = None
@@ -220,10 +325,8 @@ def _collect_id_card_documents(
    documents: List[SchoolDocuments] = []
    if not id_root.is_dir():
       return documents
-   for school_dir in sorted(id_root.iterdir(), key=lambda path: path.name.lower()):
-      if not school_dir.is_dir():
-         continue
-      pdfs = _collect_child_pdf_paths(school_dir)
+   school_dirs = _school_dirs(id_root)
+   for school_dir, pdfs in zip(school_dirs, output_manifest.resolve_many(school_dirs, _collect_child_pdf_paths)):
       if not pdfs:
          continue
       school_id: Optional[str] = None
@@ -282,13 +385,17 @@ def _record_processed_school(item: Mapping[str, Any]) -> None:
          last_processed_school_ids.add(school_id_str)
 
 
-def _get_allowed_school_filters() -> Tuple[Set[str], Set[str]]:
+def _school_name(item: Mapping[str, Any]) -> Optional[str]:
+   school_value = item.get("school_name")
+   if school_value is None or pd.isna(school_value):
+      return None
+   return str(school_value).strip() or None
+
+
+def _get_allowed_school_filters(selected_names: Iterable[str]) -> Tuple[Set[str], Set[str]]:
    allowed_labels = set(last_processed_school_labels)
    allowed_ids = set(last_processed_school_ids)
 
-   selected_names = {
-      name for var, name in school_vars if var.get() == 1
-   }
    for name in selected_names:
       sanitized = _sanitize_school_label(name)
       if sanitized:
@@ -321,96 +428,88 @@ def _filter_documents_for_merge(
 
 
 def _load_tabular_file(path: str, **kwargs):
-   """Load a spreadsheet or CSV file based on its extension."""
-   suffix = Path(path).suffix.lower()
-   if suffix == ".csv":
-      return pd.read_csv(path, **kwargs)
-   return pd.read_excel(path, **kwargs)
+   """Load a spreadsheet or CSV file through the shared sheet cache."""
+   return SHEETS.load(path, **kwargs)
 
-def storeDocs2(subject):
-   
-   
-   combined = fitz.open()
-   totpgs = 0
-   binderNum = 0
-   #DRIVER = pickle.loads(bytes(info["driver"]))
-   # for file in os.listdir("PDFS"  + "/" + subject):
-     
-   #    for pdf in os.listdir("PDFS"  + "/" + subject+"/" +file):
-     
-   #       totpgs += 1
-   #       with fitz.open(os.path.join("PDFS"  + "/" + subject, file)) as outfile :
-            
-   #          combined.insert_pdf(outfile)
-        
-         
-            
-   #    if totpgs > 300:
-         
-   #       combined.save(r"STICKERS" + '\\' +  subject + str(binderNum) +  '.pdf')
-   #       binderNum += 1
-   #       totpgs = 0
-   #       combined = fitz.open()
-   for directory in os.listdir("PDFS"  + "/" + subject):
-         
-      for pdf in os.listdir("PDFS"  + "/" + subject+"/" +directory):
-            
-            totpgs += 1
-            with fitz.open(os.path.join("PDFS"  + "/" + subject+"/" +directory,pdf)) as outfile :
-            
-               combined.insert_pdf(outfile)
-        
-                 
-         
-            
-      if totpgs > 300:
-         
-         combined.save(r"STICKERS" + '\\' +  subject + str(binderNum) +  '.pdf')
-         binderNum += 1
-         totpgs = 0
-         combined = fitz.open()
-   
+def _register_binders(subject, finished):
+   for path, binderNum in finished:
+      print_jobs.append({"path" : r"FINAL BINDERS", "name" : subject + str(binderNum) +  '.pdf', "driver": "", "checkFORM" : False})
 
-   if totpgs != 0:
-      
-      combined.save(r"STICKERS" + '\\' +  subject + str(binderNum) +  '.pdf')
-            
-   else:
-      raise Exception("pages are zero")
-
-def storeDocs(subject,info, scholname = ''):
+def storeDocs2(subject):
    
-   global Input
-   combined = fitz.open()
-   totpgs = 0
-   binderNum = 0
-   #DRIVER = pickle.loads(bytes(info["driver"]))
-   for file in os.listdir("PDFS"  + "/" + subject):
-    
-      k=util.build_doc("PDFS" + "/" + subject + "/" + file, "", file, info["num"],Input,combined,page_scale, 0, True, scholname)
-     
-      totpgs += info["num"]
-      
-      
-      if totpgs > 300:
-         
-         combined.save(r"FINAL BINDERS" + '\\' + scholname + '_' +  subject + str(binderNum) +  '.pdf')
+   util.assemble_sticker_binders(subject, BINDER_MAX_PAGES, BINDER_MAX_BYTES, BINDER_FLUSH_PAGES)
 
-         print_jobs.append({"path" : r"FINAL BINDERS", "name" : subject + str(binderNum) +  '.pdf', "driver": "", "checkFORM" : False})
-         binderNum += 1
-         totpgs = 0
-         combined = fitz.open()
+def storeDocs(subject,info, input_size, page_scale, scholname = ''):
    
+   # Each binder is registered as soon as it is closed.
+   util.assemble_binders(subject, info["num"], scholname, input_size, page_scale,
+                         BINDER_MAX_PAGES, BINDER_MAX_BYTES, BINDER_FLUSH_PAGES,
+                         on_finish=lambda path, binderNum: _register_binders(subject, [(path, binderNum)]))
+
+
+class _BinderAssembly:
+   """Assembles finished subjects into binders in worker processes.
+
+   ``submit`` hands a subject over as soon as its last book is personalised.
+   Workers put each binder on a manager queue the moment it is closed;
+   ``drain`` registers them in ``print_jobs``, in the order they finished.
+   """
+
+   def __init__(self, input_size, page_scale, workers=BINDER_WORKERS):
+      self._input_size = input_size
+      self._page_scale = page_scale
+      self._pool = ProcessPoolExecutor(max_workers=workers)
+      self._manager = multiprocessing.Manager()
+      self._finished = self._manager.Queue()
+      self._pending = OrderedDict()
+      self.failures = []
+
+   def submit(self, subject, info=None, scholname=''):
+      self.wait_for(subject)
+      self.drain()
+      on_finish = util.FinishedBinders(self._finished, subject)
+      # Each worker returns its stage timings with the binders; wait_for merges them.
+      if subject.endswith("s"):
+         future = self._pool.submit(stage_timing.run_timed, "binder", subject, util.assemble_sticker_binders, subject,
+                                    BINDER_MAX_PAGES, BINDER_MAX_BYTES, BINDER_FLUSH_PAGES, on_finish=on_finish)
+      else:
+         future = self._pool.submit(stage_timing.run_timed, "binder", subject, util.assemble_binders, subject,
+                                    info["num"], scholname, self._input_size, self._page_scale,
+                                    BINDER_MAX_PAGES, BINDER_MAX_BYTES, BINDER_FLUSH_PAGES, on_finish=on_finish)
+      self._pending[subject] = future
+
+   def drain(self):
+      """Register every binder the workers have closed so far."""
+      while True:
+         try:
+            subject, path, binderNum = self._finished.get_nowait()
+         except queue.Empty:
+            return
+         if not subject.endswith("s"):
+            _register_binders(subject, [(path, binderNum)])
 
-   if totpgs != 0:
-      
-      combined.save(r"FINAL BINDERS" + '\\'  + scholname + '_' +  subject + str(binderNum) +  '.pdf')
-
-      print_jobs.append({"path" : r"FINAL BINDERS", "name" : subject + str(binderNum) +  '.pdf', "driver": "", "checkFORM" : False})      
+   def wait_for(self, subject):
+      """Block until ``subject``'s binders are written, before its PDFS are reused."""
+      future = self._pending.pop(subject, None)
+      if future is None:
+         return
+      try:
+         stage_timing.TIMINGS.merge(future.result().timings)
+      except Exception as e:
+         print(f"Failed to assemble binders for {subject}: {e}")
+         self.failures.append((subject, e))
+      finally:
+         self.drain()
+
+   def close(self):
+      for subject in list(self._pending):
+         self.wait_for(subject)
+      self._pool.shutdown()
+      self.drain()
+      self._manager.shutdown()
+      return self.failures
 
 
-   
-   
    # for n in dir(properties["pDevMode"]):
    #    if n in DRIVER.keys():
    #       try:   
@@ -426,22 +525,26 @@ def storeDocs(subject,info, scholname = ''):
 
 
 
-def storePS (tuple, prev, subDict):
+def storePS (tuple, prev, subDict, input_size, page_scale, binders=None, old_form=False):
    
    subject = str(tuple["inner_code"]).zfill(7)
 
    if subject != prev:
+        if binders is not None:
+            binders.wait_for(subject)
         if os.path.isdir("PDFS"  + "/" + subject):
             shutil.rmtree("PDFS"  + "/" + subject)
    
    if subject != prev and prev != "": 
-      if prev.endswith("s"):
+      if binders is not None:
+        binders.submit(prev, subDict.get(prev), tuple["school_name"])
+      elif prev.endswith("s"):
          storeDocs2(prev)
       else:
-        storeDocs(prev, subDict[prev], tuple["school_name"])
+        storeDocs(prev, subDict[prev], input_size, page_scale, tuple["school_name"])
    
    if subject.endswith("s"):
-      doc_maker.personalize(tuple, subject,  CheckVar2.get(),True)
+      doc_maker.personalize(tuple, subject,  old_form,True)
    else:      
       try:
          subDict[subject]
@@ -454,7 +557,7 @@ def storePS (tuple, prev, subDict):
 
          if os.path.isfile(r"\\pixartnas\home\INTERNAL_PROCESSING\FORM"+"\\" + subject + '.pdf') == False:
             
-            formPath = util.build_doc(subjectFolder, r"\\pixartnas\home\INTERNAL_PROCESSING\FORM", subject, numpages,Input,None,page_scale)
+            formPath = util.build_doc(subjectFolder, r"\\pixartnas\home\INTERNAL_PROCESSING\FORM", subject, numpages,input_size,None,page_scale)
             
             
          
@@ -489,7 +592,7 @@ def storePS (tuple, prev, subDict):
       
 
       
-      doc_maker.personalize(tuple, subject, CheckVar2.get(),False)
+      doc_maker.personalize(tuple, subject, old_form,False)
    # storeDocs(subject, str(tuple["BOOKID"]).zfill(3), subDict[subject])
 
 
@@ -521,20 +624,9 @@ def populate_school_checkboxes(sheet_path: Optional[str] = None):
    schools = set()
    for path in paths_to_scan:
       try:
-         df = _load_tabular_file(path, header=0)
+         schools.update(SHEETS.schools(path, header=0))
       except Exception as exc:
          print(f"Failed to read '{path}': {exc}")
-         continue
-
-      if "school_name" not in df.columns:
-         continue
-
-      names = {
-         str(name).strip()
-         for name in df["school_name"].dropna()
-         if str(name).strip() != ""
-      }
-      schools.update(names)
 
    if not schools:
       if status_label is not None:
@@ -580,114 +672,134 @@ def open_report_card_diag():
 
 
 
-def windowDialog():
-   _thread.start_new_thread(make, (0,))
+_prepared_cover_prefixes = set()
+_prepared_cover_lock = threading.Lock()
+_cover_asset_cache = None
+
+
+def _asset_cache():
+   global _cover_asset_cache
+   if _cover_asset_cache is None:
+      _cover_asset_cache = cover_assets.AssetCache()
+   return _cover_asset_cache
+
+
+def _prepare_cover_assets(prefix):
+   """Copy a school's cover assets into Temp/<prefix> once, before its covers are queued."""
+   with _prepared_cover_lock:
+      if prefix in _prepared_cover_prefixes:
+         return
+      _prepared_cover_prefixes.add(prefix)
+      
+      if os.path.isdir("Temp"+"/"+prefix)==False:
+         os.makedirs("Temp"+"/"+prefix)
+         school_covers_folder=dc.cover_folder(prefix)
+         pairs = []
+     
+         for file in os.listdir(school_covers_folder):
+            name, ext = os.path.splitext(file)
+            if file == "Assets" and os.path.isdir(os.path.join(school_covers_folder, file)):
+               if not os.path.isdir("Temp" + "/" + prefix+"/" + file):
+                  os.makedirs("Temp" + "/" + prefix+"/" + file)
+               for sub_file in os.listdir(school_covers_folder+"/"+ file):
+                  pairs.append((school_covers_folder+"/"+ file + "/" + sub_file, "Temp" + "/" + prefix+"/" + file + "/" + sub_file))
+         
+            elif os.path.isfile(os.path.join(school_covers_folder, file)) and  ext!= '.svg':
+               pairs.append((school_covers_folder+"/"+ file, "Temp" + "/" + prefix+"/"+file))
+
+         # Images are converted CMYK->RGB through the persistent asset cache.
+         for (source, destination), e in _asset_cache().copy_assets(pairs):
+            print(f"Failed to copy cover asset {source}: {e}")
+
+
+def _run_with_timings(task: job_engine.Job, run, options: RunOptions):
+   """Run a job with fresh stage timings and write their summary afterwards."""
+   stage_timing.TIMINGS.reset()
+   try:
+      return run(task, options)
+   finally:
+      name = datetime.now().strftime("%Y-%m-%d_%H%M%S_") + task.name.lower()
+      try:
+         json_path, csv_path = stage_timing.TIMINGS.write_summary(name)
+         print(stage_timing.TIMINGS.report())
+         print(f"Stage timings written to {json_path} and {csv_path}")
+      except OSError as exc:
+         print(f"Failed to write stage timings: {exc}")
 
 
-def convert_cmyk_to_rgb(input_path, output_path):
-    with Image.open(input_path) as img:
-        if img.mode == "CMYK":
-            img = img.convert("RGB")
-        img.save(output_path)
+def windowDialog():
+   JOBS.submit("Generation", _run_with_timings, make, _snapshot_options())
+
 
-def make(dum):
+def make(task: job_engine.Job, options: RunOptions):
    spine=0
-   global file, folder, school_vars, kid_index_entry, status_label, selected_size
-   global id_card_file, report_card_file, last_processed_school_labels, last_processed_school_ids
+   global last_processed_school_labels, last_processed_school_ids
+   # Everything chosen in the UI comes from ``options``, taken when the job
+   # was queued; the size, scale and sheets may have changed since.
+   file = options.sheet_path
+   id_card_file = options.id_card_sheet
+   report_card_file = options.report_card_sheet
 
    last_processed_school_labels = set()
    last_processed_school_ids = set()
 
-   processing_books = checkVar3.get()==1 or checkVar4.get()==1
-   processing_id_cards = checkVar5.get()==1
-   processing_report_cards = checkVar6.get()==1
+   processing_books = options.covers or options.inner_pages
+   processing_id_cards = options.id_cards
+   processing_report_cards = options.report_cards
 
    if not processing_books and not processing_id_cards and not processing_report_cards:
-      if status_label is not None:
-         status_label.configure(fg="red", text="Select at least one processing option.")
+      set_status_message("Select at least one processing option.", "red")
       return
 
    if processing_books and file == "":
-      if status_label is not None:
-         status_label.configure(fg="red", text = "Select the book Excel file before processing.")
+      set_status_message("Select the book Excel file before processing.", "red")
       return
 
    if processing_id_cards and id_card_file == "":
-      if status_label is not None:
-         status_label.configure(fg="red", text = "Select the ID card Excel file before processing.")
+      set_status_message("Select the ID card Excel file before processing.", "red")
       return
 
    if processing_report_cards and report_card_file == "":
-      if status_label is not None:
-         status_label.configure(fg="red", text = "Select the report card Excel file before processing.")
+      set_status_message("Select the report card Excel file before processing.", "red")
       return
 
-   current_size = ""
-   if 'selected_size' in globals() and selected_size is not None:
-      current_size = selected_size.get()
-
-   if processing_books and current_size == "":
-      if status_label is not None:
-         status_label.configure(fg="red", text="ERROR SELECT A BOOKLET SIZE ")
+   if processing_books and options.size == "":
+      set_status_message("ERROR SELECT A BOOKLET SIZE ", "red")
       return
 
    if processing_books and os.path.isdir("FINAL BINDERS") == False:
       os.makedirs("FINAL BINDERS", exist_ok=True)
 
-   kid_idx = ""
-   if kid_index_entry is not None:
-      kid_idx = kid_index_entry.get().strip()
-
-   kid_idx = kid_idx if kid_idx is not None else ""
-
-   selected_school_names = {name for var, name in school_vars if var.get() == 1}
+   kid_idx = options.kid_index
+   selected_school_names = options.schools
 
-   process_single_kid = False
    target_user_id = None
    target_book_id = None
 
    if kid_idx:
-      process_single_kid = True
       if kid_idx.upper().startswith('U'):
          target_user_id = kid_idx[1:].strip()
          if target_user_id == "":
-            if status_label is not None:
-               status_label.configure(fg="red", text="Enter a valid user id after 'U'.")
+            set_status_message("Enter a valid user id after 'U'.", "red")
             return
       else:
          try:
             target_book_id = int(kid_idx)
          except ValueError:
-            if status_label is not None:
-               status_label.configure(fg="red", text="Kid index must be numeric or start with 'U'.")
+            set_status_message("Kid index must be numeric or start with 'U'.", "red")
             return
    elif not selected_school_names:
-      if status_label is not None:
-         status_label.configure(fg="red", text="Select at least one school or enter a kid index.")
+      set_status_message("Select at least one school or enter a kid index.", "red")
       return
 
 
-   def matches_selection(item: Dict[str, Any]) -> bool:
-      if process_single_kid:
-         if target_user_id is not None:
-            return str(item.get("user_id", "")).strip() == target_user_id
-         if target_book_id is not None:
-            try:
-               return int(item.get("book_id")) == target_book_id
-            except (TypeError, ValueError):
-               return False
-         return False
-
-      school_value = item.get("school_name", "")
-      if pd.isna(school_value):
-         school_value = ""
-      else:
-         school_value = str(school_value).strip()
-      return school_value in selected_school_names
+   def selected_rows(df: pd.DataFrame) -> pd.DataFrame:
+      # Selection is applied once per sheet so each pipeline only walks
+      # the rows it will process.
+      return df[sheet_cache.selection_mask(df, selected_school_names, target_user_id, target_book_id)]
 
 
-   if status_label is not None:
-      status_label.configure(text="", fg="red")
+   set_status_message("", "red")
 
 
    data: Dict[Any, Dict[str, Any]] = {}
@@ -695,33 +807,36 @@ def make(dum):
    subjectIDX: Dict[str, Dict[str, Any]] = {}
    prev = ""
 
-   colorcodes = ['#ff0000', '#00ff00', '#8F7C00' ,'#0000ff', '#993F00'  ,'#ffff00', '#00ffff', '#ff00ff', '#000000', '#888888',
-'#234567']
-
    if processing_books:
-      df = _load_tabular_file(file, header=0)
-      if "school_name" in df.columns:
-         cleaned_names = {
-            str(name).strip()
-            for name in df["school_name"].dropna()
-            if str(name).strip() != ""
-         }
-         sheet_has_multiple_schools = len(cleaned_names) > 1
+      df = selected_rows(_load_tabular_file(file, header=0))
+      sheet_has_multiple_schools = len(SHEETS.schools(file, header=0)) > 1
       data = df.to_dict('index')
 
    cover_pages_created = 0
 
-   if checkVar3.get()==1:
+   if options.covers:
+      dc.clear_cover_cache()
+      colours = dc.cover_colours(df)
+      invalid_colours = set(colours.index[colours["invalid"]])
+      colours = colours[dc.COLOUR_COLUMNS].to_dict('index')
+      # Rows with bad colour ids are counted as failed covers; the rest of
+      # the sheet still renders.
+      invalid_books = []
       
       if not os.path.isdir("store"):
          os.makedirs("store")
  
+      _prepared_cover_prefixes.clear()
+      cover_jobs = []
+      cover_failures = 0
+      copied_photos = set()
+
       for key,item in data.items():
+         if task.cancelled:
+            break
          if pd.isna(item["last_name"]):
             item["last_name"] = ''
             print(item["book_id"])
-         if not matches_selection(item):
-            continue
 
          _record_processed_school(item)
 
@@ -730,124 +845,147 @@ def make(dum):
          
          item["outer_code"] = str(item["outer_code"]).zfill(7)
          
-         full_path = os.path.join(r"\\pixartnas\home\INTERNAL_PROCESSING\SCHOOLCOVERS"+"\\" + str(item["outer_code"])[:3]  , str(item["outer_code"])+".svg")
+         full_path = dc.cover_svg_path(item["outer_code"])
          
          if not os.path.isfile(full_path):
             continue
-         
-         if os.path.isdir("Temp"+"/"+str(item["outer_code"])[0:3])==False:
-            os.makedirs("Temp"+"/"+str(item["outer_code"])[0:3])
-            school_covers_folder=r"\\pixartnas\home\INTERNAL_PROCESSING\SCHOOLCOVERS"+"\\"+str(item["outer_code"])[0:3]
-           
-            for file in os.listdir(school_covers_folder):
-               name, ext = os.path.splitext(file)
-               if file == "Assets" and os.path.isdir(os.path.join(school_covers_folder, file)):
-                  if not os.path.isdir("Temp" + "/" + str(item["outer_code"])[:3]+"/" + file):
-                     os.makedirs("Temp" + "/" + str(item["outer_code"])[:3]+"/" + file)
-                  for sub_file in os.listdir(school_covers_folder+"/"+ file):
-                     sub_name, sub_ext = os.path.splitext(sub_file)
-                     if not sub_ext.lower().endswith(('.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif')) :
-                        shutil.copyfile(school_covers_folder+"/"+ file + "/" + sub_file, "Temp" + "/" + str(item["outer_code"])[:3]+"/" + file + "/" + sub_file) 
-                     else:
-                        convert_cmyk_to_rgb (school_covers_folder+"/"+ file + "/" + sub_file, "Temp" + "/" + str(item["outer_code"])[:3]+"/" + file + "/" + sub_file)
-               
-               elif os.path.isfile(os.path.join(school_covers_folder, file)) and  ext!= '.svg':
-                  if not ext.lower().endswith(('.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif')) :
-                     shutil.copyfile(school_covers_folder+"/"+ file, "Temp" + "/" + str(item["outer_code"])[:3]+"/"+file)
-                  else:
-                     convert_cmyk_to_rgb (school_covers_folder+"/"+ file, "Temp" + "/" + str(item["outer_code"])[:3]+"/"+file)
-                  continue
-         
-         
-         school_color_code1=colorcodes[int(int(item["school_color_id"])/11)]
-         school_color_code2=colorcodes[int((item["school_color_id"]))%11]
-         
-         grade_colour_code=colorcodes[int(int(item["class_color_id"])%11)]
 
-         
-         kid_color_code1=colorcodes[int(int((item["user_color_id"]))/11)]
-         kid_color_code2=colorcodes[int((item["user_color_id"])%11)]
-         print(kid_color_code2)
-         
-         photo_name = item["user_id"]
-         
-         dc.personalize(item["outer_code"], photo_name , item["school_id"],school_color_code1,school_color_code2,grade_colour_code,kid_color_code1,kid_color_code2,item["first_name"]+" "+item["last_name"],str(item["book_id"]).zfill(3),item,sheet_has_multiple_schools)
-         cover_pages_created += 1
-   
-   if checkVar4.get()==1:
-      for key,item in data.items():
-         if not matches_selection(item):
+         if key in invalid_colours:
+            print(f"Invalid colour ids for book {item['book_id']}: school {item['school_color_id']}, "
+                  f"class {item['class_color_id']}, kid {item['user_color_id']}")
+            invalid_books.append(str(item["book_id"]))
+            cover_failures += 1
             continue
+         
+         _prepare_cover_assets(str(item["outer_code"])[0:3])
 
-         _record_processed_school(item)
-         if str(item["inner_code"]).endswith("b") or str(item["inner_code"]).strip()=="":
-            continue
-         full_path = os.path.join(r"\\pixartnas\home\INTERNAL_PROCESSING\ALL BOOKS FORM\NONP", str(item["inner_code"]).zfill(7) )
-         if not os.path.exists(full_path) and  not str(item["inner_code"]).endswith("s"):
-            continue
+         photo_key = (str(item["school_id"]), str(item["user_id"]))
+         if photo_key not in copied_photos:
+            dc.copy_cover_photo(item["school_id"], item["user_id"])
+            copied_photos.add(photo_key)
          
-         storePS(item, prev, subjectIDX)
-         prev = str(item["inner_code"]).zfill(7)
-      if prev.endswith("s"):
-         storeDocs2(prev)
-      else:
-         storeDocs(prev, subjectIDX[prev], item["school_name"])
+         job = dc.CoverJob(
+            outer_code=item["outer_code"],
+            photo_name=item["user_id"],
+            school_id=item["school_id"],
+            name=item["first_name"]+" "+item["last_name"],
+            bookid=str(item["book_id"]).zfill(3),
+            record=item,
+            multiple_schools=sheet_has_multiple_schools,
+            copy_photo=False,
+            **colours[key],
+         )
+         print(job.kid_color_code2)
+         cover_jobs.append(job)
+
+      cover_total = len(invalid_books) + len(cover_jobs)
+      covers_done = len(invalid_books)
+      task.progress("covers", covers_done, cover_total, failed=cover_failures)
+
+      def _cover_done(job, error):
+         nonlocal covers_done, cover_failures
+         covers_done += 1
+         if error is not None:
+            cover_failures += 1
+         task.progress("covers", covers_done, cover_total, school=_school_name(job.record), failed=cover_failures)
+
+      # Workers only render; the manifest is written here as each cover lands.
+      cover_pages_created, _ = dc.render_covers(
+         cover_jobs, COVER_WORKERS, on_done=_cover_done, cancelled=lambda: task.cancelled)
+      task.check()
+   
+   if options.inner_pages:
+      doc_maker.clear_template_cache()
+      binders = _BinderAssembly(options.input_size, options.page_scale)
+      try:
+         for done, item in enumerate(data.values()):
+            task.check()
+            task.progress("inner pages", done, len(data), school=_school_name(item))
+            _record_processed_school(item)
+            if str(item["inner_code"]).endswith("b") or str(item["inner_code"]).strip()=="":
+               continue
+            full_path = os.path.join(r"\\pixartnas\home\INTERNAL_PROCESSING\ALL BOOKS FORM\NONP", str(item["inner_code"]).zfill(7) )
+            if not os.path.exists(full_path) and  not str(item["inner_code"]).endswith("s"):
+               continue
+            
+            with stage_timing.timer("inner page", record=item.get("book_id")):
+               storePS(item, prev, subjectIDX, options.input_size, options.page_scale, binders, options.old_form)
+            binders.drain()
+            prev = str(item["inner_code"]).zfill(7)
+         if prev != "":
+            binders.submit(prev, subjectIDX.get(prev), item["school_name"])
+      finally:
+         failures = binders.close()
+      task.progress("inner pages", len(data), len(data), failed=len(failures))
+      if failures:
+         print(f"Binder assembly failed for {len(failures)} subject(s).")
 
    id_cards_created = 0
    if processing_id_cards:
       try:
          id_df = _load_tabular_file(id_card_file, header=0)
       except Exception as exc:
-         if status_label is not None:
-            status_label.configure(fg="red", text=f"Failed to load ID card sheet: {exc}")
+         set_status_message(f"Failed to load ID card sheet: {exc}", "red")
          return
 
-      for record in id_df.to_dict("records"):
-         if not matches_selection(record):
-            continue
-
+      id_records = selected_rows(id_df).to_dict("records")
+      id_failures = 0
+      for done, record in enumerate(id_records, 1):
+         task.check()
          _record_processed_school(record)
 
          try:
-            if id_card_maker.personalize_id_card(record):
+            with stage_timing.timer("ID card", record=record.get("user_id")):
+               created = id_card_maker.personalize_id_card(record)
+            if created:
                id_cards_created += 1
          except id_card_maker.TemplateNotFoundError as exc:
             print(exc)
+            id_failures += 1
          except Exception as exc:
             print(f"Failed to generate ID card for {record.get('user_id')}: {exc}")
+            id_failures += 1
+         task.progress("ID cards", done, len(id_records), school=_school_name(record), failed=id_failures)
 
    report_cards_created = 0
    if processing_report_cards:
       try:
          report_df = _load_tabular_file(report_card_file, header=0)
       except Exception as exc:
-         if status_label is not None:
-            status_label.configure(fg="red", text=f"Failed to load report card sheet: {exc}")
+         set_status_message(f"Failed to load report card sheet: {exc}", "red")
          return
 
-      for record in report_df.to_dict("records"):
-         if not matches_selection(record):
-            continue
-
+      report_records = selected_rows(report_df).to_dict("records")
+      report_failures = 0
+      for done, record in enumerate(report_records, 1):
+         task.check()
          _record_processed_school(record)
 
          try:
-            if report_card_maker.personalize_report_card(record):
+            with stage_timing.timer("report card", record=record.get("user_id")):
+               created = report_card_maker.personalize_report_card(record)
+            if created:
                report_cards_created += 1
          except report_card_maker.TemplateNotFoundError as exc:
             print(exc)
+            report_failures += 1
          except Exception as exc:
             print(f"Failed to generate report card for {record.get('user_id')}: {exc}")
+            report_failures += 1
+         task.progress("report cards", done, len(report_records), school=_school_name(record), failed=report_failures)
 
    status_messages = []
    status_color = "green"
 
-   if checkVar3.get()==1:
+   if options.covers:
       if cover_pages_created:
          status_messages.append("Cover pages generated.")
       else:
          status_messages.append("No cover pages generated.")
          status_color = "red"
+      if invalid_books:
+         status_messages.append("Invalid colour ids for book(s): " + ", ".join(invalid_books[:10]) + ".")
+         status_color = "red"
 
    if processing_id_cards:
       if id_cards_created:
@@ -867,7 +1005,7 @@ def make(dum):
       set_status_message(" ".join(status_messages), status_color)
 
 
-def _merge_cover_pages_worker() -> None:
+def _merge_cover_pages_worker(task: job_engine.Job, options: RunOptions) -> None:
    set_status_message("Merging documents...", "blue")
 
    date_prefix = datetime.now().strftime("%d-%m-%Y")
@@ -876,11 +1014,11 @@ def _merge_cover_pages_worker() -> None:
    print_root.mkdir(parents=True, exist_ok=True)
    verification_root.mkdir(parents=True, exist_ok=True)
 
-   allowed_labels, allowed_ids = _get_allowed_school_filters()
+   allowed_labels, allowed_ids = _get_allowed_school_filters(options.schools)
 
-   processing_cover = checkVar3.get() == 1
-   processing_report_cards = checkVar6.get() == 1
-   processing_id_cards = checkVar5.get() == 1
+   processing_cover = options.covers
+   processing_report_cards = options.report_cards
+   processing_id_cards = options.id_cards
 
    cover_documents: List[SchoolDocuments] = []
    report_documents: List[SchoolDocuments] = []
@@ -914,237 +1052,284 @@ def _merge_cover_pages_worker() -> None:
 
    messages: List[str] = []
    any_success = False
-
-   if processing_cover:
-      if cover_documents:
-         cover_print_label = _build_print_label(cover_documents)
-         cover_print_name = (
-            f"{date_prefix}_{cover_print_label}_COVER_Own_Sheet_SS_1 copy.pdf"
-         )
-         cover_print_path = print_root / cover_print_name
-         cover_print_created = _merge_pdf_files(
-            [pdf for doc in cover_documents for pdf in doc.pdfs], cover_print_path
-         )
-         cover_verification_created = 0
-         for doc in cover_documents:
-            verification_name = (
-               f"{date_prefix}_{doc.label}_COVER_verify.pdf"
+   # Vector proofs need no rendering; otherwise one render pool serves
+   # every school's verification PDF.
+   vector_proofs = options.vector_proofs
+   renderer = None if vector_proofs else verification.VerificationRenderer()
+   try:
+      if processing_cover:
+         if cover_documents:
+            cover_print_label = _build_print_label(cover_documents)
+            cover_print_name = (
+               f"{date_prefix}_{cover_print_label}_COVER_Own_Sheet_SS_1 copy.pdf"
             )
-            if _create_verification_pdf(doc.pdfs, verification_root / verification_name):
-               cover_verification_created += 1
-         if cover_print_created or cover_verification_created:
-            any_success = True
-            messages.append(
-               f"Merged cover pages for {len(cover_documents)} school(s)."
+            cover_print_path = print_root / cover_print_name
+            cover_print_created = _merge_pdf_files(
+               [pdf for doc in cover_documents for pdf in doc.pdfs], cover_print_path
             )
+            cover_verification_created = 0
+            for done, doc in enumerate(cover_documents, 1):
+               task.check()
+               task.progress("cover verification", done, len(cover_documents))
+               verification_name = (
+                  f"{date_prefix}_{doc.label}_COVER_verify.pdf"
+               )
+               if _create_verification_pdf(doc.pdfs, verification_root / verification_name, renderer, vector_proofs):
+                  cover_verification_created += 1
+            if cover_print_created or cover_verification_created:
+               any_success = True
+               messages.append(
+                  f"Merged cover pages for {len(cover_documents)} school(s)."
+               )
+            else:
+               messages.append("No cover pages found to merge.")
          else:
             messages.append("No cover pages found to merge.")
       else:
-         messages.append("No cover pages found to merge.")
-   else:
-      messages.append("Cover page merging skipped.")
+         messages.append("Cover page merging skipped.")
 
-   if processing_report_cards:
-      if report_documents:
-         report_print_label = _build_print_label(report_documents)
-         report_print_name = (
-            f"{date_prefix}_{report_print_label}_report_card_Own_Sheet_BB_1 copy.pdf"
-         )
-         report_print_path = print_root / report_print_name
-         report_print_created = _merge_pdf_files(
-            [pdf for doc in report_documents for pdf in doc.pdfs], report_print_path
-         )
-         report_verification_created = 0
-         for doc in report_documents:
-            verification_name = (
-               f"{date_prefix}_{doc.label}_report_card_verify.pdf"
+      if processing_report_cards:
+         if report_documents:
+            report_print_label = _build_print_label(report_documents)
+            report_print_name = (
+               f"{date_prefix}_{report_print_label}_report_card_Own_Sheet_BB_1 copy.pdf"
             )
-            if _create_verification_pdf(doc.pdfs, verification_root / verification_name):
-               report_verification_created += 1
-         if report_print_created or report_verification_created:
-            any_success = True
-            messages.append(
-               f"Merged report cards for {len(report_documents)} school(s)."
+            report_print_path = print_root / report_print_name
+            report_print_created = _merge_pdf_files(
+               [pdf for doc in report_documents for pdf in doc.pdfs], report_print_path
             )
+            report_verification_created = 0
+            for done, doc in enumerate(report_documents, 1):
+               task.check()
+               task.progress("report card verification", done, len(report_documents))
+               verification_name = (
+                  f"{date_prefix}_{doc.label}_report_card_verify.pdf"
+               )
+               if _create_verification_pdf(doc.pdfs, verification_root / verification_name, renderer, vector_proofs):
+                  report_verification_created += 1
+            if report_print_created or report_verification_created:
+               any_success = True
+               messages.append(
+                  f"Merged report cards for {len(report_documents)} school(s)."
+               )
+            else:
+               messages.append("No report cards found to merge.")
          else:
             messages.append("No report cards found to merge.")
       else:
-         messages.append("No report cards found to merge.")
-   else:
-      messages.append("Report card merging skipped.")
-
-   if processing_id_cards:
-      if id_documents:
-         id_verification_created = 0
-         for doc in id_documents:
-            verification_name = (
-               f"{date_prefix}_{doc.label}_ID card_verify.pdf"
-            )
-            if _create_verification_pdf(doc.pdfs, verification_root / verification_name):
-               id_verification_created += 1
-         if id_verification_created:
-            any_success = True
-            messages.append(
-               f"Merged ID cards for {len(id_documents)} school(s)."
-            )
+         messages.append("Report card merging skipped.")
+
+      if processing_id_cards:
+         if id_documents:
+            id_verification_created = 0
+            for done, doc in enumerate(id_documents, 1):
+               task.check()
+               task.progress("ID card verification", done, len(id_documents))
+               verification_name = (
+                  f"{date_prefix}_{doc.label}_ID card_verify.pdf"
+               )
+               if _create_verification_pdf(doc.pdfs, verification_root / verification_name, renderer, vector_proofs):
+                  id_verification_created += 1
+            if id_verification_created:
+               any_success = True
+               messages.append(
+                  f"Merged ID cards for {len(id_documents)} school(s)."
+               )
+            else:
+               messages.append("No ID cards found to merge.")
          else:
             messages.append("No ID cards found to merge.")
       else:
-         messages.append("No ID cards found to merge.")
-   else:
-      messages.append("ID card merging skipped.")
-
+         messages.append("ID card merging skipped.")
+   finally:
+      if renderer is not None:
+         renderer.close()
    status_color = "green" if any_success else "red"
    set_status_message(" ".join(messages), status_color)
 
 
 def merge_cover_pages() -> None:
-   _thread.start_new_thread(_merge_cover_pages_worker, tuple())
+   JOBS.submit("Merge", _run_with_timings, _merge_cover_pages_worker, _snapshot_options())
 
 
-# root window title and dimension
-root.title("Processing UI")
-# Set geometry(widthxheight)
-root.geometry('520x680')
+def _configure_schools_frame(event):
+   school_canvas.configure(scrollregion=school_canvas.bbox("all"))
 
-root.grid_columnconfigure(0, weight=1)
-root.grid_columnconfigure(1, weight=1)
-root.grid_rowconfigure(6, weight=1)
 
+def display_size(*args):
+   size = selected_size.get()
+   if size_info_label is not None:
+      size_info_label.configure(text=f"Selected Size: {size} mm")
+   width, height = map(int, size.split('X'))
+   global Input
+   Input=(width*2.83465,height*2.83465)
 
-#_thread.start_new_thread(printOut, (0,))
-# adding Entry Field
-button=tk.Button(root, text="Open Excel Sheet", command=open_win_diag)
-button.grid(column=0, row=0, columnspan=2, pady=(10,5))
 
-id_button=tk.Button(root, text="Open ID Card Sheet", command=open_id_card_diag)
-id_button.grid(column=0, row=1, columnspan=2, pady=(0,5))
+def display_scale(*args):
 
-report_button=tk.Button(root, text="Open Report Card Sheet", command=open_report_card_diag)
-report_button.grid(column=0, row=2, columnspan=2, pady=(0,5))
+   scale=selected_scale.get()
+   global page_scale
+   page_scale=int(scale)
+   if scale_info_label is not None:
+      scale_info_label.configure(text=f"Selected scale is {scale}%")
 
-kid_label = tk.Label(root, text = "Kid Index (optional):")
-kid_label.grid(column=0, row=3, sticky="w", padx=5)
-kid_index_entry = tk.Entry(root, width=20)
-kid_index_entry.grid(column=1, row=3, sticky="ew", padx=5)
 
-status_label = tk.Label(root, fg = "red", text = "")
-status_label.grid(column=0, row=4, columnspan=2, sticky="w", padx=5, pady=(5,0))
+def _prepare_output_dirs():
+   for folder_name in ("finalcovers", "STICKERS"):
+      if not os.path.isdir(folder_name):
+         os.makedirs(folder_name)
 
-school_label = tk.Label(root, text="Select schools to process:")
-school_label.grid(column=0, row=5, columnspan=2, sticky="w", padx=5, pady=(10,0))
 
-school_frame = tk.Frame(root, bd=1, relief="sunken")
-school_frame.grid(column=0, row=6, columnspan=2, sticky="nsew", padx=5, pady=(0,10))
+def main():
+   """Build the window and run the Tk loop; only ever called from ``__main__``."""
+   global root, JOBS, PROGRESS_BOARD
+   global kid_index_entry, status_label, schools_inner_frame, school_canvas, progress_frame
+   global size_info_label, scale_info_label, selected_size, selected_scale
+   global CheckVar1, CheckVar2, checkVar3, checkVar4, checkVar5, checkVar6, checkVar7
 
-school_canvas = tk.Canvas(school_frame, highlightthickness=0)
-school_canvas.pack(side="left", fill="both", expand=True)
-school_scrollbar = tk.Scrollbar(school_frame, orient="vertical", command=school_canvas.yview)
-school_scrollbar.pack(side="right", fill="y")
-school_canvas.configure(yscrollcommand=school_scrollbar.set)
+   _prepare_output_dirs()
+   JOBS = job_engine.JobEngine(max_workers=JOB_WORKERS)
+   PROGRESS_BOARD = job_engine.ProgressBoard()
+   root = tk.Tk()
 
-schools_inner_frame = tk.Frame(school_canvas)
-school_canvas.create_window((0,0), window=schools_inner_frame, anchor="nw")
+   # root window title and dimension
+   root.title("Processing UI")
+   # Set geometry(widthxheight)
+   root.geometry('520x860')
 
-def _configure_schools_frame(event):
-    school_canvas.configure(scrollregion=school_canvas.bbox("all"))
+   root.grid_columnconfigure(0, weight=1)
+   root.grid_columnconfigure(1, weight=1)
+   root.grid_rowconfigure(6, weight=1)
 
-schools_inner_frame.bind("<Configure>", _configure_schools_frame)
 
-options = ["440X290", "380X255", "420X290", "420X297", "297X210"]
-selected_size = tk.StringVar()
+   #_thread.start_new_thread(printOut, (0,))
+   # adding Entry Field
+   button=tk.Button(root, text="Open Excel Sheet", command=open_win_diag)
+   button.grid(column=0, row=0, columnspan=2, pady=(10,5))
 
-size_label = tk.Label(root, text="Select a size from dropdown")
-size_label.grid(column=0, row=7, sticky="w", padx=5)
+   id_button=tk.Button(root, text="Open ID Card Sheet", command=open_id_card_diag)
+   id_button.grid(column=0, row=1, columnspan=2, pady=(0,5))
 
-size_dropdown = tk.OptionMenu(root, selected_size, *options)
-size_dropdown.grid(column=1, row=7, sticky="ew", padx=5)
+   report_button=tk.Button(root, text="Open Report Card Sheet", command=open_report_card_diag)
+   report_button.grid(column=0, row=2, columnspan=2, pady=(0,5))
 
-size_info_label = tk.Label(root, fg = "blue", text = "")
-size_info_label.grid(column=0, row=8, columnspan=2, sticky="w", padx=5)
+   kid_label = tk.Label(root, text = "Kid Index (optional):")
+   kid_label.grid(column=0, row=3, sticky="w", padx=5)
+   kid_index_entry = tk.Entry(root, width=20)
+   kid_index_entry.grid(column=1, row=3, sticky="ew", padx=5)
 
+   status_label = tk.Label(root, fg = "red", text = "")
+   status_label.grid(column=0, row=4, columnspan=2, sticky="w", padx=5, pady=(5,0))
 
-def display_size(*args):
-    size = selected_size.get()
-    if size_info_label is not None:
-        size_info_label.configure(text=f"Selected Size: {size} mm")
-    width, height = map(int, size.split('X'))
-    global Input
-    Input=(width*2.83465,height*2.83465)
+   school_label = tk.Label(root, text="Select schools to process:")
+   school_label.grid(column=0, row=5, columnspan=2, sticky="w", padx=5, pady=(10,0))
 
+   school_frame = tk.Frame(root, bd=1, relief="sunken")
+   school_frame.grid(column=0, row=6, columnspan=2, sticky="nsew", padx=5, pady=(0,10))
 
-selected_size.set("420X290")
-selected_size.trace_add("write", display_size)
+   school_canvas = tk.Canvas(school_frame, highlightthickness=0)
+   school_canvas.pack(side="left", fill="both", expand=True)
+   school_scrollbar = tk.Scrollbar(school_frame, orient="vertical", command=school_canvas.yview)
+   school_scrollbar.pack(side="right", fill="y")
+   school_canvas.configure(yscrollcommand=school_scrollbar.set)
 
+   schools_inner_frame = tk.Frame(school_canvas)
+   school_canvas.create_window((0,0), window=schools_inner_frame, anchor="nw")
 
-def display_scale(*args):
+   schools_inner_frame.bind("<Configure>", _configure_schools_frame)
 
-   scale=selected_scale.get()
-   global page_scale
-   page_scale=int(scale)
-   if scale_info_label is not None:
-      scale_info_label.configure(text=f"Selected scale is {scale}%")
+   options = ["440X290", "380X255", "420X290", "420X297", "297X210"]
+   selected_size = tk.StringVar()
 
+   size_label = tk.Label(root, text="Select a size from dropdown")
+   size_label.grid(column=0, row=7, sticky="w", padx=5)
 
-scale_label=tk.Label(root,text="Select a scale from dropdown in %")
-scale_label.grid(column=0, row=9, sticky="w", padx=5)
-scale_options=[50,60,70,80,90,100]
-selected_scale=tk.StringVar()
-selected_scale.trace_add("write", display_scale)
-selected_scale.set(100)
+   size_dropdown = tk.OptionMenu(root, selected_size, *options)
+   size_dropdown.grid(column=1, row=7, sticky="ew", padx=5)
 
-scale_dropdown = tk.OptionMenu(root, selected_scale, *scale_options)
-scale_dropdown.grid(column=1, row=9, sticky="ew", padx=5)
+   size_info_label = tk.Label(root, fg = "blue", text = "")
+   size_info_label.grid(column=0, row=8, columnspan=2, sticky="w", padx=5)
 
-scale_info_label=tk.Label(root,fg="red",text="")
-scale_info_label.grid(column=0,row=10,columnspan=2,sticky="w",padx=5)
 
-display_scale()
+   selected_size.set("420X290")
+   selected_size.trace_add("write", display_size)
 
 
-button3=Button(root, text="DONE", command=windowDialog)
-button3.grid(column=0, row=11, columnspan=2, pady=(10,5))
+   scale_label=tk.Label(root,text="Select a scale from dropdown in %")
+   scale_label.grid(column=0, row=9, sticky="w", padx=5)
+   scale_options=[50,60,70,80,90,100]
+   selected_scale=tk.StringVar()
+   selected_scale.trace_add("write", display_scale)
+   selected_scale.set(100)
 
+   scale_dropdown = tk.OptionMenu(root, selected_scale, *scale_options)
+   scale_dropdown.grid(column=1, row=9, sticky="ew", padx=5)
 
-CheckVar1 = IntVar()
-C1 = tk.Checkbutton(root, text = "SKIP FORM", variable = CheckVar1, \
-                 onvalue = 1, offvalue = 0, height=2, \
-                 width = 20)
-C1.grid(column =0, row =12, columnspan=2, sticky="w", padx=5)
+   scale_info_label=tk.Label(root,fg="red",text="")
+   scale_info_label.grid(column=0,row=10,columnspan=2,sticky="w",padx=5)
 
+   display_scale()
 
-CheckVar2 = IntVar()
-C2 = tk.Checkbutton(root, text = "OLD FORM", variable = CheckVar2, \
-                 onvalue = 1, offvalue = 0, height=2, \
-                 width = 20)
-C2.grid(column =0, row =13, columnspan=2, sticky="w", padx=5)
 
+   button3=Button(root, text="DONE", command=windowDialog)
+   button3.grid(column=0, row=11, columnspan=2, pady=(10,5))
 
-checkVar3=tk.IntVar(value=0)
 
-cv_page_button=tk.Checkbutton(root,var=checkVar3,text="Cover Page",height=2)
-cv_page_button.grid(row=14, column=0, columnspan=2, sticky="w", padx=5)
-checkVar4=tk.IntVar(value=0)
+   CheckVar1 = IntVar()
+   C1 = tk.Checkbutton(root, text = "SKIP FORM", variable = CheckVar1, \
+                    onvalue = 1, offvalue = 0, height=2, \
+                    width = 20)
+   C1.grid(column =0, row =12, columnspan=2, sticky="w", padx=5)
 
 
+   CheckVar2 = IntVar()
+   C2 = tk.Checkbutton(root, text = "OLD FORM", variable = CheckVar2, \
+                    onvalue = 1, offvalue = 0, height=2, \
+                    width = 20)
+   C2.grid(column =0, row =13, columnspan=2, sticky="w", padx=5)
 
-Ip_button=tk.Checkbutton(root,var=checkVar4,text="Inner Pages",height=2)
-Ip_button.grid(row=15, column=0, columnspan=2, sticky="w", padx=5)
 
-checkVar5=tk.IntVar(value=0)
+   checkVar3=tk.IntVar(value=0)
 
-id_cards_button=tk.Checkbutton(root, var=checkVar5, text="ID Cards", height=2)
-id_cards_button.grid(row=16, column=0, columnspan=2, sticky="w", padx=5)
+   cv_page_button=tk.Checkbutton(root,var=checkVar3,text="Cover Page",height=2)
+   cv_page_button.grid(row=14, column=0, columnspan=2, sticky="w", padx=5)
+   checkVar4=tk.IntVar(value=0)
 
-checkVar6=tk.IntVar(value=0)
 
-report_cards_button=tk.Checkbutton(root, var=checkVar6, text="Report Cards", height=2)
-report_cards_button.grid(row=17, column=0, columnspan=2, sticky="w", padx=5)
 
-merge_button = tk.Button(root, text="Merge PDF", command=merge_cover_pages)
-merge_button.grid(column=0, row=18, columnspan=2, pady=(10,5))
+   Ip_button=tk.Checkbutton(root,var=checkVar4,text="Inner Pages",height=2)
+   Ip_button.grid(row=15, column=0, columnspan=2, sticky="w", padx=5)
 
-if __name__=="__main__":
+   checkVar5=tk.IntVar(value=0)
+
+   id_cards_button=tk.Checkbutton(root, var=checkVar5, text="ID Cards", height=2)
+   id_cards_button.grid(row=16, column=0, columnspan=2, sticky="w", padx=5)
+
+   checkVar6=tk.IntVar(value=0)
+
+   report_cards_button=tk.Checkbutton(root, var=checkVar6, text="Report Cards", height=2)
+   report_cards_button.grid(row=17, column=0, columnspan=2, sticky="w", padx=5)
+
+   checkVar7=tk.IntVar(value=0)
+
+   vector_proofs_button=tk.Checkbutton(root, var=checkVar7, text="Vector verification proofs", height=2)
+   vector_proofs_button.grid(row=18, column=0, columnspan=2, sticky="w", padx=5)
+
+   merge_button = tk.Button(root, text="Merge PDF", command=merge_cover_pages)
+   merge_button.grid(column=0, row=19, columnspan=2, pady=(10,5))
+
+   cancel_button = tk.Button(root, text="Cancel", command=cancel_jobs)
+   cancel_button.grid(column=0, row=20, columnspan=2, pady=(0,5))
+
+   progress_frame = tk.LabelFrame(root, text="Progress")
+   progress_frame.grid(column=0, row=21, columnspan=2, sticky="ew", padx=5, pady=(0,10))
+
+   JOBS.subscribe(_on_job_event)
+   JOBS.subscribe(_update_progress_panel)
+   _pump_job_events()
 
    root.mainloop()
 
+
+if __name__=="__main__":
+   main()
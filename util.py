@@ -10,13 +10,9 @@ import os
 import sys
 import math
 import logging
-import fitz  # PyMuPDF
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-import os
-import sys
-import math
-import logging
+import functools
+from typing import NamedTuple, Optional, Tuple
+import stage_timing
 # def addBorder(sizeArt, page, mark="", endSticksLev=0, diff=False):
 #     if mark == "" and endSticksLev == 0 and not diff:
 #         return
@@ -50,120 +46,222 @@ def iter_pages(pages, aspect):
         yield first + 1, 90, (1 - refinedaspect) / 2, 0.5 + (refinedaspect) / 2
         yield last - 1, 90, (1 - refinedaspect) / 2, 0.5
 
-def build_doc(in_file, out_file, name, pages, i,combined=None,page_scale=100, scale=0, addMarker=False, school = ''):
-    print(page_scale)
+DEBUG = False
+
+
+class SheetSlot(NamedTuple):
+    """Placement of one source page in an imposed book."""
+    page: int  # zero-based source page number
+    rotate: int  # rotation yielded by iter_pages
+    new_sheet: bool  # the slot starts a new output sheet
+    right: bool  # placed on the right half of the sheet
+    book_id: bool  # the book id is printed on this sheet when markers are on
+    marker: Optional[Tuple[float, float, float, float]]  # completion marker rect
+
+
+class ImpositionPlan(NamedTuple):
+    sheet_size: Tuple[float, float]
+    page_scale: int
+    school_pos: Tuple[float, float]
+    book_id_pos: Tuple[float, float]
+    slots: Tuple[SheetSlot, ...]
+
+
+@functools.lru_cache(maxsize=None)
+def imposition_plan(pages, sheet_size, page_scale=100):
+    """Compute the sheet layout of a ``pages``-page book once per key.
+
+    Every student's copy of a book shares the same plan, so builds only
+    stream their pages into the precomputed slots.
+    """
+    width, height = sheet_size
+    marker_x = 2*(width/3)
+    marker_w = width/9
+    marker_h = 20
+    markers = {
+        pages-5: (marker_x, 0, marker_x+marker_w, marker_h),
+        pages-3: (marker_x+marker_w, 0, marker_x+2*marker_w, marker_h),
+        pages-1: (marker_x+2*marker_w, 0, marker_x+3*marker_w, marker_h),
+    }
+    slots = tuple(
+        SheetSlot(
+            page=p,
+            rotate=r,
+            new_sheet=i%2 == 0,
+            right=i%4 == 0 or i%4 == 3,
+            book_id=i == 1 or i == pages-1,
+            marker=markers.get(i),
+        )
+        for i, (p, r, x, y) in enumerate(iter_pages(pages, 1))
+    )
+    return ImpositionPlan(sheet_size, page_scale, (width/2, height/4), (width/2, height/2), slots)
+
+
+@functools.lru_cache(maxsize=None)
+def placement_rect(sheet_size, page_scale, right, src_width, src_height):
+    """Return the (x0, y0, x1, y1) box a source page of the given size fills."""
+    if page_scale > 100:
+        raise ValueError("page_scale cannot be greater than 100")
+    width, height = sheet_size
+    page_scalenew = page_scale/100
+    max_width = width/2*page_scalenew
+    max_height = height*page_scalenew
+
+    if src_width/src_height > max_width/max_height:
+        page_width = max_width
+        page_height = src_height*(max_width/src_width)
+    else:
+        page_height = max_height
+        page_width = src_width*(max_height/src_height)
+
+    start_x = (width/2-page_width)/2
+    start_y = (height-page_height)/2
+    # Right-hand pages sit in the second half of the sheet
+    offset = width/2 if right else 0
+    return (int(offset + start_x), int(start_y), int(offset + page_width + start_x), int(page_height + start_y))
+
+
+def _debug(enabled, *args):
+    if enabled:
+        print(*args)
+
+
+def open_source_pages(in_file, pages):
+    """Open every existing ``NN.pdf`` page of a book once; missing pages are skipped."""
+    sources = {}
+    for p in range(pages):
+        file_path = os.path.join(in_file, f"{p + 1:02}.pdf")
+        if os.path.exists(file_path):
+            sources[p] = fitz.open(file_path)
+    return sources
+
+
+class BinderWriter:
+    """Write imposed books into binder PDFs on disk while they are built.
+
+    The open binder is flushed with an incremental save every
+    ``flush_pages`` units and reopened from disk, so finished pages leave
+    memory. Once a binder holds more than ``max_pages`` units (or its file
+    passes ``max_bytes``) it is closed and ``on_finish(path, number)`` is
+    called right away; the next book starts binder ``number + 1``.
+    """
+
+    def __init__(self, path_for, max_pages=300, max_bytes=None, flush_pages=50, on_finish=None):
+        self.path_for = path_for
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.flush_pages = flush_pages
+        self.on_finish = on_finish
+        self.number = 0
+        self.units = 0
+        self._doc = None
+        self._on_disk = False
+        self._unflushed = 0
+
+    @property
+    def path(self):
+        return self.path_for(self.number)
+
+    @property
+    def doc(self):
+        """The binder document new pages should be added to."""
+        if self._doc is None:
+            self._doc = fitz.open()
+        return self._doc
+
+    def added(self, units):
+        """Record ``units`` pages added to ``doc``; flush or roll over as needed."""
+        self.units += units
+        self._unflushed += units
+        if self.units > self.max_pages:
+            self._finish()
+            return
+        if self._unflushed >= self.flush_pages:
+            self.flush()
+            if self.max_bytes and os.path.getsize(self.path) > self.max_bytes:
+                self._finish()
+
+    def flush(self):
+        if self._doc is None or self._doc.page_count == 0:
+            return
+        if self._on_disk:
+            self._doc.save(self.path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+        else:
+            self._doc.save(self.path)
+            self._on_disk = True
+        self._doc.close()
+        self._doc = fitz.open(self.path)
+        self._unflushed = 0
+
+    def _finish(self):
+        if self._unflushed or not self._on_disk:
+            self.flush()
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+        if self._on_disk and self.on_finish is not None:
+            self.on_finish(self.path, self.number)
+        self.number += 1
+        self.units = 0
+        self._on_disk = False
+        self._unflushed = 0
+
+    def close(self):
+        """Finish the open binder; returns False when it has no pages."""
+        if self.units == 0:
+            if self._doc is not None:
+                self._doc.close()
+                self._doc = None
+            return False
+        self._finish()
+        return True
+
+
+@stage_timing.timed()
+def build_doc(in_file, out_file, name, pages, i,combined=None,page_scale=100, scale=0, addMarker=False, school = '', debug=None):
+    debug = DEBUG if debug is None else debug
+    _debug(debug, page_scale)
     if pages % 4 != 0 or not os.path.exists(in_file):
         print(f"ERROR IN {name}")
         return
     
-    sizchange = i
+    sizchange = tuple(i)
+    plan = imposition_plan(pages, sizchange, page_scale)
     
     if combined == None:
         out = fitz.open()
     else:
         out = combined
     
-    for i, (p, r, x, y) in enumerate(iter_pages(pages, 1)):
-        
-        if i%2==0 :
-            new_page = out.new_page(width=sizchange[0], height=sizchange[1])
-            new_page.insert_text((sizchange[0]/2,sizchange[1]/4), school, rotate=90,fontsize=12, fontname="helvetica", color=(0, 0, 0))     
-        
-        if (i == 1 or (i == pages-1)) and addMarker:
-            book_id=name
-            new_page.insert_text((sizchange[0]/2,sizchange[1]/2), book_id, rotate=90,fontsize=20, fontname="helvetica", color=(0, 0, 0))
-        
-        start_x=2*(sizchange[0]/3)
-        start_y=0
-        height=20
-        width=sizchange[0]/9
-        end_y=start_y+height
-        rect_end_x=0
-        if i==pages-5:
-            rect_start_x=start_x
-            rect_end_x=rect_start_x+width
-            rect = fitz.Rect(rect_start_x, start_y,  rect_end_x, height)
-            new_page.draw_rect(rect, color=(0, 0, 0), width=1)  
+    # Each source page is opened once and stays open for the whole build so
+    # show_pdf_page can reuse PyMuPDF's per-source xref (graft) cache.
+    sources = open_source_pages(in_file, pages)
+    try:
+        for slot in plan.slots:
             
-        elif i==pages-3:
-            rect_start_x=start_x+width
-            rect_end_x=rect_start_x+width
-            print("rect of last 2nd ",rect_start_x)
-            rect = fitz.Rect(rect_start_x, start_y, rect_end_x, end_y)
-            new_page.draw_rect(rect, color=(0, 0, 0), width=1) 
-        
-        elif i==pages-1:
-            rect_start_x=start_x+2*width
-             
-            rect_end_x=rect_start_x+width
-            print("rect of last page",rect_end_x)
-            rect = fitz.Rect(rect_start_x, start_y, rect_end_x, end_y)
-            new_page.draw_rect(rect, color=(0, 0, 0), width=1) 
+            if slot.new_sheet:
+                new_page = out.new_page(width=sizchange[0], height=sizchange[1])
+                new_page.insert_text(plan.school_pos, school, rotate=90,fontsize=12, fontname="helvetica", color=(0, 0, 0))     
             
+            if slot.book_id and addMarker:
+                new_page.insert_text(plan.book_id_pos, name, rotate=90,fontsize=20, fontname="helvetica", color=(0, 0, 0))
             
-        
-        """
-        if addMarker:
-            addBorder(sizchange, new_page, name if i == 0 else "", i // 4 if i % 4 == 0 else 0, True)
-        """
-        if p < pages:
-            file_path = os.path.join(in_file, f"{p + 1:02}.pdf")
-            if os.path.exists(file_path):
-                src_doc = fitz.open(file_path)
-                src_page = src_doc[0]
-                src_doc.close()
-            else:
+            if slot.marker is not None:
+                _debug(debug, "marker rect", slot.marker)
+                new_page.draw_rect(fitz.Rect(slot.marker), color=(0, 0, 0), width=1)
+                
+            src_doc = sources.get(slot.page)
+            if src_doc is None:
                 continue  # Skip missing pages
-        
-        file_path = os.path.join(in_file, f"{p + 1:02}.pdf")    
-        src_doc = fitz.open(file_path)
-        
-        src_page = src_doc[0]
-       
-        if page_scale<=100:
-            page_scalenew = page_scale/100
-          
-            max_width=sizchange[0]/2*page_scalenew
-            max_height=sizchange[1]*page_scalenew 
-          
-            
-            input_ratio=(src_page.rect.width/src_page.rect.height)
-           
-            output_ratio=max_width/max_height
-           
             
-            if input_ratio > output_ratio:
-                page_width=max_width
-                page_height=src_page.rect.height*(max_width/src_page.rect.width)
-            else:
-                page_height=max_height
-                page_width=src_page.rect.width*(max_height/src_page.rect.height)  
-            
-        else:
-            print("scale cant be greater than zero")
-            
-        print(max_width, max_height)
-        print(src_page.rect.width, src_page.rect.height)
-        print(page_width, page_height)
-        
-        start_x=(sizchange[0]/2-page_width)/2
-        start_y=(sizchange[1]-page_height)/2    
-                    # Place the  page (page1) on the right side
-        if i%4==0 or i%4== 3:
-            newRec = fitz.Rect(int(sizchange[0]/2 + start_x),int(start_y) ,int(sizchange[0]/2 + page_width + start_x) ,int(page_height+start_y))       
-            
-            new_page.show_pdf_page(newRec, src_doc, 0)
-            
-            
-        else:
-            newRec = fitz.Rect(int(start_x),int(start_y) ,int(page_width + start_x) ,int(page_height+start_y))            
+            src_rect = src_doc[0].rect
+            newRec = placement_rect(sizchange, page_scale, slot.right, src_rect.width, src_rect.height)
+            _debug(debug, src_rect.width, src_rect.height, newRec)
             
-            new_page.show_pdf_page(newRec, src_doc, 0)  
-            
-            # Place the right page (page1) on the right side
-                
-        src_doc.close()
-        
+            new_page.show_pdf_page(fitz.Rect(newRec), src_doc, 0)
+    finally:
+        for src_doc in sources.values():
+            src_doc.close()
             
     output_path = os.path.join(out_file, f"{name}.pdf")
     
@@ -172,4 +270,74 @@ def build_doc(in_file, out_file, name, pages, i,combined=None,page_scale=100, sc
     if combined == None:
         out.save(output_path)
     
-    return output_path
\ No newline at end of file
+    return output_path
+
+
+class FinishedBinders(NamedTuple):
+    """``on_finish`` for binders assembled in a worker process.
+
+    Puts ``(subject, path, binder number)`` on ``queue`` (a
+    ``multiprocessing.Manager().Queue()``) as each binder is closed, so the
+    parent can register it while the rest of the subject is still imposed.
+    """
+    queue: object
+    subject: str
+
+    def __call__(self, path, number):
+        self.queue.put((self.subject, path, number))
+
+
+def _collect_finished(finished, on_finish):
+    def finish(path, binderNum):
+        finished.append((path, binderNum))
+        if on_finish is not None:
+            on_finish(path, binderNum)
+    return finish
+
+
+def assemble_binders(subject, pages, scholname, sheet_size, page_scale, max_pages=300, max_bytes=None, flush_pages=60,
+                     in_root="PDFS", out_root="FINAL BINDERS", on_finish=None):
+    """Impose every personalised book of ``subject`` into binders.
+
+    Module-level so it can run in a worker process. ``on_finish(path,
+    binder number)`` is called as soon as each binder is closed; the
+    ``(path, binder number)`` of every finished binder is also returned in
+    order.
+    """
+    finished = []
+    writer = BinderWriter(
+        lambda binderNum: out_root + '\\' + scholname + '_' + subject + str(binderNum) + '.pdf',
+        max_pages=max_pages,
+        max_bytes=max_bytes,
+        flush_pages=flush_pages,
+        on_finish=_collect_finished(finished, on_finish),
+    )
+    for file in os.listdir(in_root + "/" + subject):
+        build_doc(in_root + "/" + subject + "/" + file, "", file, pages, sheet_size, writer.doc, page_scale, 0, True, scholname)
+        writer.added(pages)
+    writer.close()
+    return finished
+
+
+def assemble_sticker_binders(subject, max_pages=300, max_bytes=None, flush_pages=60,
+                             in_root="PDFS", out_root="STICKERS", on_finish=None):
+    """Concatenate every sticker PDF of ``subject`` into binders; see assemble_binders."""
+    finished = []
+    writer = BinderWriter(
+        lambda binderNum: out_root + '\\' + subject + str(binderNum) + '.pdf',
+        max_pages=max_pages,
+        max_bytes=max_bytes,
+        flush_pages=flush_pages,
+        on_finish=_collect_finished(finished, on_finish),
+    )
+    for directory in os.listdir(in_root + "/" + subject):
+        totpgs = 0
+        for pdf in os.listdir(in_root + "/" + subject + "/" + directory):
+            totpgs += 1
+            with fitz.open(os.path.join(in_root + "/" + subject + "/" + directory, pdf)) as outfile:
+                writer.doc.insert_pdf(outfile)
+        writer.added(totpgs)
+
+    if not writer.close():
+        raise Exception("pages are zero")
+    return finished
@@ -0,0 +1,276 @@
+"""Verification PDFs for merged covers, report cards and ID cards.
+
+``VerificationRenderer`` rasterises every page at VERIFY_DPI and stores it as
+a JPEG under ``CACHE_ROOT/<sha256 of the source PDF>``, so merging again only
+re-renders cards whose PDF changed; rendering runs on a process pool.
+
+The cache lives in ``verification_cache/`` under the working directory.
+Every edit to a card leaves its old renders behind, so opening a renderer
+prunes the cache: PDFs not rendered or reused for CACHE_MAX_UNUSED_DAYS go
+first, then the least recently used until it fits in CACHE_MAX_BYTES.
+Deleting the folder clears it; cards are simply rendered again.
+
+``create_vector_proof`` instead imposes the source pages as vectors, several
+per proof page with a student label under each.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Sequence
+
+import fitz
+
+VERIFY_DPI = 100
+JPEG_QUALITY = 80
+CACHE_ROOT = "verification_cache"
+RENDER_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+MANIFEST_NAME = "pages.json"
+CACHE_MAX_UNUSED_DAYS = 30
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+PROOF_PAGE_SIZE = (595.0, 842.0)  # A4 portrait, points
+PROOF_COLUMNS, PROOF_ROWS = 3, 3
+PROOF_MARGIN = 18.0
+PROOF_GUTTER = 6.0
+PROOF_LABEL_HEIGHT = 10.0
+PROOF_LABEL_SIZE = 6.5
+# Pages with at least this many soft masks / translucent graphics states are
+# rasterised at FLATTEN_DPI before imposition; None keeps every page vector.
+FLATTEN_THRESHOLD = 16
+FLATTEN_DPI = 150
+
+
+class PageImage(NamedTuple):
+    path: str
+    width_pt: float
+    height_pt: float
+
+
+class RenderResult(NamedTuple):
+    source: str
+    pages: List[PageImage]
+    error: Optional[str] = None
+
+
+def pdf_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def render_pages(pdf_path, cache_root=CACHE_ROOT, dpi=VERIFY_DPI, quality=JPEG_QUALITY):
+    """Render (or reuse) JPEG previews of every page of ``pdf_path``.
+
+    Runs in a worker process; errors are returned in the result rather than
+    raised so one broken card does not stop the school.
+    """
+    try:
+        folder = os.path.join(cache_root, "%s_%d_%d" % (pdf_digest(pdf_path), dpi, quality))
+        manifest = os.path.join(folder, MANIFEST_NAME)
+        try:
+            with open(manifest, encoding="utf-8") as handle:
+                pages = [PageImage(*entry) for entry in json.load(handle)]
+            if all(os.path.isfile(page.path) for page in pages):
+                # The manifest's mtime is the entry's last use for prune_cache.
+                os.utime(manifest)
+                return RenderResult(str(pdf_path), pages)
+        except (OSError, ValueError, TypeError):
+            pass
+
+        os.makedirs(folder, exist_ok=True)
+        matrix = fitz.Matrix(dpi / 72, dpi / 72)
+        pages = []
+        with fitz.open(str(pdf_path)) as src:
+            for number, page in enumerate(src):
+                pix = page.get_pixmap(matrix=matrix, alpha=False)
+                image_path = os.path.join(folder, "%04d.jpg" % number)
+                with open(image_path, "wb") as handle:
+                    handle.write(pix.tobytes("jpg", jpg_quality=quality))
+                pages.append(PageImage(image_path, pix.width * 72 / dpi, pix.height * 72 / dpi))
+
+        partial = manifest + ".%d.tmp" % os.getpid()
+        with open(partial, "w", encoding="utf-8") as handle:
+            json.dump([list(page) for page in pages], handle)
+        os.replace(partial, manifest)
+        return RenderResult(str(pdf_path), pages)
+    except Exception as exc:
+        return RenderResult(str(pdf_path), [], str(exc))
+
+
+def prune_cache(cache_root=CACHE_ROOT, max_unused_days=CACHE_MAX_UNUSED_DAYS, max_bytes=CACHE_MAX_BYTES, now=None):
+    """Trim the render cache; returns how many PDFs' renders were removed.
+
+    Renders unused for ``max_unused_days`` go first, then the least recently
+    used until the cache holds at most ``max_bytes``.
+    """
+    try:
+        folders = [entry for entry in os.scandir(cache_root) if entry.is_dir()]
+    except OSError:
+        return 0
+    cutoff = (time.time() if now is None else now) - max_unused_days * 86400
+    entries = []
+    for folder in folders:
+        try:
+            # A folder still being rendered has no manifest yet; its own mtime stands in.
+            try:
+                used = os.stat(os.path.join(folder.path, MANIFEST_NAME)).st_mtime
+            except OSError:
+                used = folder.stat().st_mtime
+            size = sum(entry.stat().st_size for entry in os.scandir(folder.path) if entry.is_file())
+        except OSError:
+            continue
+        entries.append((used, size, folder.path))
+
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for used, size, path in entries:
+        if used >= cutoff and total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+class VerificationRenderer:
+    """Process pool shared by every verification PDF of one merge run."""
+
+    def __init__(self, workers=RENDER_WORKERS, cache_root=CACHE_ROOT, dpi=VERIFY_DPI, quality=JPEG_QUALITY):
+        self.cache_root = cache_root
+        self.dpi = dpi
+        self.quality = quality
+        prune_cache(cache_root)
+        self._pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def render(self, pdf_paths: Sequence[Path]):
+        args = [(str(path), self.cache_root, self.dpi, self.quality) for path in pdf_paths]
+        if self._pool is None:
+            return [render_pages(*arg) for arg in args]
+        return list(self._pool.map(render_pages, *zip(*args))) if args else []
+
+    def create_verification_pdf(self, pdf_paths: Sequence[Path], output_path: Path) -> bool:
+        verification_doc = fitz.open()
+        try:
+            for result in self.render(pdf_paths):
+                if result.error is not None:
+                    print(f"Failed to render {result.source}: {result.error}")
+                    continue
+                for page in result.pages:
+                    new_page = verification_doc.new_page(width=page.width_pt, height=page.height_pt)
+                    new_page.insert_image(new_page.rect, filename=page.path)
+            if verification_doc.page_count:
+                output_path.parent.mkdir(parents=True, exist_ok=True)
+                verification_doc.save(str(output_path))
+                return True
+            return False
+        finally:
+            verification_doc.close()
+
+
+_ALPHA = re.compile(r"/(?:ca|CA)\s*(?:0?\.\d+|0)(?![.\d])")
+
+
+def transparency_score(page):
+    """Count soft-masked images and translucent graphics states used by ``page``."""
+    doc = page.parent
+    score = sum(1 for image in page.get_images(full=True) if image[1])
+    kind, value = doc.xref_get_key(page.xref, "Resources/ExtGState")
+    if kind == "xref":
+        value = doc.xref_object(int(value.split()[0]))
+    elif kind != "dict":
+        return score
+    states = [value] + [doc.xref_object(int(xref)) for xref in re.findall(r"(\d+) 0 R", value)]
+    for state in states:
+        score += len(_ALPHA.findall(state))
+        score += len(re.findall(r"/SMask\s*\d+ 0 R", state))
+    return score
+
+
+def _flattened(page, dpi=FLATTEN_DPI):
+    """One-page PDF holding ``page`` rasterised at ``dpi``."""
+    pix = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), alpha=False)
+    flat = fitz.open()
+    flat_page = flat.new_page(width=page.rect.width, height=page.rect.height)
+    flat_page.insert_image(flat_page.rect, stream=pix.tobytes("jpg", jpg_quality=JPEG_QUALITY))
+    return flat
+
+
+def proof_cells(columns=PROOF_COLUMNS, rows=PROOF_ROWS, page_size=PROOF_PAGE_SIZE,
+                margin=PROOF_MARGIN, gutter=PROOF_GUTTER, label_height=PROOF_LABEL_HEIGHT):
+    """``(card rect, label rect)`` for each slot of a proof page, row by row."""
+    width, height = page_size
+    cell_w = (width - 2 * margin - (columns - 1) * gutter) / columns
+    cell_h = (height - 2 * margin - (rows - 1) * gutter) / rows
+    cells = []
+    for row in range(rows):
+        for col in range(columns):
+            x0 = margin + col * (cell_w + gutter)
+            y0 = margin + row * (cell_h + gutter)
+            card = fitz.Rect(x0, y0, x0 + cell_w, y0 + cell_h - label_height)
+            label = fitz.Rect(x0, card.y1, x0 + cell_w, y0 + cell_h)
+            cells.append((card, label))
+    return cells
+
+
+def student_label(pdf_path, page_number=0, page_count=1):
+    label = Path(pdf_path).stem
+    if page_count > 1:
+        label += f" p{page_number + 1}"
+    return label
+
+
+def create_vector_proof(pdf_paths: Sequence[Path], output_path: Path,
+                        columns=PROOF_COLUMNS, rows=PROOF_ROWS,
+                        flatten_threshold: Optional[int] = FLATTEN_THRESHOLD) -> bool:
+    """Impose every page of ``pdf_paths`` as vectors, ``columns`` x ``rows`` per proof page."""
+    cells = proof_cells(columns, rows)
+    proof = fitz.open()
+    proof_page = None
+    slot = 0
+    try:
+        for pdf_path in pdf_paths:
+            try:
+                with fitz.open(str(pdf_path)) as src:
+                    for page in src:
+                        if slot % len(cells) == 0:
+                            proof_page = proof.new_page(width=PROOF_PAGE_SIZE[0], height=PROOF_PAGE_SIZE[1])
+                        card, label = cells[slot % len(cells)]
+                        if flatten_threshold is not None and transparency_score(page) >= flatten_threshold:
+                            with _flattened(page) as flat:
+                                proof_page.show_pdf_page(card, flat, 0)
+                        else:
+                            proof_page.show_pdf_page(card, src, page.number)
+                        proof_page.draw_rect(card, color=(0.7, 0.7, 0.7), width=0.3)
+                        proof_page.insert_textbox(
+                            label, student_label(pdf_path, page.number, src.page_count),
+                            fontsize=PROOF_LABEL_SIZE, align=fitz.TEXT_ALIGN_CENTER,
+                        )
+                        slot += 1
+            except Exception as exc:
+                print(f"Failed to add {pdf_path} to proof: {exc}")
+        if proof.page_count:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            proof.save(str(output_path), garbage=3, deflate=True)
+            return True
+        return False
+    finally:
+        proof.close()